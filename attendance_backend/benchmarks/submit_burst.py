@@ -0,0 +1,299 @@
+"""
+Class-wide submit-code burst benchmark.
+
+Runs the FastAPI app in-process (httpx ASGI transport, no network) against the database in
+DB_URL, which should be a seeded local Postgres. It creates a throwaway faculty, class and
+N enrolled students, then:
+  1. starts a session (geofenced),
+  2. fires N concurrent submit-code calls with GPS jitter around the classroom,
+  3. ends the session,
+and reports latency percentiles, throughput, DB round trips per request (statements executed,
+from the query registry; BEGIN/COMMIT not included) and error rates.
+Results are written as JSON so runs can be compared across commits (--compare).
+
+Usage (from attendance_backend/):
+  python -m benchmarks.submit_burst [--students 300] [--concurrency 0] [--jitter-m 25]
+                                    [--out PATH] [--compare PATH] [--keep]
+
+DB_POOL_MODE defaults to "queue" here (a 300-request burst with the Lambda NullPool would
+open 300 connections); set it explicitly to benchmark another mode.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+os.environ.setdefault("DB_POOL_MODE", "queue")
+
+import httpx  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+import main  # noqa: E402
+from src.core import config  # noqa: E402
+from src.core.database import engine, get_pool_stats  # noqa: E402
+from src.core.query_registry import query_stats, reset_query_stats  # noqa: E402
+from src.core.security import create_access_token  # noqa: E402
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+CENTER = (28.6139, 77.2090)
+RADIUS_M = 100
+METERS_PER_DEG_LAT = 111_320.0
+
+
+def jittered_position(jitter_m: float):
+    """Phone GPS fix around the classroom: gaussian error, reported accuracy to match."""
+    dx, dy = random.gauss(0, jitter_m), random.gauss(0, jitter_m)
+    lat = CENTER[0] + dy / METERS_PER_DEG_LAT
+    lon = CENTER[1] + dx / (METERS_PER_DEG_LAT * math.cos(math.radians(CENTER[0])))
+    accuracy = max(5.0, abs(random.gauss(jitter_m, jitter_m / 2)))
+    return round(lat, 7), round(lon, 7), round(accuracy, 1)
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = math.floor(k), math.ceil(k)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def latency_summary(values_ms) -> dict:
+    return {
+        "count": len(values_ms),
+        "mean_ms": round(statistics.fmean(values_ms), 2) if values_ms else 0.0,
+        "p50_ms": round(percentile(values_ms, 50), 2),
+        "p95_ms": round(percentile(values_ms, 95), 2),
+        "p99_ms": round(percentile(values_ms, 99), 2),
+        "max_ms": round(max(values_ms), 2) if values_ms else 0.0,
+    }
+
+
+def db_calls() -> int:
+    return sum(s["calls"] for s in query_stats().values())
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def auth(user_id: int, role: str) -> dict:
+    return {"Authorization": "Bearer " + create_access_token({"sub": user_id, "role": role})}
+
+
+async def seed(n_students: int, tag: str):
+    """Throwaway faculty + class + enrolled students; returns (faculty_id, class_id, student_ids)."""
+    async with engine.begin() as conn:
+        faculty_id = (await conn.execute(text("""
+            INSERT INTO users (name, email, password_hash, role)
+            VALUES (:name, :email, 'bench', 'FACULTY') RETURNING user_id
+        """), {"name": f"Bench Faculty {tag}", "email": f"bench-faculty-{tag}@bench.local"})).scalar()
+        class_id = (await conn.execute(text("""
+            INSERT INTO classes (class_name, faculty_id, join_code)
+            VALUES (:name, :faculty_id, :join_code) RETURNING class_id
+        """), {"name": f"bench-{tag}", "faculty_id": faculty_id, "join_code": f"B{tag}"[-10:]})).scalar()
+        student_ids = (await conn.execute(text("""
+            INSERT INTO users (name, email, password_hash, role)
+            SELECT 'Bench Student ' || g, 'bench-' || :tag || '-' || g || '@bench.local', 'bench', 'STUDENT'
+            FROM generate_series(1, :n) g
+            RETURNING user_id
+        """), {"tag": tag, "n": n_students})).scalars().all()
+        await conn.execute(text("""
+            INSERT INTO class_enrollments (student_id, class_id, roll_number)
+            SELECT sid, :class_id, 'B' || ord
+            FROM unnest(CAST(:ids AS INTEGER[])) WITH ORDINALITY AS t(sid, ord)
+        """), {"class_id": class_id, "ids": student_ids})
+    return faculty_id, class_id, student_ids
+
+
+async def cleanup(faculty_id: int, class_id: int, student_ids):
+    async with engine.begin() as conn:
+        await conn.execute(text("DELETE FROM classes WHERE class_id = :cid"), {"cid": class_id})
+        await conn.execute(
+            text("DELETE FROM users WHERE user_id = ANY(CAST(:ids AS INTEGER[]))"),
+            {"ids": [faculty_id, *student_ids]},
+        )
+
+
+async def timed(client: httpx.AsyncClient, method: str, url: str, **kwargs):
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+        status = response.status_code
+    except Exception as e:
+        response, status = None, type(e).__name__
+    return response, status, (time.perf_counter() - started) * 1000
+
+
+async def run(args) -> dict:
+    tag = datetime.now().strftime("%H%M%S") + str(random.randint(100, 999))
+    faculty_id, class_id, student_ids = await seed(args.students, tag)
+    faculty = auth(faculty_id, "FACULTY")
+    result = {}
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            # 1. start_session
+            reset_query_stats()
+            response, status, start_ms = await timed(
+                client, "POST", f"/api/faculty/classes/{class_id}/sessions",
+                json={"latitude": CENTER[0], "longitude": CENTER[1], "radius_meters": RADIUS_M},
+                headers=faculty,
+            )
+            if status != 200:
+                raise SystemExit(f"❌ start_session failed: {status} {response.text if response else ''}")
+            session = response.json()
+            start_db_calls = db_calls()
+
+            # 2. the burst
+            limit = asyncio.Semaphore(args.concurrency or len(student_ids))
+
+            async def submit(student_id: int):
+                lat, lon, accuracy = jittered_position(args.jitter_m)
+                async with limit:
+                    response, status, ms = await timed(
+                        client, "POST", "/attendance/submit-code",
+                        json={"student_id": student_id, "code": session["generated_code"],
+                              "latitude": lat, "longitude": lon, "accuracy": accuracy},
+                        headers=auth(student_id, "STUDENT"),
+                    )
+                marked = response.json().get("status") if status == 200 else None
+                return status, ms, marked
+
+            reset_query_stats()
+            burst_started = time.perf_counter()
+            outcomes = await asyncio.gather(*(submit(sid) for sid in student_ids))
+            if config.ATTENDANCE_WRITE_BEHIND:
+                await main.student.attendance_write_buffer.drain()
+            burst_s = time.perf_counter() - burst_started
+            burst_db_calls = db_calls()
+            burst_queries = query_stats()
+
+            # 3. end_session
+            reset_query_stats()
+            response, status, end_ms = await timed(
+                client, "PUT", f"/api/faculty/classes/{class_id}/sessions/{session['session_id']}/end",
+                headers=faculty,
+            )
+            if status != 200:
+                raise SystemExit(f"❌ end_session failed: {status} {response.text if response else ''}")
+            end_db_calls = db_calls()
+            final = response.json()
+
+        latencies = [ms for _, ms, _ in outcomes]
+        ok_latencies = [ms for status, ms, _ in outcomes if status == 200]
+        statuses = Counter(str(status) for status, _, _ in outcomes)
+        errors = sum(n for status, n in statuses.items() if status != "200")
+        result = {
+            "benchmark": "submit_burst",
+            "revision": git_revision(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "config": {
+                "students": args.students,
+                "concurrency": args.concurrency or args.students,
+                "jitter_m": args.jitter_m,
+                "radius_m": RADIUS_M,
+                "db_pool_mode": config.DB_POOL_MODE,
+                "write_behind": config.ATTENDANCE_WRITE_BEHIND,
+            },
+            "start_session": {"latency_ms": round(start_ms, 2), "db_round_trips": start_db_calls},
+            "submit_burst": {
+                "wall_s": round(burst_s, 3),
+                "throughput_rps": round(len(outcomes) / burst_s, 1) if burst_s else 0.0,
+                "latency_all": latency_summary(latencies),
+                "latency_ok": latency_summary(ok_latencies),
+                "status_counts": dict(statuses),
+                "error_rate": round(errors / len(outcomes), 4) if outcomes else 0.0,
+                "marked": dict(Counter(m for _, _, m in outcomes if m)),
+                "db_round_trips": burst_db_calls,
+                "db_round_trips_per_request": round(burst_db_calls / len(outcomes), 3) if outcomes else 0.0,
+                "queries": burst_queries,
+            },
+            "end_session": {
+                "latency_ms": round(end_ms, 2),
+                "db_round_trips": end_db_calls,
+                "present": final.get("present_count"),
+                "late": final.get("late_count"),
+                "absent": final.get("absent_count"),
+            },
+            "pool": get_pool_stats(),
+        }
+    finally:
+        if not args.keep:
+            await cleanup(faculty_id, class_id, student_ids)
+        await engine.dispose()
+    return result
+
+
+def print_report(result: dict, baseline: dict = None):
+    burst = result["submit_burst"]
+    lat = burst["latency_all"]
+
+    def delta(path, value):
+        if baseline is None:
+            return ""
+        old = baseline
+        for key in path:
+            old = old.get(key, {}) if isinstance(old, dict) else {}
+        if not isinstance(old, (int, float)) or not old:
+            return ""
+        return f"  ({(value - old) / old * 100:+.1f}% vs {baseline.get('revision', '?')})"
+
+    print(f"Submit burst: {result['config']['students']} students, "
+          f"pool={result['config']['db_pool_mode']}, write_behind={result['config']['write_behind']}")
+    print(f"  start_session     {result['start_session']['latency_ms']:.1f} ms, "
+          f"{result['start_session']['db_round_trips']} DB round trips")
+    print(f"  throughput        {burst['throughput_rps']} req/s" + delta(("submit_burst", "throughput_rps"), burst["throughput_rps"]))
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        print(f"  {key[:-3]:<17} {lat[key]:.1f} ms" + delta(("submit_burst", "latency_all", key), lat[key]))
+    print(f"  DB trips/request  {burst['db_round_trips_per_request']}"
+          + delta(("submit_burst", "db_round_trips_per_request"), burst["db_round_trips_per_request"]))
+    print(f"  error rate        {burst['error_rate'] * 100:.2f}%  {burst['status_counts']}")
+    print(f"  marked            {burst['marked']}")
+    print(f"  end_session       {result['end_session']['latency_ms']:.1f} ms, "
+          f"{result['end_session']['db_round_trips']} DB round trips")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=0, help="max in-flight requests (0 = all at once)")
+    parser.add_argument("--jitter-m", type=float, default=25.0, help="std-dev of GPS error in meters")
+    parser.add_argument("--out", type=Path, help="result file (default: benchmarks/results/)")
+    parser.add_argument("--compare", type=Path, help="earlier result file to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded class/users")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible jitter")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    result = asyncio.run(run(args))
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print_report(result, baseline)
+
+    out = args.out or RESULTS_DIR / f"submit_burst-{result['revision']}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2, default=str))
+    print(f"Results written to {out}")
+    if result["submit_burst"]["error_rate"] > 0 and "200" not in result["submit_burst"]["status_counts"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
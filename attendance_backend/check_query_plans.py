@@ -0,0 +1,160 @@
+"""
+Query plan regression check.
+
+Prepares every hot registered query and runs EXPLAIN (FORMAT JSON) EXECUTE on it against
+the database in DB_URL (a seeded local Postgres, not production), and fails (exit 1) if any
+plan contains a sequential scan on a table with at least --min-rows rows. Plans are forced
+generic (plan_cache_mode), so no parameter values are needed and the check covers the plan a
+cached prepared statement ends up using. Nothing is executed; EXPLAIN without ANALYZE only
+plans. Requires PostgreSQL 12+.
+
+Usage: python check_query_plans.py [--min-rows N] [--all] [--verbose]
+       --all      check every registered query, not just HOT_QUERIES
+       --verbose  print each plan's top node and cost
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+# Registers every statement (routers, caches, ...) as a side effect
+import main  # noqa: F401
+from src.core.database import engine
+from src.core.query_registry import registered_queries
+
+# Statements on the request path, by registered name
+HOT_QUERIES = [
+    "session_cache.load",
+    "student.submit_code",
+    "student.guarded_upsert",
+    "student.bulk_sessions_by_code",
+    "student.bulk_enrollments",
+    "student.last_submission",
+    "student.enrolled_classes",
+    "student.class_by_join_code",
+    "student.enrollment_exists",
+    "student.attendance_history",
+    "faculty.active_sessions",
+    "faculty.faculty_classes",
+    "faculty.existing_active_session",
+    "faculty.active_session",
+    "faculty.mark_absent",
+    "faculty.close_session",
+    "faculty.session_marks",
+    "faculty.manual_mark",
+    "faculty.session_attendance_flat",
+    "faculty.class_attendance",
+    "faculty.class_students",
+    "faculty.class_details",
+    "faculty.class_sessions_in_range",
+    "queries.sessions_by_date",
+    "queries.absent_on_date",
+    "queries.student_percentage",
+    "attendance_matrix.students",
+    "attendance_matrix.sessions",
+    "attendance_matrix.marks",
+    "class_versions.by_class",
+    "class_versions.by_session",
+]
+
+DEFAULT_MIN_ROWS = 10000
+
+# Statements EXPLAIN can't plan
+UTILITY_PREFIXES = ("LOCK", "SET", "SHOW")
+
+_table_rows_sql = """
+    SELECT c.relname, GREATEST(c.reltuples, 0)::bigint AS est_rows
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind = 'r' AND n.nspname = current_schema()
+"""
+
+
+def seq_scans(node, found=None):
+    """Relation names of every Seq Scan node in an EXPLAIN JSON plan tree."""
+    if found is None:
+        found = []
+    if node.get("Node Type") == "Seq Scan":
+        found.append(node.get("Relation Name"))
+    for child in node.get("Plans", []):
+        seq_scans(child, found)
+    return found
+
+
+_param_count_sql = "SELECT cardinality(parameter_types) FROM pg_prepared_statements WHERE name = 'plan_check'"
+
+
+async def explain(conn, driver, sql: str) -> dict:
+    """Generic plan of `sql` (with $n placeholders) as EXPLAIN JSON."""
+    # Sent over the simple query protocol, so the $n placeholders belong to PREPARE
+    await driver.execute(f"PREPARE plan_check AS {sql}")
+    try:
+        n_params = (await conn.exec_driver_sql(_param_count_sql)).scalar()
+        args = ", ".join(["NULL"] * n_params)
+        execute = f"EXECUTE plan_check({args})" if n_params else "EXECUTE plan_check"
+        plan = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {execute}")).scalar()
+    finally:
+        await driver.execute("DEALLOCATE plan_check")
+    return json.loads(plan) if isinstance(plan, str) else plan
+
+
+async def check(names, min_rows: int, verbose: bool) -> bool:
+    statements = registered_queries()
+    unknown = [n for n in names if n not in statements]
+    if unknown:
+        print(f"❌ Not registered: {', '.join(unknown)}")
+        return False
+
+    ok = True
+    async with engine.connect() as conn:
+        driver = (await conn.get_raw_connection()).driver_connection
+        await conn.exec_driver_sql("SET plan_cache_mode = force_generic_plan")
+        rows = {r.relname: r.est_rows for r in await conn.exec_driver_sql(_table_rows_sql)}
+        large = {t for t, n in rows.items() if n >= min_rows}
+        print(f"Tables with >= {min_rows} rows: {', '.join(sorted(large)) or 'none'}")
+        if not large:
+            print("⚠️  Nothing is large enough to tell index scans from seq scans; seed more data")
+
+        for name in names:
+            sql = str(statements[name].compile(dialect=engine.dialect))
+            if sql.lstrip().upper().startswith(UTILITY_PREFIXES):
+                if verbose:
+                    print(f"-- {name}: utility statement, no plan")
+                continue
+            try:
+                # A failed EXPLAIN aborts the transaction; isolate each one
+                async with conn.begin_nested():
+                    plan = await explain(conn, driver, sql)
+            except Exception as e:
+                ok = False
+                print(f"❌ {name}: EXPLAIN failed: {str(e).splitlines()[0]}")
+                continue
+            top = plan[0]["Plan"]
+            scanned = seq_scans(top)
+            bad = sorted({t for t in scanned if t in large})
+            if bad:
+                ok = False
+                print(f"❌ {name}: sequential scan on {', '.join(bad)}")
+            elif verbose:
+                print(f"✅ {name}: {top['Node Type']} (cost {top['Total Cost']})")
+        await conn.rollback()
+    return ok
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-rows", type=int, default=DEFAULT_MIN_ROWS)
+    parser.add_argument("--all", action="store_true")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    names = sorted(registered_queries()) if args.all else HOT_QUERIES
+    print(f"Checking {len(names)} queries...")
+    ok = asyncio.run(check(names, args.min_rows, args.verbose))
+    if not ok:
+        sys.exit(1)
+    print("✅ No sequential scans on large tables")
+
+
+if __name__ == "__main__":
+    main_cli()
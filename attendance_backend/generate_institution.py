@@ -0,0 +1,326 @@
+"""
+Synthetic institution generator for scale testing.
+
+Bulk-loads faculty, students, classes, enrollments and semesters of closed sessions with
+their attendance records into the database in DB_URL, using COPY. The same --seed (and
+sizes) always produces the same institution. Derived data is written alongside (session
+totals, attendance_counters, class_versions), so the load runs with the tables' user
+triggers disabled; the tables are locked for its duration and it needs to run as the table
+owner. Meant for a local or staging database, never production.
+
+Every generated account shares one password (--password) and has an email under
+@<tag>.attendx.test, which is also how --purge finds them again.
+
+Each class runs in one semester, so records ~= classes * class-size * weeks * sessions-per-week.
+The defaults give ~0.6M records; for ~10M:
+  python generate_institution.py --students 20000 --classes 2000 --class-size 80 \
+      --semesters 4 --sessions-per-week 4
+
+Usage: python generate_institution.py [--seed 42] [--tag gen42] [--faculty 60]
+           [--students 5000] [--classes 200] [--class-size 60] [--semesters 2]
+           [--weeks 16] [--sessions-per-week 3] [--password PW] [--dry-run]
+       python generate_institution.py --purge [--tag gen42]
+"""
+import argparse
+import asyncio
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+from src.core.database import engine
+from src.core.security import get_password_hash
+from src.core.utils import IST_OFFSET, ist_today
+
+FIRST_NAMES = [
+    "Aarav", "Aditi", "Ananya", "Arjun", "Diya", "Ishaan", "Kabir", "Kavya", "Meera", "Neha",
+    "Nikhil", "Priya", "Rahul", "Riya", "Rohan", "Saanvi", "Sneha", "Tanvi", "Vihaan", "Zara",
+]
+LAST_NAMES = [
+    "Agarwal", "Bose", "Chopra", "Das", "Gupta", "Iyer", "Joshi", "Kapoor", "Khan", "Kumar",
+    "Menon", "Nair", "Patel", "Rao", "Reddy", "Shah", "Sharma", "Singh", "Verma", "Yadav",
+]
+SUBJECTS = [
+    "Data Structures", "Algorithms", "Operating Systems", "Computer Networks", "Databases",
+    "Discrete Mathematics", "Linear Algebra", "Probability", "Digital Logic", "Compilers",
+    "Machine Learning", "Software Engineering", "Signals and Systems", "Thermodynamics",
+    "Engineering Physics", "Technical Communication",
+]
+SECTIONS = "ABCD"
+CODE_CHARS = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+
+CAMPUS = (28.6139, 77.2090)
+SEMESTER_BREAK_WEEKS = 4
+SESSION_MINUTES = 50
+FLUSH_RECORDS = 500_000  # records buffered per COPY
+
+# Tables whose user triggers maintain data this script writes itself
+TRIGGER_TABLES = ["class_enrollments", "attendance_sessions", "attendance_records"]
+LOCK_TABLES = ["users", "classes", *TRIGGER_TABLES, "attendance_counters"]
+
+SESSION_COLUMNS = [
+    "session_id", "class_id", "start_time", "end_time", "status", "generated_code",
+    "latitude", "longitude", "radius_meters",
+    "present_count", "late_count", "absent_count", "enrolled_count",
+]
+RECORD_COLUMNS = ["record_id", "session_id", "student_id", "status", "marked_at"]
+COUNTER_COLUMNS = ["class_id", "student_id", "total_count", "present_count", "late_count", "absent_count"]
+STATUSES = ("PRESENT", "LATE", "ABSENT")
+
+PURGE_USERS = "SELECT user_id FROM users WHERE email LIKE $1"
+PURGE_CLASSES = f"SELECT class_id FROM classes WHERE faculty_id IN ({PURGE_USERS})"
+# Children before parents, so purging does not depend on which of the base schema's
+# foreign keys cascade (the auth router's account deletion walks the same order)
+PURGE_STATEMENTS = [
+    f"""DELETE FROM attendance_records WHERE student_id IN ({PURGE_USERS})
+        OR session_id IN (SELECT session_id FROM attendance_sessions WHERE class_id IN ({PURGE_CLASSES}))""",
+    f"DELETE FROM attendance_sessions WHERE class_id IN ({PURGE_CLASSES})",
+    f"DELETE FROM class_enrollments WHERE student_id IN ({PURGE_USERS}) OR class_id IN ({PURGE_CLASSES})",
+    f"DELETE FROM classes WHERE faculty_id IN ({PURGE_USERS})",
+]
+
+
+def email_domain(tag: str) -> str:
+    return f"{tag}.attendx.test"
+
+
+async def reserve_ids(driver, table: str, column: str, n: int) -> int:
+    """Claim n consecutive ids from the column's sequence; returns the first.
+    Only safe while the table is locked against concurrent inserts."""
+    last = await driver.fetchval(
+        "SELECT setval(pg_get_serial_sequence($1, $2), nextval(pg_get_serial_sequence($1, $2)) + $3 - 1)",
+        table, column, n,
+    )
+    return last - n + 1
+
+
+def plan_classes(rng: random.Random, args):
+    """Per class: (faculty index, semester, weekdays, start hour, roster of student indexes)."""
+    days_per_week = min(args.sessions_per_week, 6)
+    classes = []
+    for i in range(args.classes):
+        size = round(rng.gauss(args.class_size, args.class_size * 0.15))
+        size = max(1, min(args.students, size))
+        classes.append((
+            rng.randrange(args.faculty),
+            i % args.semesters,
+            sorted(rng.sample(range(6 if days_per_week > 5 else 5), days_per_week)),
+            rng.randrange(8, 17),
+            rng.sample(range(args.students), size),
+        ))
+    return classes
+
+
+def semester_weeks(args):
+    """Monday (a date) of every teaching week, per semester, oldest first; all in the past."""
+    this_monday = ist_today() - timedelta(days=ist_today().weekday())
+    semesters = []
+    for k in range(args.semesters):
+        weeks_back = (args.semesters - k) * (args.weeks + SEMESTER_BREAK_WEEKS) - SEMESTER_BREAK_WEEKS
+        first = this_monday - timedelta(weeks=weeks_back)
+        semesters.append([first + timedelta(weeks=w) for w in range(args.weeks)])
+    return semesters
+
+
+async def copy(driver, table: str, columns, rows) -> int:
+    if not rows:
+        return 0
+    await driver.copy_records_to_table(table, records=rows, columns=columns)
+    return len(rows)
+
+
+async def generate(args) -> dict:
+    rng = random.Random(args.seed)
+    domain = email_domain(args.tag)
+    classes = plan_classes(rng, args)
+    semesters = semester_weeks(args)
+    # How reliably each student turns up, and how often on time when they do
+    attendance_rate = [rng.betavariate(8, 2) for _ in range(args.students)]
+    punctuality = [rng.uniform(0.8, 0.97) for _ in range(args.students)]
+    present_offsets = [timedelta(seconds=s) for s in range(0, 600, 7)]
+    late_offsets = [timedelta(seconds=s) for s in range(600, 1500, 11)]
+    password_hash = get_password_hash(args.password)
+    counts = dict.fromkeys(["users", "classes", "enrollments", "sessions", "records", "counters"], 0)
+
+    async with engine.begin() as conn:
+        # Through SQLAlchemy, so the transaction is open before the driver is used directly
+        await conn.exec_driver_sql(f"LOCK TABLE {', '.join(LOCK_TABLES)} IN EXCLUSIVE MODE")
+        driver = (await conn.get_raw_connection()).driver_connection
+        taken = await driver.fetchval("SELECT COUNT(*) FROM users WHERE email LIKE $1", f"%@{domain}")
+        if taken:
+            raise RuntimeError(f"{taken} users under @{domain} already exist; use --purge or another --tag")
+        for table in TRIGGER_TABLES:
+            await driver.execute(f"ALTER TABLE {table} DISABLE TRIGGER USER")
+
+        first_user = await reserve_ids(driver, "users", "user_id", args.faculty + args.students)
+        faculty_ids = [first_user + i for i in range(args.faculty)]
+        student_ids = [first_user + args.faculty + i for i in range(args.students)]
+        users = []
+        for i, user_id in enumerate(faculty_ids):
+            name = f"Prof. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            users.append((user_id, name, f"faculty{i + 1}@{domain}", password_hash, "FACULTY"))
+        for i, user_id in enumerate(student_ids):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            users.append((user_id, name, f"student{i + 1}@{domain}", password_hash, "STUDENT"))
+        counts["users"] = await copy(driver, "users", ["user_id", "name", "email", "password_hash", "role"], users)
+        del users
+
+        first_class = await reserve_ids(driver, "classes", "class_id", args.classes)
+        class_rows, enrollments = [], []
+        for i, (faculty, semester, _, _, roster) in enumerate(classes):
+            class_id = first_class + i
+            subject = SUBJECTS[i % len(SUBJECTS)]
+            class_rows.append((
+                class_id, f"{subject} {100 + i} (Sem {semester + 1})",
+                faculty_ids[faculty], f"{args.tag}-{i + 1}".upper(),
+            ))
+            for s in roster:
+                enrollments.append((student_ids[s], class_id, f"R{s + 1:06d}", SECTIONS[s % len(SECTIONS)]))
+        counts["classes"] = await copy(driver, "classes", ["class_id", "class_name", "faculty_id", "join_code"], class_rows)
+        counts["enrollments"] = await copy(
+            driver, "class_enrollments", ["student_id", "class_id", "roll_number", "section"], enrollments,
+        )
+        del class_rows, enrollments
+
+        n_sessions = sum(len(days) * args.weeks for _, _, days, _, _ in classes)
+        n_records = sum(len(days) * args.weeks * len(roster) for _, _, days, _, roster in classes)
+        session_id = await reserve_ids(driver, "attendance_sessions", "session_id", n_sessions)
+        record_id = await reserve_ids(driver, "attendance_records", "record_id", n_records)
+        print(f"Loading {n_sessions} sessions and {n_records} records...")
+
+        sessions, records, counters = [], [], []
+        for i, (_, semester, days, hour, roster) in enumerate(classes):
+            class_id = first_class + i
+            lat = CAMPUS[0] + rng.uniform(-0.003, 0.003)
+            lon = CAMPUS[1] + rng.uniform(-0.003, 0.003)
+            tally = [[0, 0, 0] for _ in roster]
+            for monday in semesters[semester]:
+                for day in days:
+                    start = datetime.combine(monday + timedelta(days=day), datetime.min.time()) \
+                        + timedelta(hours=hour)
+                    end = start + timedelta(minutes=SESSION_MINUTES)
+                    start_utc, end_utc = start - IST_OFFSET, end - IST_OFFSET
+                    totals = [0, 0, 0]
+                    for j, s in enumerate(roster):
+                        r = rng.random()
+                        if r < attendance_rate[s] * punctuality[s]:
+                            status, marked_at = 0, start_utc + rng.choice(present_offsets)
+                        elif r < attendance_rate[s]:
+                            status, marked_at = 1, start_utc + rng.choice(late_offsets)
+                        else:
+                            status, marked_at = 2, end_utc
+                        records.append((record_id, session_id, student_ids[s], STATUSES[status], marked_at))
+                        record_id += 1
+                        tally[j][status] += 1
+                        totals[status] += 1
+                    code = "".join(rng.choices(CODE_CHARS, k=6))
+                    sessions.append((
+                        session_id, class_id, start, end, "CLOSED", code, lat, lon, 50,
+                        totals[0], totals[1], totals[2], len(roster),
+                    ))
+                    session_id += 1
+            counters.extend(
+                (class_id, student_ids[s], sum(t), t[0], t[1], t[2]) for s, t in zip(roster, tally) if sum(t)
+            )
+            if len(records) >= FLUSH_RECORDS or i == len(classes) - 1:
+                # Sessions first: records reference them
+                counts["sessions"] += await copy(driver, "attendance_sessions", SESSION_COLUMNS, sessions)
+                counts["records"] += await copy(driver, "attendance_records", RECORD_COLUMNS, records)
+                sessions, records = [], []
+                print(f"  {counts['records']}/{n_records} records")
+        counts["counters"] = await copy(driver, "attendance_counters", COUNTER_COLUMNS, counters)
+
+        has_versions = await driver.fetchval("SELECT to_regclass('class_versions') IS NOT NULL")
+        if has_versions:
+            await driver.execute(
+                "INSERT INTO class_versions (class_id, version) SELECT g, 1 FROM generate_series($1::int, $2::int) g",
+                first_class, first_class + args.classes - 1,
+            )
+        for table in TRIGGER_TABLES:
+            await driver.execute(f"ALTER TABLE {table} ENABLE TRIGGER USER")
+
+    async with engine.connect() as conn:
+        driver = (await conn.get_raw_connection()).driver_connection
+        for table in LOCK_TABLES:
+            await driver.execute(f"ANALYZE {table}")
+    return counts
+
+
+async def purge(tag: str) -> int:
+    """Delete a previous run's records, sessions, enrollments, classes and users, in that
+    order and in one transaction; counters and class versions cascade from their classes."""
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql(f"LOCK TABLE {', '.join(LOCK_TABLES)} IN EXCLUSIVE MODE")
+        driver = (await conn.get_raw_connection()).driver_connection
+        # The row triggers would only adjust counters and versions that are being deleted anyway
+        for table in TRIGGER_TABLES:
+            await driver.execute(f"ALTER TABLE {table} DISABLE TRIGGER USER")
+        pattern = f"%@{email_domain(tag)}"
+        for statement in PURGE_STATEMENTS:
+            await driver.execute(statement, pattern)
+        deleted = await driver.execute("DELETE FROM users WHERE email LIKE $1", pattern)
+        for table in TRIGGER_TABLES:
+            await driver.execute(f"ALTER TABLE {table} ENABLE TRIGGER USER")
+    return int(deleted.split()[-1])
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tag", help="email domain / join code prefix (default gen<seed>)")
+    parser.add_argument("--faculty", type=int, default=60)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--classes", type=int, default=200)
+    parser.add_argument("--class-size", type=int, default=60)
+    parser.add_argument("--semesters", type=int, default=2)
+    parser.add_argument("--weeks", type=int, default=16, help="teaching weeks per semester")
+    parser.add_argument("--sessions-per-week", type=int, default=3, help="per class, at most 6")
+    parser.add_argument("--password", default="attendx123")
+    parser.add_argument("--dry-run", action="store_true", help="print the planned sizes and exit")
+    parser.add_argument("--purge", action="store_true", help="delete the users of --tag instead")
+    args = parser.parse_args()
+    args.tag = (args.tag or f"gen{args.seed}").lower()
+
+    if not re.fullmatch(r"[a-z0-9]{1,12}", args.tag):
+        print("❌ --tag must be 1-12 letters or digits")
+        sys.exit(1)
+    if min(args.faculty, args.students, args.classes, args.class_size,
+           args.semesters, args.weeks, args.sessions_per_week) < 1:
+        print("❌ All sizes must be at least 1")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    if args.purge:
+        print(f"Purging users under @{email_domain(args.tag)}...")
+        try:
+            deleted = asyncio.run(purge(args.tag))
+        except Exception as e:
+            print(f"❌ Purge failed: {e}")
+            sys.exit(1)
+        print(f"✅ Deleted {deleted} users (and their classes, sessions and records) "
+              f"in {time.perf_counter() - started:.1f}s")
+        return
+
+    classes = plan_classes(random.Random(args.seed), args)
+    sessions_per_class = min(args.sessions_per_week, 6) * args.weeks
+    n_records = sum(sessions_per_class * len(roster) for *_, roster in classes)
+    print(f"Institution '{args.tag}' (seed {args.seed}): {args.faculty} faculty, {args.students} students, "
+          f"{args.classes} classes, {args.classes * sessions_per_class} sessions, {n_records} records")
+    if args.dry_run:
+        return
+
+    try:
+        counts = asyncio.run(generate(args))
+    except Exception as e:
+        print(f"❌ Load failed, nothing was written: {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+    for table, n in counts.items():
+        print(f"  {table:<12} {n}")
+    print(f"✅ Loaded in {elapsed:.1f}s ({counts['records'] / elapsed:,.0f} records/s); "
+          f"log in with <faculty1|student1>@{email_domain(args.tag)} / {args.password}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,10 +1,36 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from mangum import Mangum
 from src.core.config import FRONTEND_URL
+from src.core.database import get_pool_stats
+from src.core.hash_pool import hash_pool
+from src.core.email import email_outbox
+from src.core.metadata_cache import metadata_cache
+from src.core.live_attendance import broker as live_broker
+from src.core.warm_state import warm_state
+from src.core.log import configure_logging, flush_logs, get_logger
+from src.core.metrics import render as render_metrics
+from src.core.query_registry import query_stats, registered_queries, statement_metrics
+from src.core.profiler import ProfilingMiddleware, profiler
+from src.core.request_timing import RequestTimingMiddleware, TimedJSONResponse
 from src.routers import auth, faculty, student
 
-app = FastAPI(title="Attendance Management API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Graceful shutdown (SIGTERM): commit any buffered attendance writes before exiting
+    await student.attendance_write_buffer.drain()
+    await email_outbox.drain()
+    flush_logs()
+
+
+configure_logging()
+logger = get_logger("main")
+
+app = FastAPI(title="Attendance Management API", lifespan=lifespan, default_response_class=TimedJSONResponse)
 
 # CORS — only allow known origins, never wildcard
 origins = [
@@ -23,6 +49,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if profiler.enabled:
+    app.add_middleware(ProfilingMiddleware)
+# Outermost, so its timings and Server-Timing header cover everything below it
+app.add_middleware(RequestTimingMiddleware)
+
+
 # Include Routers
 app.include_router(auth.router)
 app.include_router(faculty.router)
@@ -41,16 +73,36 @@ def health_check():
         "status": "healthy",
         "service": "Attendance Management API",
         "database": "connected",
+        "pool": get_pool_stats(),
+        "hashing": hash_pool.stats(),
+        "email_outbox": email_outbox.stats(),
+        "metadata_cache": metadata_cache.stats(),
+        "live": live_broker.stats(),
+        "lambda": warm_state.stats(),
     }
 
 
+@app.get("/health/queries")
+def query_health():
+    """Per-statement call counts and latency for the registered SQL"""
+    return {"registered": len(registered_queries()), "queries": query_stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Per-route latency, per-statement latency and DB usage, in Prometheus text format"""
+    return PlainTextResponse(
+        render_metrics(statement_metrics(), get_pool_stats()),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
 
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
 
 import json
-import asyncio
 
 # Create the standard Mangum handler for API Gateway (HTTP)
 _mangum_handler = Mangum(app)
@@ -61,6 +113,14 @@ def handler(event, context):
     Unified AWS Lambda handler that routes between API Gateway HTTP events
     and SQS Queue events.
     """
+    try:
+        return _route_event(event, context)
+    finally:
+        # Lambda may freeze the container as soon as we return; write queued log lines first
+        flush_logs()
+
+
+def _route_event(event, context):
     # 1. Check if the event came from an SQS Queue
     if (
         "Records" in event
@@ -69,49 +129,49 @@ def handler(event, context):
     ):
 
         async def process_sqs_batch():
-            from src.routers.student import _submit_code_internal, SubmitAttendanceCode
+            from src.routers.student import _submit_codes_bulk, SubmitAttendanceCode
 
             failed_message_ids = []
+            message_ids = []
+            payloads = []
 
+            # Validate the whole batch up front; malformed messages fail individually
             for record in event["Records"]:
                 message_id = record.get("messageId")
                 try:
                     # SQS sends the payload as a JSON string inside the 'body'
                     body = json.loads(record["body"])
-                    payload = SubmitAttendanceCode(**body)
-
-                    # ---> EXECUTE YOUR BULK DATABASE INSERT HERE <---
-                    await _submit_code_internal(payload)
-                    print(
-                        f"✅ SQS Processed Attendance for Student {payload.student_id}"
-                    )
-
+                    payloads.append(SubmitAttendanceCode(**body))
+                    message_ids.append(message_id)
                 except Exception as e:
-                    print(f"❌ Error processing SQS message {message_id}: {e}")
+                    logger.warning("Unparseable SQS message", extra={"message_id": message_id, "error": str(e)})
+                    failed_message_ids.append({"itemIdentifier": message_id})
+
+            try:
+                # One set-based pass: resolve codes, check enrollments, upsert all rows
+                results = await _submit_codes_bulk(payloads)
+            except Exception as e:
+                # The shared write failed, so none of the parsed messages were stored
+                logger.exception("Bulk attendance insert failed", extra={"messages": len(payloads)})
+                results = [e] * len(payloads)
+
+            for message_id, payload, result in zip(message_ids, payloads, results):
+                if isinstance(result, Exception):
+                    logger.warning("SQS message failed", extra={"message_id": message_id, "error": str(result)})
                     # CRITICAL: If this one student fails, add their ID to the failure list
                     # DO NOT throw an error, or the whole batch will fail!
                     failed_message_ids.append({"itemIdentifier": message_id})
+                else:
+                    logger.info("SQS attendance processed", extra={"student_id": payload.student_id})
 
             # Return the exact JSON structure AWS requires for partial failures
             # AWS will delete the successful messages and put the failed ones back in the queue
             return {"batchItemFailures": failed_message_ids}
 
-        # Run the async logic using a new event loop safely
-        new_loop = asyncio.new_event_loop()
-        try:
-            return new_loop.run_until_complete(process_sqs_batch())
-        finally:
-            new_loop.close()
+        # Run on the container's long-lived loop so connections and caches carry over
+        return warm_state.run("sqs", process_sqs_batch())
 
-    # 2. Ensure a usable event loop exists for Mangum (reuse if possible)
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_closed():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-    # 3. Otherwise, treat it as a standard HTTP request from API Gateway
+    # 2. Otherwise, treat it as a standard HTTP request from API Gateway.
+    # Mangum runs the app on asyncio.get_event_loop(), i.e. the container's loop
+    warm_state.begin_invocation("http")
     return _mangum_handler(event, context)
@@ -0,0 +1,21 @@
+import asyncio
+import sys
+
+from src.queries import rebuild_attendance_counters
+
+
+async def main():
+    class_id = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    scope = f"class {class_id}" if class_id is not None else "all classes"
+    print(f"Rebuilding attendance counters for {scope}...")
+    rows = await rebuild_attendance_counters(class_id)
+    print(f"✅ Done. {rows} (class, student) counter rows written.")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n\n❌ Operation cancelled by user.")
+    except Exception as e:
+        print(f"\n❌ An error occurred: {e}")
@@ -0,0 +1,25 @@
+-- One attendance record per (session, student)
+-- Required by the INSERT ... ON CONFLICT upserts used when submitting or marking attendance
+
+-- Remove duplicates left behind by the old UPDATE-then-INSERT upsert (keep the latest mark)
+DELETE FROM attendance_records a
+USING attendance_records b
+WHERE a.session_id = b.session_id
+  AND a.student_id = b.student_id
+  AND (
+      COALESCE(a.marked_at, '-infinity') < COALESCE(b.marked_at, '-infinity')
+      OR (a.marked_at IS NOT DISTINCT FROM b.marked_at AND a.ctid < b.ctid)
+  );
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'uq_attendance_records_session_student'
+    ) THEN
+        ALTER TABLE attendance_records
+        ADD CONSTRAINT uq_attendance_records_session_student UNIQUE (session_id, student_id);
+    END IF;
+END $$;
+
+-- Display success message
+SELECT 'Migration completed successfully!' AS status;
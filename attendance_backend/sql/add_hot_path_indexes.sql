@@ -0,0 +1,72 @@
+-- Indexes for the hot request-path predicates
+-- Checked by: python check_query_plans.py (fails if a hot query seq-scans a large table)
+--
+-- Covered elsewhere, not repeated here:
+--   attendance_records (session_id, student_id)  -> uq_attendance_records_session_student
+--                                                   (add_attendance_record_unique.sql)
+--   attendance_sessions (class_id, start_time)   -> add_session_start_time_indexes.sql
+--
+-- The large tables are indexed CONCURRENTLY so writes continue during the build;
+-- run this file outside a transaction (psql -f does).
+
+-- submit-code: WHERE generated_code = :code AND status = 'ACTIVE'.
+-- Partial, so it only holds the handful of live sessions and stays tiny.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_attendance_sessions_active_code
+ON attendance_sessions (generated_code)
+WHERE status = 'ACTIVE';
+
+-- start_session / active-session lookups: WHERE class_id = :class_id AND status = 'ACTIVE'
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_attendance_sessions_active_class
+ON attendance_sessions (class_id)
+WHERE status = 'ACTIVE';
+
+-- Student history, account deletion: WHERE student_id = :student_id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_attendance_records_student
+ON attendance_records (student_id);
+
+-- Per-student percentage: the primary key (class_id, student_id) can't serve student_id alone
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_attendance_counters_student
+ON attendance_counters (student_id);
+
+-- Small tables: only add an index where no existing index (e.g. a UNIQUE constraint)
+-- already leads with the column, to avoid paying for duplicates on every write.
+DO $$
+DECLARE
+    spec TEXT[];
+BEGIN
+    FOREACH spec SLICE 1 IN ARRAY ARRAY[
+        ['class_enrollments', 'student_id', 'idx_class_enrollments_student'],
+        ['classes', 'join_code', 'idx_classes_join_code'],
+        ['classes', 'faculty_id', 'idx_classes_faculty']
+    ] LOOP
+        IF NOT EXISTS (
+            SELECT 1
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+            WHERE i.indrelid = spec[1]::regclass
+              AND a.attname = spec[2]
+              AND i.indpred IS NULL
+        ) THEN
+            EXECUTE format('CREATE INDEX %I ON %I (%I)', spec[3], spec[1], spec[2]);
+            RAISE NOTICE 'Created %', spec[3];
+        ELSE
+            RAISE NOTICE 'Skipped % (%.% already indexed)', spec[3], spec[1], spec[2];
+        END IF;
+    END LOOP;
+END $$;
+
+-- attendance_records is large and its session_id values are evenly spread, so the default
+-- sample underestimates their number (about 3x at 10M rows). Generic plans then expect
+-- ~200 records per session, cost per-class joins high enough to pick a parallel seq scan of
+-- attendance_sessions over idx_attendance_sessions_class_start. A bigger sample fixes it.
+ALTER TABLE attendance_records ALTER COLUMN session_id SET STATISTICS 1000;
+
+-- Refresh planner statistics for the new indexes
+ANALYZE attendance_sessions;
+ANALYZE attendance_records;
+ANALYZE attendance_counters;
+ANALYZE class_enrollments;
+ANALYZE classes;
+
+-- Display success message
+SELECT 'Migration completed successfully!' AS status;
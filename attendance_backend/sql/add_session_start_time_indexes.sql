@@ -0,0 +1,15 @@
+-- Indexes for date / date-range session lookups
+-- Date filters are half-open ranges on the raw column (start_time >= :start AND
+-- start_time < :end) instead of DATE(start_time) / TO_CHAR(...), so these turn the
+-- per-class and cross-class day/week/term queries into index range scans.
+-- CONCURRENTLY avoids blocking session writes while building; run outside a transaction.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_attendance_sessions_class_start
+ON attendance_sessions (class_id, start_time);
+
+-- Cross-class listing (/sessions/{date})
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_attendance_sessions_start_time
+ON attendance_sessions (start_time);
+
+-- Display success message
+SELECT 'Migration completed successfully!' AS status;
@@ -0,0 +1,62 @@
+-- Per-session attendance totals, written by end_session when the session closes
+-- NULL while the session is ACTIVE. Once set, later corrections to the session's records
+-- (manual marking, account deletion) recount them through refresh_session_summary_counts,
+-- so the session lists (by date / range / week) return totals without joining the records.
+
+ALTER TABLE attendance_sessions
+ADD COLUMN IF NOT EXISTS present_count INTEGER,
+ADD COLUMN IF NOT EXISTS late_count INTEGER,
+ADD COLUMN IF NOT EXISTS absent_count INTEGER,
+ADD COLUMN IF NOT EXISTS enrolled_count INTEGER;
+
+-- Recount the totals of those of the given sessions that are closed. Called by the few
+-- writers that change a closed session's records (manual marking, account deletion); the
+-- submit paths only write to ACTIVE sessions and so never need it.
+CREATE OR REPLACE FUNCTION refresh_session_summary_counts(p_session_ids INTEGER[]) RETURNS VOID AS $$
+BEGIN
+    UPDATE attendance_sessions s SET
+        present_count = r.present_count,
+        late_count = r.late_count,
+        absent_count = r.absent_count
+    FROM (
+        SELECT
+            s2.session_id,
+            COUNT(ar.session_id) FILTER (WHERE ar.status = 'PRESENT') AS present_count,
+            COUNT(ar.session_id) FILTER (WHERE ar.status = 'LATE') AS late_count,
+            COUNT(ar.session_id) FILTER (WHERE ar.status = 'ABSENT') AS absent_count
+        FROM attendance_sessions s2
+        LEFT JOIN attendance_records ar ON ar.session_id = s2.session_id
+        WHERE s2.session_id = ANY(p_session_ids) AND s2.status = 'CLOSED'
+        GROUP BY s2.session_id
+    ) r
+    WHERE s.session_id = r.session_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Earlier versions of this migration kept the totals up to date with row triggers, which
+-- ran for every record written, including every submission into an ACTIVE session
+DROP TRIGGER IF EXISTS trg_session_summary_insert_delete ON attendance_records;
+DROP TRIGGER IF EXISTS trg_session_summary_update ON attendance_records;
+DROP FUNCTION IF EXISTS apply_session_summary_counts();
+
+-- Backfill sessions that are already closed
+UPDATE attendance_sessions s SET
+    present_count = r.present_count,
+    late_count = r.late_count,
+    absent_count = r.absent_count,
+    enrolled_count = (SELECT COUNT(*) FROM class_enrollments ce WHERE ce.class_id = s.class_id)
+FROM (
+    SELECT
+        s2.session_id,
+        COUNT(ar.session_id) FILTER (WHERE ar.status = 'PRESENT') AS present_count,
+        COUNT(ar.session_id) FILTER (WHERE ar.status = 'LATE') AS late_count,
+        COUNT(ar.session_id) FILTER (WHERE ar.status = 'ABSENT') AS absent_count
+    FROM attendance_sessions s2
+    LEFT JOIN attendance_records ar ON ar.session_id = s2.session_id
+    WHERE s2.status = 'CLOSED'
+    GROUP BY s2.session_id
+) r
+WHERE s.session_id = r.session_id AND s.present_count IS NULL;
+
+-- Display success message
+SELECT 'Migration completed successfully!' AS status;
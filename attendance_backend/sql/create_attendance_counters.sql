@@ -0,0 +1,88 @@
+-- Per-(class, student) attendance counters
+-- Maintained incrementally by a trigger on attendance_records, so every write path
+-- (submit-code, SQS bulk ingest, manual marking, end_session absentees) keeps them current.
+-- Percentage endpoints read these instead of re-scanning the sessions x students history.
+-- Rebuild at any time with: python rebuild_counters.py
+
+CREATE TABLE IF NOT EXISTS attendance_counters (
+    class_id INTEGER NOT NULL REFERENCES classes(class_id) ON DELETE CASCADE,
+    student_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    total_count INTEGER NOT NULL DEFAULT 0,  -- attendance records, any status
+    present_count INTEGER NOT NULL DEFAULT 0,
+    late_count INTEGER NOT NULL DEFAULT 0,
+    absent_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (class_id, student_id)
+);
+
+CREATE OR REPLACE FUNCTION apply_attendance_counters() RETURNS TRIGGER AS $$
+DECLARE
+    v_class_id INTEGER;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT class_id INTO v_class_id FROM attendance_sessions WHERE session_id = OLD.session_id;
+        UPDATE attendance_counters SET
+            total_count = total_count - 1,
+            present_count = present_count - (OLD.status = 'PRESENT' IS TRUE)::INT,
+            late_count = late_count - (OLD.status = 'LATE' IS TRUE)::INT,
+            absent_count = absent_count - (OLD.status = 'ABSENT' IS TRUE)::INT
+        WHERE class_id = v_class_id AND student_id = OLD.student_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT class_id INTO v_class_id FROM attendance_sessions WHERE session_id = NEW.session_id;
+        INSERT INTO attendance_counters (class_id, student_id, total_count, present_count, late_count, absent_count)
+        VALUES (
+            v_class_id,
+            NEW.student_id,
+            1,
+            (NEW.status = 'PRESENT' IS TRUE)::INT,
+            (NEW.status = 'LATE' IS TRUE)::INT,
+            (NEW.status = 'ABSENT' IS TRUE)::INT
+        )
+        ON CONFLICT (class_id, student_id) DO UPDATE SET
+            total_count = attendance_counters.total_count + 1,
+            present_count = attendance_counters.present_count + EXCLUDED.present_count,
+            late_count = attendance_counters.late_count + EXCLUDED.late_count,
+            absent_count = attendance_counters.absent_count + EXCLUDED.absent_count;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_attendance_counters_insert_delete ON attendance_records;
+CREATE TRIGGER trg_attendance_counters_insert_delete
+AFTER INSERT OR DELETE ON attendance_records
+FOR EACH ROW EXECUTE FUNCTION apply_attendance_counters();
+
+-- Re-submitting the same status (the common case) doesn't touch the counters
+DROP TRIGGER IF EXISTS trg_attendance_counters_update ON attendance_records;
+CREATE TRIGGER trg_attendance_counters_update
+AFTER UPDATE ON attendance_records
+FOR EACH ROW
+WHEN (
+    OLD.status IS DISTINCT FROM NEW.status
+    OR OLD.session_id IS DISTINCT FROM NEW.session_id
+    OR OLD.student_id IS DISTINCT FROM NEW.student_id
+)
+EXECUTE FUNCTION apply_attendance_counters();
+
+-- Backfill from existing history
+BEGIN;
+LOCK TABLE attendance_records IN SHARE MODE;
+DELETE FROM attendance_counters;
+INSERT INTO attendance_counters (class_id, student_id, total_count, present_count, late_count, absent_count)
+SELECT
+    s.class_id,
+    ar.student_id,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE ar.status = 'PRESENT'),
+    COUNT(*) FILTER (WHERE ar.status = 'LATE'),
+    COUNT(*) FILTER (WHERE ar.status = 'ABSENT')
+FROM attendance_records ar
+JOIN attendance_sessions s ON s.session_id = ar.session_id
+GROUP BY s.class_id, ar.student_id;
+COMMIT;
+
+-- Display success message
+SELECT 'Migration completed successfully!' AS status;
@@ -0,0 +1,88 @@
+-- Per-class data version for conditional GETs (ETag / If-None-Match)
+-- Bumped by statement-level triggers whenever a class's enrollments or sessions change,
+-- once per class per statement. Attendance records have no trigger (it would run for every
+-- statement on the hottest table); their writers call bump_class_versions as the last step
+-- of the write transaction instead, once per batch or inside the single-row upsert (see
+-- src/core/class_versions.py). end_session's absentee insert is covered by the session
+-- UPDATE that closes it. Polling endpoints compare the client's ETag against this single
+-- row and answer 304 without running their joins.
+
+CREATE TABLE IF NOT EXISTS class_versions (
+    class_id INTEGER PRIMARY KEY REFERENCES classes(class_id) ON DELETE CASCADE,
+    version BIGINT NOT NULL DEFAULT 1
+);
+
+-- Classes being deleted are skipped (the cascade removes their version row anyway)
+CREATE OR REPLACE FUNCTION bump_class_versions(p_class_ids INTEGER[]) RETURNS VOID AS $$
+BEGIN
+    INSERT INTO class_versions (class_id, version)
+    SELECT c.class_id, 1
+    FROM classes c
+    WHERE c.class_id = ANY(p_class_ids)
+    ORDER BY c.class_id  -- consistent lock order across concurrent writers
+    ON CONFLICT (class_id) DO UPDATE SET version = class_versions.version + 1;
+END;
+$$ LANGUAGE plpgsql;
+
+-- attendance_sessions / class_enrollments: rows carry class_id directly
+CREATE OR REPLACE FUNCTION bump_class_versions_from_class_rows() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM bump_class_versions(ARRAY(SELECT DISTINCT class_id FROM old_rows));
+    ELSE
+        PERFORM bump_class_versions(ARRAY(SELECT DISTINCT class_id FROM new_rows));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Earlier versions of this migration also had attendance_records triggers
+DROP TRIGGER IF EXISTS trg_class_version_records_insert ON attendance_records;
+DROP TRIGGER IF EXISTS trg_class_version_records_update ON attendance_records;
+DROP TRIGGER IF EXISTS trg_class_version_records_delete ON attendance_records;
+DROP FUNCTION IF EXISTS bump_class_versions_from_records();
+
+-- Transition tables need one trigger per event
+DROP TRIGGER IF EXISTS trg_class_version_sessions_insert ON attendance_sessions;
+CREATE TRIGGER trg_class_version_sessions_insert
+AFTER INSERT ON attendance_sessions
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION bump_class_versions_from_class_rows();
+
+DROP TRIGGER IF EXISTS trg_class_version_sessions_update ON attendance_sessions;
+CREATE TRIGGER trg_class_version_sessions_update
+AFTER UPDATE ON attendance_sessions
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION bump_class_versions_from_class_rows();
+
+DROP TRIGGER IF EXISTS trg_class_version_sessions_delete ON attendance_sessions;
+CREATE TRIGGER trg_class_version_sessions_delete
+AFTER DELETE ON attendance_sessions
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION bump_class_versions_from_class_rows();
+
+DROP TRIGGER IF EXISTS trg_class_version_enrollments_insert ON class_enrollments;
+CREATE TRIGGER trg_class_version_enrollments_insert
+AFTER INSERT ON class_enrollments
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION bump_class_versions_from_class_rows();
+
+DROP TRIGGER IF EXISTS trg_class_version_enrollments_update ON class_enrollments;
+CREATE TRIGGER trg_class_version_enrollments_update
+AFTER UPDATE ON class_enrollments
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION bump_class_versions_from_class_rows();
+
+DROP TRIGGER IF EXISTS trg_class_version_enrollments_delete ON class_enrollments;
+CREATE TRIGGER trg_class_version_enrollments_delete
+AFTER DELETE ON class_enrollments
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION bump_class_versions_from_class_rows();
+
+-- Seed a version row for every existing class
+INSERT INTO class_versions (class_id)
+SELECT class_id FROM classes
+ON CONFLICT (class_id) DO NOTHING;
+
+-- Display success message
+SELECT 'Migration completed successfully!' AS status;
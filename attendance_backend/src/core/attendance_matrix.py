@@ -0,0 +1,187 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .cache import TTLCache
+from .class_versions import class_version
+from .query_registry import register_query
+from .config import ANALYTICS_MATRIX_TTL, ANALYTICS_MATRIX_MAX_CLASSES
+
+
+# In-memory student x session status matrix per class, for the faculty analytics endpoints.
+# A class's history is loaded once (three queries) into an int8 matrix; percentages,
+# thresholds, streaks and per-session totals are then vectorized NumPy reductions.
+# Each cached matrix remembers the class's class_versions version it was loaded at; every
+# use re-reads the version (one primary-key lookup) and rebuilds the matrix if any instance
+# has written to the class since. Unused matrices expire after ANALYTICS_MATRIX_TTL seconds.
+
+np = None  # imported on first load, so numpy stays off the cold-start path
+
+
+def _numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+NO_RECORD = 0
+STATUS_CODES = {"PRESENT": 1, "LATE": 2, "ABSENT": 3}
+
+
+class ClassMatrix:
+    """Attendance status of every enrolled student (rows) in every session (columns)."""
+
+    def __init__(self, class_id: int, version: int, students: List[Dict[str, Any]],
+                 session_ids: List[int], marks: Iterable[Tuple[int, int, str]]):
+        _numpy()
+        self.class_id = class_id
+        self.version = version
+        self.students = students  # enrollment metadata, in display order
+        self.student_ids = np.array([s["student_id"] for s in students], dtype=np.int64)
+        self._student_index = {sid: i for i, sid in enumerate(self.student_ids.tolist())}
+        self._session_index = {sid: j for j, sid in enumerate(session_ids)}
+        self.session_ids = np.array(session_ids, dtype=np.int64)
+        self.n_sessions = len(session_ids)
+        self.status = np.zeros((len(students), self.n_sessions), dtype=np.int8)
+
+        rows, cols, codes = [], [], []
+        for session_id, student_id, status in marks:
+            i = self._student_index.get(student_id)
+            j = self._session_index.get(session_id)
+            code = STATUS_CODES.get(status)
+            if i is not None and j is not None and code is not None:
+                rows.append(i)
+                cols.append(j)
+                codes.append(code)
+        self.status[rows, cols] = codes
+
+    # ---- vectorized queries ----
+
+    def counts(self, code: int, axis: int = 1):
+        """Number of cells equal to `code` per student (axis=1) or per session (axis=0)."""
+        return np.count_nonzero(self.status == code, axis=axis)
+
+    def attended(self):
+        """PRESENT + LATE sessions per student."""
+        status = self.status
+        return np.count_nonzero((status == STATUS_CODES["PRESENT"]) | (status == STATUS_CODES["LATE"]), axis=1)
+
+    def attendance_percentages(self):
+        """(PRESENT + LATE) / all sessions of the class, rounded to 2 places; 0 with no sessions."""
+        if self.n_sessions == 0:
+            return np.zeros(len(self.students))
+        # Integer half-up rounding, matching Postgres ROUND(numeric) (np.round is half-even)
+        n = self.n_sessions
+        return ((self.attended() * 20000 + n) // (2 * n)) / 100.0
+
+    def present_percentages(self):
+        """PRESENT / recorded sessions per student, and the recorded-session counts
+        (students with no records get NaN)."""
+        recorded = np.count_nonzero(self.status != NO_RECORD, axis=1)
+        present = self.counts(STATUS_CODES["PRESENT"])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct = np.where(recorded > 0, present * 100.0 / recorded, np.nan)
+        return pct, recorded
+
+    def pct_mask(self, pct, min_pct: Optional[float] = None, max_pct: Optional[float] = None):
+        mask = np.ones(len(pct), dtype=bool)
+        if min_pct is not None:
+            mask &= pct >= min_pct
+        if max_pct is not None:
+            mask &= pct <= max_pct
+        return mask
+
+    def session_totals(self) -> List[Dict[str, int]]:
+        present = self.counts(STATUS_CODES["PRESENT"], axis=0).tolist()
+        late = self.counts(STATUS_CODES["LATE"], axis=0).tolist()
+        absent = self.counts(STATUS_CODES["ABSENT"], axis=0).tolist()
+        return [
+            {"session_id": sid, "present": p, "late": l, "absent": a}
+            for sid, p, l, a in zip(self.session_ids.tolist(), present, late, absent)
+        ]
+
+    def streaks(self):
+        """Per student: current run of consecutive ABSENT sessions (ending at the latest
+        session) and the longest run of attended (PRESENT/LATE) sessions."""
+        status = self.status
+        n_students, n = status.shape
+        if n == 0:
+            zeros = np.zeros(n_students, dtype=np.int64)
+            return zeros, zeros
+
+        absent = status == STATUS_CODES["ABSENT"]
+        # Index of the first non-absent cell counting back from the latest session
+        rev_not_absent = ~absent[:, ::-1]
+        current_absent = np.where(rev_not_absent.any(axis=1), rev_not_absent.argmax(axis=1), n)
+
+        attended = (status == STATUS_CODES["PRESENT"]) | (status == STATUS_CODES["LATE"])
+        idx = np.arange(n)
+        last_break = np.maximum.accumulate(np.where(attended, -1, idx), axis=1)
+        run = np.where(attended, idx - last_break, 0)
+        return current_absent, run.max(axis=1)
+
+
+_students_sql = register_query(
+    "attendance_matrix.students",
+    """
+    SELECT
+        u.user_id AS student_id,
+        u.name AS student_name,
+        u.email,
+        ce.roll_number,
+        ce.section
+    FROM class_enrollments ce
+    JOIN users u ON ce.student_id = u.user_id
+    WHERE ce.class_id = :class_id
+    ORDER BY ce.section, ce.roll_number, u.name
+    """
+)
+
+_sessions_sql = register_query(
+    "attendance_matrix.sessions",
+    """
+    SELECT session_id FROM attendance_sessions
+    WHERE class_id = :class_id
+    ORDER BY start_time, session_id
+    """
+)
+
+_marks_sql = register_query(
+    "attendance_matrix.marks",
+    """
+    SELECT ar.session_id, ar.student_id, ar.status
+    FROM attendance_records ar
+    JOIN attendance_sessions s ON s.session_id = ar.session_id
+    WHERE s.class_id = :class_id
+    """
+)
+
+_matrices = TTLCache(maxsize=ANALYTICS_MATRIX_MAX_CLASSES, ttl=ANALYTICS_MATRIX_TTL)
+
+
+async def load(conn, class_id: int, version: int) -> ClassMatrix:
+    """Load a class's full history into a matrix and cache it under `version`, which must
+    have been read first (a write landing in between only causes one extra reload)"""
+    params = {"class_id": class_id}
+    students = [dict(r._mapping) for r in await conn.execute(_students_sql, params)]
+    session_ids = [r.session_id for r in await conn.execute(_sessions_sql, params)]
+    marks = await conn.execute(_marks_sql, params)
+    matrix = ClassMatrix(class_id, version, students, session_ids, marks)
+    _matrices.set(class_id, matrix)
+    return matrix
+
+
+async def get(conn, class_id: int) -> ClassMatrix:
+    """Return the class's matrix, reloading it on a miss, expiry or newer class version"""
+    version = await class_version(conn, class_id)
+    matrix = _matrices.get(class_id)
+    if matrix is None or matrix.version != version:
+        matrix = await load(conn, class_id, version)
+    return matrix
+
+
+def invalidate_class(class_id: int) -> None:
+    _matrices.pop(class_id)
+
+
+def clear() -> None:
+    _matrices.clear()
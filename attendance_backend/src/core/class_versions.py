@@ -0,0 +1,71 @@
+from typing import Iterable, Optional, Tuple
+from fastapi import Request, Response
+from .query_registry import register_query
+
+
+# Conditional GETs for the polled attendance views, driven by class_versions.version.
+# Enrollment and session changes bump it through triggers (sql/create_class_versions.sql).
+# Attendance records have no trigger; their writers bump it as the last step of the write
+# transaction instead: once per batch for the SQS and write-behind paths (bump), folded
+# into the write statement itself for single submissions, so the class's version row is
+# locked only for the commit and no extra round trip is spent. The version is read before
+# the view's join, so a write landing in between can only tag newer data with an older ETag
+# (one extra refetch on the next poll), never the reverse.
+
+_class_version_sql = register_query(
+    "class_versions.by_class",
+    "SELECT version FROM class_versions WHERE class_id = :class_id",
+)
+
+_session_class_version_sql = register_query(
+    "class_versions.by_session",
+    """
+    SELECT s.class_id, COALESCE(v.version, 0) AS version
+    FROM attendance_sessions s
+    LEFT JOIN class_versions v ON v.class_id = s.class_id
+    WHERE s.session_id = :session_id
+    """
+)
+
+_bump_sql = register_query(
+    "class_versions.bump",
+    "SELECT bump_class_versions(CAST(:class_ids AS INTEGER[]))",
+)
+
+CACHE_CONTROL = "private, no-cache"  # browsers may store it but must revalidate each time
+
+
+async def class_version(conn, class_id: int) -> int:
+    """Current version of a class; 0 if it has never changed since the migration"""
+    row = (await conn.execute(_class_version_sql, {"class_id": class_id})).fetchone()
+    return row.version if row else 0
+
+
+async def session_class_version(conn, session_id: int) -> Optional[Tuple[int, int]]:
+    """(class_id, version) for a session's class, or None if the session doesn't exist"""
+    row = (await conn.execute(_session_class_version_sql, {"session_id": session_id})).fetchone()
+    return (row.class_id, row.version) if row else None
+
+
+async def bump(conn, class_ids: Iterable[int]) -> None:
+    """Bump the given classes' versions inside the caller's write transaction; issue it
+    last, just before commit"""
+    await conn.execute(_bump_sql, {"class_ids": sorted(set(class_ids))})
+
+
+def make_etag(class_id: int, version: int) -> str:
+    return f'W/"c{class_id}-v{version}"'
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Set the validator headers; return a 304 response if the client already has `etag`"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return None
+    # Weak comparison: W/ prefixes are ignored
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in candidates or etag.removeprefix("W/") in candidates:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return None
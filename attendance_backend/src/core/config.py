@@ -14,6 +14,82 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 # Database
 DB_URL = os.getenv("DB_URL")
 
+# Connection pooling — "null" (default) opens a fresh connection per checkout, which suits
+# AWS Lambda; "queue" keeps a sized pool for long-running uvicorn/Docker processes;
+# "warm" keeps a single connection open across warm Lambda invocations (extra connections
+# up to DB_MAX_OVERFLOW are opened on demand and closed after use).
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "null").lower()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; keep below server idle timeouts
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# warm mode: seconds a container may sit idle before its connection is liveness-checked
+WARM_CONN_CHECK_AFTER = float(os.getenv("WARM_CONN_CHECK_AFTER", "30"))
+# Server-side prepared statements kept per connection by asyncpg (0 disables the cache);
+# should cover every registered query (see query_registry)
+DB_PREPARED_STATEMENT_CACHE_SIZE = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", "256"))
+# Statements slower than this (milliseconds) are logged with their parameter shape
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+
+# Seconds an active session (metadata + enrolled students) stays in the submit-code cache
+SESSION_CACHE_TTL = int(os.getenv("SESSION_CACHE_TTL", "300"))
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "4096"))
+
+# Submit-code cooldown — "memory" (per-process LRU) or "shared" (shared-store backend)
+COOLDOWN_BACKEND = os.getenv("COOLDOWN_BACKEND", "memory").lower()
+COOLDOWN_SECONDS = int(os.getenv("COOLDOWN_SECONDS", "60"))
+COOLDOWN_MAX_ENTRIES = int(os.getenv("COOLDOWN_MAX_ENTRIES", "100000"))
+
+# Opt-in write-behind for submit-code: validated submissions are group-committed in batches
+# flushed every WRITE_BUFFER_FLUSH_MS milliseconds or once WRITE_BUFFER_MAX_BATCH are queued
+ATTENDANCE_WRITE_BEHIND = os.getenv("ATTENDANCE_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+WRITE_BUFFER_FLUSH_MS = int(os.getenv("WRITE_BUFFER_FLUSH_MS", "20"))
+WRITE_BUFFER_MAX_BATCH = int(os.getenv("WRITE_BUFFER_MAX_BATCH", "200"))
+
+# Rows fetched per round trip from the server-side cursor behind streaming exports
+EXPORT_STREAM_BATCH = int(os.getenv("EXPORT_STREAM_BATCH", "500"))
+
+# Read-through cache for class lists, class details and rosters (seconds / entries / bytes)
+METADATA_CACHE_TTL = float(os.getenv("METADATA_CACHE_TTL", "300"))
+METADATA_CACHE_MAX_ENTRIES = int(os.getenv("METADATA_CACHE_MAX_ENTRIES", "2048"))
+METADATA_CACHE_MAX_BYTES = int(os.getenv("METADATA_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Live attendance stream (SSE): events buffered per viewer before it is resynced from a
+# snapshot, total concurrent viewers per process, and keep-alive interval in seconds
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "256"))
+LIVE_MAX_SUBSCRIBERS = int(os.getenv("LIVE_MAX_SUBSCRIBERS", "500"))
+LIVE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "15"))
+
+# In-memory student x session matrices behind the faculty analytics endpoints
+ANALYTICS_MATRIX_TTL = int(os.getenv("ANALYTICS_MATRIX_TTL", "300"))
+ANALYTICS_MATRIX_MAX_CLASSES = int(os.getenv("ANALYTICS_MATRIX_MAX_CLASSES", "64"))
+
+# bcrypt worker pool: threads doing password hashing, and how many jobs may be queued or
+# running before login/register/reset requests get a 503 with Retry-After
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_QUEUE = int(os.getenv("HASH_MAX_QUEUE", "16"))
+
+# Email outbox — "sqs" (EMAIL_QUEUE_URL), "memory" (tests) or "file" (JSON lines, local dev).
+# Messages are sent in batches of up to 10, flushed every EMAIL_OUTBOX_FLUSH_MS milliseconds
+EMAIL_OUTBOX_BACKEND = os.getenv("EMAIL_OUTBOX_BACKEND", "sqs").lower()
+EMAIL_OUTBOX_FILE = os.getenv("EMAIL_OUTBOX_FILE", "email_outbox.jsonl")
+EMAIL_OUTBOX_FLUSH_MS = int(os.getenv("EMAIL_OUTBOX_FLUSH_MS", "50"))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "3"))
+
+# Logging — "json" (one object per line, for CloudWatch / log shippers) or "text"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+
+# Sampling profiler (off by default): fraction of requests profiled, sampling interval,
+# and rolling retention as PROFILER_WINDOWS windows of PROFILER_WINDOW_SECONDS each
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "0.01"))
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "10"))
+PROFILER_WINDOW_SECONDS = int(os.getenv("PROFILER_WINDOW_SECONDS", "60"))
+PROFILER_WINDOWS = int(os.getenv("PROFILER_WINDOWS", "15"))
+PROFILER_MAX_STACKS = int(os.getenv("PROFILER_MAX_STACKS", "5000"))  # distinct stacks per route window
+
 # CORS / Frontend
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
 
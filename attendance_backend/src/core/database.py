@@ -1,9 +1,20 @@
 import os
+import time
 from sqlalchemy import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from urllib.parse import urlparse, parse_qs, urlunparse, urlencode
-from .config import DB_URL
+from .config import (
+    DB_URL,
+    DB_POOL_MODE,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_PREPARED_STATEMENT_CACHE_SIZE,
+)
 
 
 # Helper to fix postgresql protocol for asyncpg
@@ -13,7 +24,7 @@ def get_db_url():
         url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
 
     # Parse sslmode from URL and remove it (pass to connect_args instead)
-    connect_args = {}
+    connect_args = {"prepared_statement_cache_size": DB_PREPARED_STATEMENT_CACHE_SIZE}
     if url:
         parsed = urlparse(url)
         query_params = parse_qs(parsed.query)
@@ -33,11 +44,69 @@ final_db_url, connect_args = get_db_url()
 if not final_db_url:
     raise ValueError("DB_URL is not set in environment variables")
 
-# Optimized for serverless environments (AWS Lambda)
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long checkouts wait and how long new connections take."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.connections_created = 0
+        self.connect_seconds_total = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def _create_connection(self):
+        started = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            self.connections_created += 1
+            self.connect_seconds_total += time.perf_counter() - started
+
+
+def _engine_options() -> dict:
+    if DB_POOL_MODE == "null":
+        # Optimized for serverless environments (AWS Lambda)
+        return {"poolclass": NullPool}  # Do not maintain a persistent connection pool
+    if DB_POOL_MODE == "queue":
+        # Long-running processes (uvicorn/Docker) reuse connections across requests
+        return {
+            "poolclass": TimedQueuePool,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+        }
+    if DB_POOL_MODE == "warm":
+        # One connection kept open across warm Lambda invocations (needs the container's
+        # long-lived loop, see warm_state); liveness is checked after idle periods instead
+        # of pinging on every checkout
+        return {
+            "poolclass": TimedQueuePool,
+            "pool_size": 1,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": False,
+        }
+    raise ValueError(f"Unknown DB_POOL_MODE '{DB_POOL_MODE}' (expected 'null', 'queue' or 'warm')")
+
+
 engine = create_async_engine(
     final_db_url,
-    poolclass=NullPool,  # Do not maintain a persistent connection pool
     connect_args=connect_args,
+    **_engine_options(),
 )
 
 AsyncSessionLocal = sessionmaker(
@@ -45,6 +114,28 @@ AsyncSessionLocal = sessionmaker(
 )
 
 
+def get_pool_stats() -> dict:
+    """Snapshot of the engine's connection pool, used to size it under load."""
+    pool = engine.pool
+    if not isinstance(pool, TimedQueuePool):
+        return {"mode": DB_POOL_MODE}
+    checkouts = pool.checkouts
+    return {
+        "mode": DB_POOL_MODE,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checkouts": checkouts,
+        "avg_wait_ms": round(pool.wait_seconds_total * 1000 / checkouts, 3) if checkouts else 0.0,
+        "max_wait_ms": round(pool.wait_seconds_max * 1000, 3),
+        "connections_created": pool.connections_created,
+        "avg_connect_ms": round(pool.connect_seconds_total * 1000 / pool.connections_created, 3)
+        if pool.connections_created else 0.0,
+    }
+
+
 # Dependency to use in routes
 async def get_db():
     async with AsyncSessionLocal() as session:
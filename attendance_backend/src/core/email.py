@@ -1,16 +1,23 @@
 import os
-import json
-import boto3
+from .config import EMAIL_OUTBOX_BACKEND, EMAIL_OUTBOX_FILE, EMAIL_OUTBOX_FLUSH_MS, EMAIL_OUTBOX_MAX_ATTEMPTS
+from .log import get_logger
+from .outbox import Outbox, build_transport
 
 # Ensure you have the SQS URL in your .env
 EMAIL_QUEUE_URL = os.getenv("EMAIL_QUEUE_URL")
 
-# Initialize Boto3 client outside the function for connection reuse
-# Ensure your VPC has an Interface Endpoint for SQS!
-sqs_client = boto3.client('sqs', region_name='ap-south-1')
+logger = get_logger("email")
+
+# Messages are batched into SendMessageBatch calls; the boto3 client is created on first
+# use and reused afterwards. Ensure your VPC has an Interface Endpoint for SQS!
+email_outbox = Outbox(
+    build_transport(EMAIL_OUTBOX_BACKEND, EMAIL_QUEUE_URL, "ap-south-1", EMAIL_OUTBOX_FILE),
+    max_delay=EMAIL_OUTBOX_FLUSH_MS / 1000,
+    max_attempts=EMAIL_OUTBOX_MAX_ATTEMPTS,
+)
 
 async def send_password_reset_email(email: str, token: str, name: str, frontend_url: str = None) -> bool:
-    """Drops the password reset payload into SQS for the external worker to process"""
+    """Drops the password reset payload into the email queue for the external worker to process"""
     try:
         frontend_url_env = os.getenv("FRONTEND_URL", "http://localhost:5173")
         base_url = frontend_url if frontend_url else frontend_url_env
@@ -22,16 +29,13 @@ async def send_password_reset_email(email: str, token: str, name: str, frontend_
             "frontend_url": base_url
         }
 
-        print(f"📥 [QUEUE] Dropping reset email task into SQS for: {email}")
-        
-        response = sqs_client.send_message(
-            QueueUrl=EMAIL_QUEUE_URL,
-            MessageBody=json.dumps(payload)
-        )
-        
-        print(f"✅ [QUEUE] Task queued successfully. MessageId: {response.get('MessageId')}")
+        if not await email_outbox.send(payload):
+            logger.error("Outbox rejected reset email", extra={"email": email})
+            return False
+
+        logger.info("Reset email queued", extra={"email": email})
         return True
-        
-    except Exception as e:
-        print(f"❌ [QUEUE] Failed to queue email task: {type(e).__name__}: {str(e)}")
-        return False
\ No newline at end of file
+
+    except Exception:
+        logger.exception("Failed to queue reset email", extra={"email": email})
+        return False
@@ -0,0 +1,100 @@
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from .config import HASH_WORKERS, HASH_MAX_QUEUE
+from .request_timing import current_timings
+
+
+# bcrypt costs ~200 ms of CPU per call. Running it inline in an async route blocks the event
+# loop for that long, so hashing and verification go through a small dedicated thread pool
+# (the bcrypt extension releases the GIL while it works). The backlog is capped: once
+# HASH_MAX_QUEUE jobs are queued or running, new ones are refused with a 503 + Retry-After
+# instead of piling up behind a login burst.
+
+
+class HashPool:
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._depth = 0  # jobs queued or running
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+        self._run_max = 0.0
+
+    def _retry_after(self) -> int:
+        """Seconds until the current backlog should have drained, at the observed job time."""
+        avg_run = self._run_total / self.completed if self.completed else 0.25
+        return max(1, math.ceil(self._depth * avg_run / self.workers))
+
+    def _call(self, enqueued_at: float, fn, args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self._depth -= 1
+                self.completed += 1
+                wait, run = started - enqueued_at, finished - started
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+                self._run_total += run
+                self._run_max = max(self._run_max, run)
+
+    def _release_if_cancelled(self, job) -> None:
+        # A job cancelled while still queued (the awaiting request went away) never reaches
+        # _call, so its slot is given back here instead
+        if job.cancelled():
+            with self._lock:
+                self._depth -= 1
+
+    async def run(self, fn, *args):
+        """Run `fn(*args)` on the pool, or raise 503 if the backlog is over budget."""
+        with self._lock:
+            if self._depth >= self.max_queue:
+                self.rejected += 1
+                retry_after = self._retry_after()
+                raise HTTPException(
+                    status_code=503,
+                    detail="Server is busy, please try again shortly.",
+                    headers={"Retry-After": str(retry_after)},
+                )
+            self._depth += 1
+            self.submitted += 1
+        enqueued_at = time.perf_counter()
+        job = self._executor.submit(self._call, enqueued_at, fn, args)
+        job.add_done_callback(self._release_if_cancelled)
+        try:
+            return await asyncio.wrap_future(job)
+        finally:
+            timings = current_timings()
+            if timings is not None:
+                timings.hash += time.perf_counter() - enqueued_at  # queueing included
+
+    def stats(self) -> dict:
+        with self._lock:
+            completed = self.completed or 1
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "depth": self._depth,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "avg_wait_ms": round(self._wait_total / completed * 1000, 2),
+                "max_wait_ms": round(self._wait_max * 1000, 2),
+                "avg_run_ms": round(self._run_total / completed * 1000, 2),
+                "max_run_ms": round(self._run_max * 1000, 2),
+            }
+
+
+hash_pool = HashPool(workers=HASH_WORKERS, max_queue=HASH_MAX_QUEUE)
@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import Iterable, Tuple
+from .pubsub import Broker
+from .config import LIVE_QUEUE_SIZE, LIVE_MAX_SUBSCRIBERS
+
+
+# Live attendance feed per session: the submit-code and manual-mark paths publish each
+# committed mark, end_session publishes the final roster, and the faculty stream endpoint
+# fans them out to viewers. Timestamps are naive UTC, like attendance_records.marked_at.
+
+broker = Broker(queue_size=LIVE_QUEUE_SIZE, max_subscribers=LIVE_MAX_SUBSCRIBERS)
+
+
+def publish_mark(session_id: int, student_id: int, status: str) -> None:
+    broker.publish(session_id, {
+        "type": "mark",
+        "student_id": student_id,
+        "status": status,
+        "marked_at": datetime.utcnow().isoformat(),
+    })
+
+
+def publish_closed(session_id: int, marks: Iterable[Tuple[int, str]]) -> None:
+    broker.publish(session_id, {
+        "type": "closed",
+        "marks": [{"student_id": student_id, "status": status} for student_id, status in marks],
+    })
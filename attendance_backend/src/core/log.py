@@ -0,0 +1,92 @@
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from .config import LOG_FORMAT, LOG_LEVEL
+
+
+# Application logging. Loggers only put records on an in-memory queue; a single listener
+# thread formats them and writes to stdout, so request handlers never block on console or
+# file I/O. Records are structured: pass context as `extra={...}` rather than formatting
+# it into the message, and it comes out as separate JSON fields (LOG_FORMAT=json, default)
+# or key=value pairs (LOG_FORMAT=text, for local development).
+
+ROOT = "attendx"
+
+# Attributes every LogRecord has; anything else on a record came from `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+def _extra(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_extra(record),
+        }
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"{self.formatTime(record)} {record.levelname} {record.name}: {record.getMessage()}"
+        for key, value in _extra(record).items():
+            line += f" {key}={value}"
+        return f"{line}\n{record.exc_text}" if record.exc_text else line
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve args and tracebacks now (they may not outlive the caller), but leave the
+        # formatting of the line itself to the listener thread
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging() -> None:
+    """Route the app's loggers through the queue; safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+
+    root = logging.getLogger(ROOT)
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(_QueueHandler(records))
+    root.propagate = False
+
+    _listener = QueueListener(records, output)
+    _listener.start()
+
+
+def flush_logs() -> None:
+    """Block until every queued record is written (before a Lambda freeze or exit)."""
+    if _listener is None:
+        return
+    _listener.stop()  # drains the queue, then joins the thread
+    _listener.start()
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT}.{name}")
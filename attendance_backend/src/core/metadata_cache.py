@@ -0,0 +1,148 @@
+import asyncio
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from .config import METADATA_CACHE_TTL, METADATA_CACHE_MAX_ENTRIES, METADATA_CACHE_MAX_BYTES
+
+
+# Read-through cache for slow-changing class metadata (class lists, class details, rosters).
+# Keys are (entity, id) tuples, e.g. ("faculty_classes", 7). Entries expire after
+# METADATA_CACHE_TTL seconds, which bounds staleness from writes made on other instances;
+# writes on this instance invalidate the affected entries explicitly after they commit.
+# Least recently used entries are evicted once either the entry or the byte budget is exceeded.
+
+Key = Tuple[str, Hashable]
+_MISSING = object()
+
+
+def _sizeof(value: Any) -> int:
+    """Approximate deep size of a JSON-like value (dicts, lists, tuples, scalars)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_sizeof(v) for v in value)
+    return size
+
+
+class MetadataCache:
+    """TTL + LRU cache bounded by entry count and approximate memory, with hit/miss metrics.
+    Not thread-safe; meant to be used from the event loop thread."""
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Key, tuple]" = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        # Bumped on invalidation so a load that raced a write does not store stale data
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0  # bumped by clear()
+        self._loading: Dict[Key, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Key, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        if time.monotonic() >= entry[0]:
+            self._remove(key)
+            self.expirations += 1
+            return default
+        self._data.move_to_end(key)
+        return entry[2]
+
+    def set(self, key: Key, value: Any) -> None:
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return  # would evict everything else; serve it uncached
+        self._remove(key)
+        self._data[key] = (time.monotonic() + self.ttl, size, value)
+        self._bytes += size
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def get_or_load(self, key: Key, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for `key`, or await `loader()` and cache its result.
+        Concurrent misses on the same key share one load; None results are not cached."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        generation = self._generation(key[0])
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            value = await loader()
+        except BaseException as e:
+            # Includes cancellation of the loading request: waiters get the same error
+            # rather than a cancel of their own shielded await
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        else:
+            future.set_result(value)
+            if value is not None and self._generation(key[0]) == generation:
+                self.set(key, value)
+            return value
+        finally:
+            self._loading.pop(key, None)
+
+    def invalidate(self, entity: str, id: Optional[Hashable] = None) -> None:
+        """Drop one entry, or every entry of `entity` when no id is given."""
+        self._generations[entity] = self._generations.get(entity, 0) + 1
+        self.invalidations += 1
+        if id is not None:
+            self._remove((entity, id))
+            return
+        for key in [k for k in self._data if k[0] == entity]:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._epoch += 1
+        self._data.clear()
+        self._bytes = 0
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+    def _generation(self, entity: str) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(entity, 0)
+
+    def _remove(self, key: Key) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+
+metadata_cache = MetadataCache(
+    ttl=METADATA_CACHE_TTL,
+    max_entries=METADATA_CACHE_MAX_ENTRIES,
+    max_bytes=METADATA_CACHE_MAX_BYTES,
+)
@@ -0,0 +1,115 @@
+import bisect
+from typing import TYPE_CHECKING, Dict, Iterable, Tuple
+
+if TYPE_CHECKING:
+    from .query_registry import StatementStats
+    from .request_timing import RequestTimings
+
+
+# Aggregates behind GET /metrics, rendered in the Prometheus text exposition format
+# (version 0.0.4). Everything is per process: each uvicorn worker or Lambda container
+# reports its own counters since it started, and Prometheus sums them across instances.
+
+# Upper bounds of the histogram buckets: seconds for latencies, statements per request
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+STATEMENT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class Histogram:
+    __slots__ = ("bounds", "buckets", "count", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class RouteStats:
+    __slots__ = ("duration", "statements", "db_seconds")
+
+    def __init__(self):
+        self.duration = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_COUNT_BUCKETS)
+        self.db_seconds = Histogram(LATENCY_BUCKETS)
+
+
+_routes: Dict[Tuple[str, str], RouteStats] = {}
+
+
+def observe_request(method: str, route: str, duration: float, timings: "RequestTimings") -> None:
+    """Record a finished request's latency and database usage, by route template."""
+    stats = _routes.get((method, route))
+    if stats is None:
+        stats = _routes[(method, route)] = RouteStats()
+    stats.duration.observe(duration)
+    stats.statements.observe(timings.statements)
+    stats.db_seconds.observe(timings.db)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _histogram_lines(name: str, histogram: Histogram, **labels) -> Iterable[str]:
+    cumulative = 0
+    for bound, count in zip((*histogram.bounds, "+Inf"), histogram.buckets):
+        cumulative += count
+        yield f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}"
+    yield f"{name}_sum{_labels(**labels)} {histogram.sum}"
+    yield f"{name}_count{_labels(**labels)} {histogram.count}"
+
+
+def render(statements: Dict[str, "StatementStats"], pool: dict) -> str:
+    """Prometheus text for the per-statement and per-route stats plus the pool gauges."""
+    lines = [
+        "# HELP attendx_db_statement_duration_seconds Execution time of each registered statement.",
+        "# TYPE attendx_db_statement_duration_seconds histogram",
+    ]
+    for name, stats in sorted(statements.items()):
+        lines.extend(_histogram_lines("attendx_db_statement_duration_seconds", stats.latency, query=name))
+
+    for metric, attr, help_text in (
+        ("attendx_db_statement_errors_total", "errors", "Statements that raised a database error."),
+        ("attendx_db_statement_slow_total", "slow", "Statements slower than DB_SLOW_QUERY_MS."),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        lines.extend(
+            f"{metric}{_labels(query=name)} {getattr(stats, attr)}" for name, stats in sorted(statements.items())
+        )
+
+    lines += [
+        "# HELP attendx_http_request_duration_seconds Time to serve each HTTP request, body included.",
+        "# TYPE attendx_http_request_duration_seconds histogram",
+    ]
+    for (method, route), stats in sorted(_routes.items()):
+        lines.extend(_histogram_lines("attendx_http_request_duration_seconds", stats.duration,
+                                      method=method, route=route))
+    lines += [
+        "# HELP attendx_http_request_db_statements Database statements run per HTTP request.",
+        "# TYPE attendx_http_request_db_statements histogram",
+    ]
+    for (method, route), stats in sorted(_routes.items()):
+        lines.extend(_histogram_lines("attendx_http_request_db_statements", stats.statements,
+                                      method=method, route=route))
+    lines += [
+        "# HELP attendx_http_request_db_seconds Time spent in database statements per HTTP request.",
+        "# TYPE attendx_http_request_db_seconds histogram",
+    ]
+    for (method, route), stats in sorted(_routes.items()):
+        lines.extend(_histogram_lines("attendx_http_request_db_seconds", stats.db_seconds,
+                                      method=method, route=route))
+
+    for key, value in pool.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines += [f"# TYPE attendx_db_pool_{key} gauge", f"attendx_db_pool_{key} {value}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+from .log import get_logger
+from .write_buffer import WriteBuffer
+
+
+# Notification outbox: messages are buffered for a few milliseconds and handed to the queue
+# in batches of up to 10 (the SQS SendMessageBatch limit). Network calls run off the event
+# loop. Entries the queue rejects with a retryable error are re-sent with backoff; each
+# caller awaits the batch its message went out in and learns whether it was queued.
+
+SQS_MAX_BATCH = 10
+
+logger = get_logger("outbox")
+
+# (entry id, message body) pairs in; {entry id: retryable} for every entry that failed out
+Entries = List[Tuple[str, str]]
+Failures = Dict[str, bool]
+
+
+class QueueTransport:
+    async def send_batch(self, entries: Entries) -> Failures:
+        raise NotImplementedError
+
+
+class SQSTransport(QueueTransport):
+    """Amazon SQS via boto3's blocking client, run in a worker thread."""
+
+    def __init__(self, queue_url: str, region_name: str):
+        self.queue_url = queue_url
+        self.region_name = region_name
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("sqs", region_name=self.region_name)
+        return self._client
+
+    def _send(self, entries: Entries) -> Failures:
+        response = self._get_client().send_message_batch(
+            QueueUrl=self.queue_url,
+            Entries=[{"Id": entry_id, "MessageBody": body} for entry_id, body in entries],
+        )
+        # SenderFault=True means the message itself is bad; re-sending won't help
+        return {f["Id"]: not f.get("SenderFault", False) for f in response.get("Failed", [])}
+
+    async def send_batch(self, entries: Entries) -> Failures:
+        return await asyncio.to_thread(self._send, entries)
+
+
+class MemoryTransport(QueueTransport):
+    """Keeps sent messages in a list; for tests and local runs without AWS."""
+
+    def __init__(self):
+        self.messages: List[dict] = []
+
+    async def send_batch(self, entries: Entries) -> Failures:
+        self.messages.extend(json.loads(body) for _, body in entries)
+        return {}
+
+
+class FileTransport(QueueTransport):
+    """Appends one JSON message per line to a local file, so a dev worker can tail it."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _append(self, entries: Entries) -> None:
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            for _, body in entries:
+                f.write(body + "\n")
+
+    async def send_batch(self, entries: Entries) -> Failures:
+        await asyncio.to_thread(self._append, entries)
+        return {}
+
+
+class Outbox:
+    def __init__(self, transport: QueueTransport, max_delay: float = 0.05,
+                 max_attempts: int = 3, retry_delay: float = 0.2):
+        self.transport = transport
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._buffer = WriteBuffer(self._deliver, max_batch=SQS_MAX_BATCH, max_delay=max_delay)
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.batches = 0
+
+    async def send(self, message: dict) -> bool:
+        """Queue a message; returns True once the queue has accepted it."""
+        return await self._buffer.submit(json.dumps(message))
+
+    async def _deliver(self, bodies: List[str]) -> List[bool]:
+        delivered = [False] * len(bodies)
+        pending = {str(i): body for i, body in enumerate(bodies)}
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.retried += len(pending)
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+            self.batches += 1
+            try:
+                failures = await self.transport.send_batch(list(pending.items()))
+            except Exception as e:
+                logger.warning("Outbox batch send failed", extra={
+                    "attempt": attempt + 1, "messages": len(pending), "error": f"{type(e).__name__}: {e}",
+                })
+                failures = {entry_id: True for entry_id in pending}
+            for entry_id in pending:
+                if entry_id not in failures:
+                    delivered[int(entry_id)] = True
+            pending = {entry_id: pending[entry_id] for entry_id, retryable in failures.items()
+                       if retryable and entry_id in pending}
+            if not pending:
+                break
+        self.sent += sum(delivered)
+        self.failed += len(bodies) - sum(delivered)
+        return delivered
+
+    async def drain(self) -> None:
+        await self._buffer.drain()
+
+    def stats(self) -> dict:
+        return {
+            "transport": type(self.transport).__name__,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "batches": self.batches,
+            **self._buffer.stats(),
+        }
+
+
+def build_transport(backend: str, queue_url: Optional[str], region_name: str,
+                    file_path: str) -> QueueTransport:
+    if backend == "sqs":
+        return SQSTransport(queue_url, region_name)
+    if backend == "memory":
+        return MemoryTransport()
+    if backend == "file":
+        return FileTransport(file_path)
+    raise ValueError(f"Unknown EMAIL_OUTBOX_BACKEND '{backend}' (expected 'sqs', 'memory' or 'file')")
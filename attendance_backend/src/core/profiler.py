@@ -0,0 +1,261 @@
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Deque, Dict, List, Optional, Tuple
+from .config import (
+    PROFILER_ENABLED, PROFILER_SAMPLE_RATE, PROFILER_INTERVAL_MS,
+    PROFILER_WINDOW_SECONDS, PROFILER_WINDOWS, PROFILER_MAX_STACKS,
+)
+from .log import get_logger
+
+
+# Opt-in wall-clock sampling profiler (PROFILER_ENABLED). A PROFILER_SAMPLE_RATE fraction of
+# requests is profiled: while any is in flight, a background thread wakes every
+# PROFILER_INTERVAL_MS and records one stack per profiled request. That is the event loop
+# thread's Python stack if the request (or a task it started, e.g. a streaming body) is the
+# one running, or else the chain of coroutines it is suspended in, ending in "[waiting]"
+# (typically a database round trip). Requests that aren't sampled cost one random() call.
+# Stacks are folded per route into rolling PROFILER_WINDOW_SECONDS windows, the last
+# PROFILER_WINDOWS of which are kept, and served as collapsed-stack text (flamegraph.pl,
+# speedscope, ...). Everything is per process, like the metrics.
+
+logger = get_logger("profiler")
+
+WAITING = "[waiting]"
+TRUNCATED = "[other stacks]"
+
+# Asyncio's running-task map (Python 3.12); without it only waiting stacks can be taken
+_running_tasks = getattr(asyncio.tasks, "_current_tasks", None)
+
+
+class ProfiledRequest:
+    __slots__ = ("task", "samples")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.samples: Counter = Counter()
+
+
+class RouteProfile:
+    __slots__ = ("windows", "requests")
+
+    def __init__(self):
+        self.windows: Deque[Tuple[float, Counter]] = deque()
+        self.requests = 0
+
+
+_current: ContextVar[Optional[ProfiledRequest]] = ContextVar("profiled_request", default=None)
+
+
+def _label(code) -> str:
+    """Frame name: import-root-relative file and qualified function name."""
+    path = code.co_filename
+    # Longest first, so site-packages wins over the stdlib directory that contains it
+    for root in sorted((os.path.abspath(p) for p in sys.path if p), key=len, reverse=True):
+        if path.startswith(root + os.sep):
+            path = path[len(root) + 1:]
+            break
+    return f"{path}:{code.co_qualname}"
+
+
+class SamplingProfiler:
+    def __init__(self, enabled: bool, sample_rate: float, interval: float,
+                 window_seconds: float, windows: int, max_stacks: int):
+        self.enabled = enabled and _running_tasks is not None
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.window_seconds = window_seconds
+        self.windows = windows
+        self.max_stacks = max_stacks
+        self._lock = threading.Lock()
+        self._active: Dict[ProfiledRequest, None] = {}
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id = 0
+        self._labels: Dict[object, str] = {}
+        self._routes: Dict[Tuple[str, str], RouteProfile] = {}
+        self.profiled = 0
+        self.ticks = 0
+        if enabled and _running_tasks is None:
+            logger.warning("Profiler disabled: this Python has no asyncio running-task map")
+
+    def should_sample(self) -> bool:
+        return self.enabled and random.random() < self.sample_rate
+
+    def begin(self) -> ProfiledRequest:
+        """Start profiling the current task; call end() when the request finishes."""
+        request = ProfiledRequest(asyncio.current_task())
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._loop_thread_id = threading.get_ident()
+            self._active[request] = None
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return request
+
+    def end(self, request: ProfiledRequest, method: str, route: str) -> None:
+        now = time.time()
+        window_start = now - now % self.window_seconds
+        with self._lock:
+            self._active.pop(request, None)
+            if not self._active:
+                self._wake.clear()
+            profile = self._routes.get((method, route))
+            if profile is None:
+                profile = self._routes[(method, route)] = RouteProfile()
+            if not profile.windows or profile.windows[-1][0] != window_start:
+                profile.windows.append((window_start, Counter()))
+            self._expire(profile, now)
+            window = profile.windows[-1][1]
+            for stack, count in request.samples.items():
+                if stack not in window and len(window) >= self.max_stacks:
+                    stack = TRUNCATED
+                window[stack] += count
+            profile.requests += 1
+            self.profiled += 1
+
+    def _expire(self, profile: RouteProfile, now: float) -> None:
+        oldest = now - self.window_seconds * self.windows
+        while profile.windows and profile.windows[0][0] < oldest:
+            profile.windows.popleft()
+
+    # -- sampler thread --
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            try:
+                self._sample()
+            except Exception:
+                logger.exception("Profiler sample failed")
+
+    def _frame_stack(self, frame) -> List[str]:
+        """Loop thread stack, outermost first, starting at the running task's coroutine."""
+        codes = []
+        while frame is not None:
+            code = frame.f_code
+            # Handle._run is where the loop hands over to the task; drop the loop's own frames
+            if code.co_name == "_run" and code.co_filename.endswith(os.path.join("asyncio", "events.py")):
+                break
+            codes.append(code)
+            frame = frame.f_back
+        return [self._code_label(code) for code in reversed(codes)]
+
+    def _await_stack(self, task: asyncio.Task) -> List[str]:
+        """The coroutines a suspended task is awaiting through, outermost first."""
+        stack = []
+        coro = task.get_coro()
+        while coro is not None:
+            code = getattr(coro, "cr_code", None) or getattr(coro, "gi_code", None)
+            if code is None:
+                break
+            stack.append(self._code_label(code))
+            coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+        return stack + [WAITING]
+
+    def _code_label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = _label(code)
+        return label
+
+    def _sample(self) -> None:
+        with self._lock:
+            active = list(self._active)
+            loop, thread_id = self._loop, self._loop_thread_id
+        if not active:
+            return
+        running = _running_tasks.get(loop)
+        owner = running.get_context().get(_current) if running is not None else None
+        frame = sys._current_frames().get(thread_id) if owner is not None else None
+        taken = []
+        for request in active:
+            if request is owner and frame is not None:
+                taken.append((request, self._frame_stack(frame)))
+            elif not request.task.done():
+                taken.append((request, self._await_stack(request.task)))
+        with self._lock:
+            for request, stack in taken:
+                if request in self._active:  # not already folded into its route by end()
+                    request.samples[";".join(stack)] += 1
+            self.ticks += 1
+
+    # -- reporting --
+
+    def collapsed(self, method: Optional[str] = None, route: Optional[str] = None) -> str:
+        """Collapsed stacks ("frame;frame;... count" per line) for one route, or all of them
+        under a "METHOD route" root frame."""
+        totals: Counter = Counter()
+        now = time.time()
+        with self._lock:
+            for (m, r), profile in self._routes.items():
+                if route is not None and (r != route or (method is not None and m != method)):
+                    continue
+                self._expire(profile, now)
+                prefix = "" if route is not None else f"{m} {r};"
+                for _, window in profile.windows:
+                    for stack, count in window.items():
+                        totals[prefix + stack] += count
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(totals.items()))
+
+    def summary(self) -> dict:
+        now = time.time()
+        with self._lock:
+            routes = []
+            for (method, route), profile in sorted(self._routes.items()):
+                self._expire(profile, now)
+                samples = sum(sum(window.values()) for _, window in profile.windows)
+                routes.append({"method": method, "route": route, "requests": profile.requests,
+                               "samples": samples})
+            return {
+                "enabled": self.enabled,
+                "sample_rate": self.sample_rate,
+                "interval_ms": round(self.interval * 1000, 3),
+                "retention_seconds": self.window_seconds * self.windows,
+                "in_flight": len(self._active),
+                "profiled": self.profiled,
+                "ticks": self.ticks,
+                "routes": routes,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+
+profiler = SamplingProfiler(
+    enabled=PROFILER_ENABLED,
+    sample_rate=PROFILER_SAMPLE_RATE,
+    interval=PROFILER_INTERVAL_MS / 1000,
+    window_seconds=PROFILER_WINDOW_SECONDS,
+    windows=PROFILER_WINDOWS,
+    max_stacks=PROFILER_MAX_STACKS,
+)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware: profiles a sampled fraction of requests, filed by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.should_sample():
+            return await self.app(scope, receive, send)
+        request = profiler.begin()
+        token = _current.set(request)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            profiler.end(request, scope["method"], route)
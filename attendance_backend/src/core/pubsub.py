@@ -0,0 +1,101 @@
+import asyncio
+import itertools
+from typing import Any, Dict, Hashable, Optional, Set
+from fastapi import HTTPException
+
+
+# In-process publish/subscribe for live views. Publishing never blocks the writer: each
+# subscriber has its own bounded queue, and a subscriber that falls behind is marked as
+# lagged (its backlog dropped) so it can resynchronise from a fresh snapshot instead of
+# holding memory or slowing everyone else down. Only events published by this process are
+# delivered; with several instances each viewer sees the writes of the instance it is on.
+
+
+class Subscription:
+    def __init__(self, broker: "Broker", topic: Hashable, maxsize: int):
+        self.broker = broker
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.lagged = False
+        self.dropped = 0
+
+    def _offer(self, event: Any) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow: drop the backlog; the consumer resyncs from a snapshot
+            self.dropped += self.queue.qsize() + 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.lagged = True
+            self.queue.put_nowait(None)  # wake the consumer
+
+    async def get(self, timeout: Optional[float] = None) -> Any:
+        """Next event; None if the subscriber lagged (check `lagged`); raises TimeoutError."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self) -> None:
+        self.broker._unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class Broker:
+    """Topic -> subscribers fan-out with per-subscriber bounded queues."""
+
+    def __init__(self, queue_size: int, max_subscribers: int):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._topics: Dict[Hashable, Set[Subscription]] = {}
+        self._subscribers = 0
+        self._seq = itertools.count(1)
+        self.published = 0
+        self.delivered = 0
+        self.lag_events = 0
+
+    def subscribe(self, topic: Hashable) -> Subscription:
+        if self._subscribers >= self.max_subscribers:
+            raise HTTPException(status_code=503, detail="Too many live viewers, try again later",
+                                headers={"Retry-After": "5"})
+        sub = Subscription(self, topic, self.queue_size)
+        self._topics.setdefault(topic, set()).add(sub)
+        self._subscribers += 1
+        return sub
+
+    def publish(self, topic: Hashable, event: Dict[str, Any]) -> int:
+        """Fan an event out to the topic's subscribers; returns how many received it."""
+        subs = self._topics.get(topic)
+        self.published += 1
+        if not subs:
+            return 0
+        event = {"seq": next(self._seq), **event}
+        for sub in subs:
+            was_lagged = sub.lagged
+            sub._offer(event)
+            if sub.lagged and not was_lagged:
+                self.lag_events += 1
+        self.delivered += len(subs)
+        return len(subs)
+
+    def _unsubscribe(self, sub: Subscription) -> None:
+        subs = self._topics.get(sub.topic)
+        if subs is None or sub not in subs:
+            return
+        subs.discard(sub)
+        self._subscribers -= 1
+        if not subs:
+            del self._topics[sub.topic]
+
+    def stats(self) -> dict:
+        return {
+            "topics": len(self._topics),
+            "subscribers": self._subscribers,
+            "max_subscribers": self.max_subscribers,
+            "published": self.published,
+            "delivered": self.delivered,
+            "lag_events": self.lag_events,
+        }
@@ -0,0 +1,141 @@
+import time
+from typing import Dict
+from sqlalchemy import event, text
+from sqlalchemy.sql.elements import TextClause
+from .config import DB_SLOW_QUERY_MS
+from .database import engine
+from .log import get_logger
+from .metrics import LATENCY_BUCKETS, Histogram
+from .request_timing import current_timings
+
+
+# Every raw SQL statement the app runs is declared once, at import, under a stable name.
+# The asyncpg dialect runs each one as a server-side prepared statement and keeps up to
+# DB_PREPARED_STATEMENT_CACHE_SIZE of them per connection, keyed by SQL text. Connections
+# that outlive a request (DB_POOL_MODE=queue or warm) therefore parse and plan each
+# statement once and re-execute it afterwards. Per-statement call counts and a latency
+# histogram are collected from the engine's cursor events, each statement is also charged
+# to the request running it (see request_timing), and statements slower than
+# DB_SLOW_QUERY_MS are logged with the shape of their parameters (never the values).
+
+UNREGISTERED = "unregistered"
+
+
+class StatementStats:
+    __slots__ = ("latency", "errors", "slow", "longest")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.errors = 0
+        self.slow = 0
+        self.longest = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.latency.observe(seconds)
+        self.longest = max(self.longest, seconds)
+
+
+_statements: Dict[str, TextClause] = {}
+_stats: Dict[str, StatementStats] = {}
+logger = get_logger("db")
+
+
+def register_query(name: str, sql: str) -> TextClause:
+    """Declare a statement under `name`; call at module level and reuse the result."""
+    if name in _statements:
+        raise ValueError(f"Query '{name}' is already registered")
+    statement = text(sql).execution_options(query_name=name)
+    _statements[name] = statement
+    return statement
+
+
+def get_query(name: str) -> TextClause:
+    return _statements[name]
+
+
+def registered_queries() -> Dict[str, TextClause]:
+    return dict(_statements)
+
+
+def _entry(context) -> StatementStats:
+    name = context.execution_options.get("query_name", UNREGISTERED) if context else UNREGISTERED
+    entry = _stats.get(name)
+    if entry is None:
+        entry = _stats[name] = StatementStats()
+    return entry
+
+
+def _shape(value) -> str:
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def param_shape(context, parameters, executemany: bool) -> str:
+    """Parameter names and types of a statement, e.g. {class_id: int, ids: list[3]}."""
+    if context is not None and context.compiled is not None:
+        params = context.compiled_parameters
+    else:
+        params = parameters if executemany else [parameters]
+    batch = f"{len(params)} x " if len(params) > 1 else ""
+    first = params[0] if params else None
+    if isinstance(first, dict):
+        return batch + "{" + ", ".join(f"{k}: {_shape(v)}" for k, v in first.items()) + "}"
+    if isinstance(first, (list, tuple)):
+        return batch + "(" + ", ".join(_shape(v) for v in first) + ")"
+    return batch + "()"
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    entry = _entry(context)
+    entry.observe(elapsed)
+
+    timings = current_timings()
+    if timings is not None:
+        timings.statements += 1
+        timings.db += elapsed
+
+    if elapsed * 1000 >= DB_SLOW_QUERY_MS:
+        entry.slow += 1
+        logger.warning("Slow query", extra={
+            "query": context.execution_options.get("query_name", UNREGISTERED),
+            "duration_ms": round(elapsed * 1000, 1),
+            "params": param_shape(context, parameters, executemany),
+        })
+
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _handle_error(exception_context):
+    _entry(exception_context.execution_context).errors += 1
+
+
+def query_stats() -> Dict[str, dict]:
+    """Per-statement calls, errors and latency, slowest total time first."""
+    rows = sorted(_stats.items(), key=lambda item: item[1].latency.sum, reverse=True)
+    return {
+        name: {
+            "calls": s.latency.count,
+            "errors": s.errors,
+            "slow": s.slow,
+            "total_ms": round(s.latency.sum * 1000, 3),
+            "avg_ms": round(s.latency.sum * 1000 / s.latency.count, 3) if s.latency.count else 0.0,
+            "max_ms": round(s.longest * 1000, 3),
+        }
+        for name, s in rows
+    }
+
+
+def statement_metrics() -> Dict[str, StatementStats]:
+    """Live per-statement stats by name, for the /metrics exporter."""
+    return dict(_stats)
+
+
+def reset_query_stats() -> None:
+    _stats.clear()
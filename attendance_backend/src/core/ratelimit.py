@@ -0,0 +1,147 @@
+import time
+from typing import Optional, Protocol
+from .cache import TTLCache
+from .config import COOLDOWN_BACKEND, COOLDOWN_SECONDS, COOLDOWN_MAX_ENTRIES
+
+
+# Anti-spoofing cooldown: a student may submit at most once per COOLDOWN_SECONDS for a
+# given session. Backends remember when each (student, session) last submitted; the
+# limiter only needs the database when its backend can't vouch for a missing entry.
+
+
+class CooldownBackend(Protocol):
+    """Stores the last accepted submission time (epoch seconds) per key."""
+
+    async def get_last(self, key: str) -> Optional[float]:
+        ...
+
+    async def record(self, key: str, at: float, ttl: float) -> None:
+        ...
+
+    def is_authoritative(self) -> bool:
+        """True when a missing key really means "no submission inside the window"."""
+        ...
+
+
+class InMemoryCooldownBackend(CooldownBackend):
+    """Per-process TTL-bounded LRU. Only authoritative once the process has been up for
+    a full window, since submissions made before it started are unknown to it."""
+
+    def __init__(self, window: int, maxsize: int):
+        self.window = window
+        self._entries = TTLCache(maxsize=maxsize, ttl=window)
+        self._started_at = time.monotonic()
+
+    async def get_last(self, key: str) -> Optional[float]:
+        return self._entries.get(key)
+
+    async def record(self, key: str, at: float, ttl: float) -> None:
+        self._entries.set(key, at, ttl=ttl)
+
+    def is_authoritative(self) -> bool:
+        # An evicted entry could still be inside its window, so a full cache can't vouch either
+        return (
+            time.monotonic() - self._started_at >= self.window
+            and len(self._entries) < self._entries.maxsize
+        )
+
+
+class SharedStore(Protocol):
+    """Minimal key/value interface of a shared store (shaped like Redis GET / SET EX)."""
+
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    async def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        ...
+
+    def is_authoritative(self) -> bool:
+        """True when every key set in the last `ttl_seconds` is still readable (nothing lost
+        to a restart or eviction), so a missing key can be trusted."""
+        ...
+
+
+class LocalSharedStore:
+    """In-process stand-in for a shared store, for local development and single-node runs.
+    Like InMemoryCooldownBackend, it only vouches for missing keys once it has been up for
+    `window` seconds and has never had to evict."""
+
+    def __init__(self, window: int, maxsize: int = 100_000):
+        self.window = window
+        self._entries = TTLCache(maxsize=maxsize, ttl=0)
+        self._started_at = time.monotonic()
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        self._entries.set(key, value, ttl=ttl_seconds)
+
+    def is_authoritative(self) -> bool:
+        return (
+            time.monotonic() - self._started_at >= self.window
+            and len(self._entries) < self._entries.maxsize
+        )
+
+
+class SharedStoreCooldownBackend(CooldownBackend):
+    """Cooldown state kept in a store shared by every instance; authoritative whenever the
+    store says it is (a real shared store always, the local stand-in after warming up)."""
+
+    def __init__(self, store: SharedStore, prefix: str = "cooldown:"):
+        self.store = store
+        self.prefix = prefix
+
+    async def get_last(self, key: str) -> Optional[float]:
+        value = await self.store.get(self.prefix + key)
+        return float(value) if value is not None else None
+
+    async def record(self, key: str, at: float, ttl: float) -> None:
+        await self.store.set(self.prefix + key, repr(at), max(1, int(ttl + 0.999)))
+
+    def is_authoritative(self) -> bool:
+        return self.store.is_authoritative()
+
+
+class CooldownLimiter:
+    def __init__(self, backend: CooldownBackend, window: int = 60):
+        self.backend = backend
+        self.window = window
+
+    @staticmethod
+    def _key(student_id: int, session_id: int) -> str:
+        return f"{session_id}:{student_id}"
+
+    async def remaining(self, student_id: int, session_id: int) -> Optional[int]:
+        """Seconds left in the cooldown (0 when free to submit), or None if unknown and the
+        caller has to consult the database."""
+        last = await self.backend.get_last(self._key(student_id, session_id))
+        if last is None:
+            return 0 if self.backend.is_authoritative() else None
+        elapsed = time.time() - last
+        if elapsed >= self.window:
+            return 0
+        return self.window - int(elapsed)
+
+    async def record(self, student_id: int, session_id: int, at: Optional[float] = None) -> None:
+        """Remember an accepted submission (or one found in the database while warming up)."""
+        at = time.time() if at is None else at
+        ttl = self.window - (time.time() - at)
+        if ttl > 0:
+            await self.backend.record(self._key(student_id, session_id), at, ttl)
+
+
+def _build_backend() -> CooldownBackend:
+    if COOLDOWN_BACKEND == "memory":
+        return InMemoryCooldownBackend(window=COOLDOWN_SECONDS, maxsize=COOLDOWN_MAX_ENTRIES)
+    if COOLDOWN_BACKEND == "shared":
+        return SharedStoreCooldownBackend(LocalSharedStore(window=COOLDOWN_SECONDS, maxsize=COOLDOWN_MAX_ENTRIES))
+    raise ValueError(f"Unknown COOLDOWN_BACKEND '{COOLDOWN_BACKEND}' (expected 'memory' or 'shared')")
+
+
+submit_cooldown = CooldownLimiter(_build_backend(), window=COOLDOWN_SECONDS)
+
+
+def configure_shared_store(store: SharedStore) -> None:
+    """Point the submit cooldown at a real shared store (e.g. a Redis client wrapper)."""
+    submit_cooldown.backend = SharedStoreCooldownBackend(store)
@@ -0,0 +1,82 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from .metrics import observe_request
+
+
+# Where each request's time goes. Statements (query_registry's cursor events), bcrypt jobs
+# (hash_pool) and JSON rendering (TimedJSONResponse) add to the current request's
+# RequestTimings through a contextvar; RequestTimingMiddleware reports the split in a
+# Server-Timing header, visible in the browser's network panel, and records per-route
+# latency for GET /metrics. Work done while a streaming body is sent (SSE, exports) counts
+# towards the route's latency but can't be in the header, which has already gone out.
+
+
+class RequestTimings:
+    __slots__ = ("statements", "db", "hash", "serialize")
+
+    def __init__(self):
+        self.statements = 0
+        self.db = 0.0
+        self.hash = 0.0
+        self.serialize = 0.0
+
+    def server_timing(self, total: float) -> str:
+        return (
+            f"db;dur={self.db * 1000:.2f};desc=\"statements: {self.statements}\", "
+            f"hash;dur={self.hash * 1000:.2f}, "
+            f"serialize;dur={self.serialize * 1000:.2f}, "
+            f"total;dur={total * 1000:.2f}"
+        )
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """The running request's timings, or None outside a request (SQS batches, scripts)."""
+    return _current.get()
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse that charges its encoding time to the request's `serialize` timing."""
+
+    def render(self, content) -> bytes:
+        started = time.perf_counter()
+        try:
+            return super().render(content)
+        finally:
+            timings = _current.get()
+            if timings is not None:
+                timings.serialize += time.perf_counter() - started
+
+
+class RequestTimingMiddleware:
+    """ASGI middleware: Server-Timing header and per-route latency / DB usage metrics."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timings.server_timing(time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            # The router stores the matched route in the scope; unmatched paths share one label
+            route = getattr(scope.get("route"), "path", "unmatched")
+            observe_request(scope["method"], route, time.perf_counter() - started, timings)
@@ -1,32 +1,48 @@
 import secrets
 from datetime import datetime, timedelta
 from typing import Optional, Dict
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from .config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from .config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, RESET_ADMIN_KEY
+from .hash_pool import hash_pool
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# passlib and jose (with its cryptography backend) are imported on first use rather than at
+# startup; Lambda cold starts that only serve health checks or SQS batches never load them.
+_pwd_context = None
 security = HTTPBearer()
 
+def _get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     # Truncate password to 72 bytes to avoid bcrypt errors
     if len(plain_password.encode('utf-8')) > 72:
         plain_password = plain_password[:72]
-    return pwd_context.verify(plain_password, hashed_password)
+    return _get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
     # Truncate password to 72 bytes to avoid bcrypt errors
     if len(password.encode('utf-8')) > 72:
         password = password[:72]
-    return pwd_context.hash(password)
+    return _get_pwd_context().hash(password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the bcrypt worker pool (use from async routes)"""
+    return await hash_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the bcrypt worker pool (use from async routes)"""
+    return await hash_pool.run(get_password_hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
+    from jose import jwt
     to_encode = data.copy()
     # JWT spec requires 'sub' to be a string
     if "sub" in to_encode:
@@ -41,6 +57,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Verify JWT token and return user data"""
+    from jose import JWTError, jwt
     try:
         token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -65,6 +82,16 @@ def require_faculty(current_user: dict = Depends(verify_token)) -> dict:
     return current_user
 
 
+def require_admin(
+    x_admin_key: Optional[str] = Header(None),
+    current_user: dict = Depends(require_faculty),
+) -> dict:
+    """Dependency: faculty JWT plus the admin key (RESET_ADMIN_KEY) in an X-Admin-Key header."""
+    if not x_admin_key or not secrets.compare_digest(x_admin_key.encode(), RESET_ADMIN_KEY.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin key. Access denied.")
+    return current_user
+
+
 def require_student(current_user: dict = Depends(verify_token)) -> dict:
     """Dependency: requires a valid JWT with the STUDENT role."""
     if current_user.get("role") != "STUDENT":
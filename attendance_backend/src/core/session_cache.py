@@ -0,0 +1,93 @@
+from typing import FrozenSet, NamedTuple, Optional
+from .cache import TTLCache
+from .query_registry import register_query
+from .config import SESSION_CACHE_TTL, SESSION_CACHE_MAX_ENTRIES
+
+
+# In-process working set of ACTIVE sessions, keyed by generated code.
+# Every submission for a session needs the same metadata and enrollment list, so they are
+# loaded once (on start_session or on first use) and served from memory afterwards.
+# Entries expire after SESSION_CACHE_TTL seconds so other instances' changes are picked up,
+# and the least recently used are evicted beyond SESSION_CACHE_MAX_ENTRIES codes;
+# the attendance write itself re-checks that the session is still ACTIVE.
+
+
+class ActiveSession(NamedTuple):
+    session_id: int
+    class_id: int
+    generated_code: str
+    latitude: Optional[float]
+    longitude: Optional[float]
+    radius_meters: Optional[int]
+    enrolled: FrozenSet[int]
+
+
+_sessions_by_code = TTLCache(maxsize=SESSION_CACHE_MAX_ENTRIES, ttl=SESSION_CACHE_TTL)
+
+_load_sql = register_query(
+    "session_cache.load",
+    """
+    SELECT
+        s.session_id, s.class_id, s.generated_code, s.latitude, s.longitude, s.radius_meters,
+        ARRAY(
+            SELECT ce.student_id FROM class_enrollments ce WHERE ce.class_id = s.class_id
+        ) AS enrolled
+    FROM attendance_sessions s
+    WHERE s.generated_code = :code AND s.status = 'ACTIVE'
+    LIMIT 1
+    """
+)
+
+
+def get(code: str) -> Optional[ActiveSession]:
+    """Return the cached active session for a code, or None on a miss/expiry"""
+    return _sessions_by_code.get(code)
+
+
+async def load(conn, code: str) -> Optional[ActiveSession]:
+    """Load an active session and its enrolled student IDs in one query and cache it"""
+    row = (await conn.execute(_load_sql, {"code": code})).fetchone()
+    if not row:
+        _sessions_by_code.pop(code, None)
+        return None
+    session = from_row(row)
+    put(session)
+    return session
+
+
+def from_row(row) -> ActiveSession:
+    """Build a cache entry from any row carrying the session columns plus `enrolled`"""
+    return ActiveSession(
+        session_id=row.session_id,
+        class_id=row.class_id,
+        generated_code=row.generated_code,
+        latitude=row.latitude,
+        longitude=row.longitude,
+        radius_meters=row.radius_meters,
+        enrolled=frozenset(row.enrolled or ()),
+    )
+
+
+def put(session: ActiveSession) -> None:
+    _sessions_by_code.set(session.generated_code, session)
+
+
+def invalidate_code(code: str) -> None:
+    _sessions_by_code.pop(code, None)
+
+
+def invalidate_session(session_id: int) -> None:
+    for code, session in _sessions_by_code.items():
+        if session.session_id == session_id:
+            _sessions_by_code.pop(code, None)
+
+
+def invalidate_class(class_id: int) -> None:
+    """Drop every cached session of a class (enrollment changed, class deleted, ...)"""
+    for code, session in _sessions_by_code.items():
+        if session.class_id == class_id:
+            _sessions_by_code.pop(code, None)
+
+
+def clear() -> None:
+    _sessions_by_code.clear()
@@ -1,6 +1,13 @@
 import random
 import string
 import math
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+from fastapi import HTTPException
+
+# Session times are stored as naive IST wall-clock timestamps (see ist_now), so an IST
+# calendar day is the half-open range [day 00:00, next day 00:00) on start_time directly.
+IST_OFFSET = timedelta(hours=5, minutes=30)
 
 def generate_code(length: int = 6) -> str:
     # Exclude confusing characters: O, 0, I, 1
@@ -25,4 +32,40 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     # Earth radius in meters
     r = 6371000
     
-    return c * r
\ No newline at end of file
+    return c * r
+
+
+def ist_now() -> datetime:
+    """Current time as a naive IST timestamp, the form start_time/end_time are stored in"""
+    return datetime.utcnow() + IST_OFFSET
+
+
+def ist_today() -> date:
+    return ist_now().date()
+
+
+def parse_date(value: str, field: str = "date") -> date:
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Invalid {field} '{value}', expected YYYY-MM-DD")
+
+
+def day_bounds(day: date) -> Tuple[datetime, datetime]:
+    """Half-open [start, end) timestamp range covering one IST calendar day"""
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+def date_range_bounds(first: date, last: date) -> Tuple[datetime, datetime]:
+    """Half-open range covering the IST days first..last inclusive"""
+    if last < first:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    return day_bounds(first)[0], day_bounds(last)[1]
+
+
+def week_bounds(day: Optional[date] = None) -> Tuple[datetime, datetime]:
+    """Half-open range for the Monday-to-Sunday week containing `day` (default: this IST week)"""
+    day = day or ist_today()
+    monday = day - timedelta(days=day.weekday())
+    return date_range_bounds(monday, monday + timedelta(days=6))
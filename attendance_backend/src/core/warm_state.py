@@ -0,0 +1,92 @@
+import asyncio
+import time
+from .config import DB_POOL_MODE, WARM_CONN_CHECK_AFTER
+from .database import engine
+from .log import get_logger
+from .query_registry import register_query
+
+
+# State that should outlive a single Lambda invocation. The container keeps one event loop
+# for its whole life. asyncpg connections are bound to the loop that opened them, so with
+# DB_POOL_MODE=warm the pooled connection (and its prepared-statement cache) carries over
+# between invocations. Module-level caches (sessions, cooldowns, analytics matrices) and
+# pending timers stay usable on that same loop instead of being stranded on a closed one.
+
+
+_ping_sql = register_query("warm_state.ping", "SELECT 1")
+logger = get_logger("warm_state")
+
+
+class WarmState:
+    def __init__(self):
+        self.created_at = time.time()
+        self._loop = None
+        self.loops_created = 0
+        self.invocations = 0
+        self.cold_invocations = 0
+        self.warm_invocations = 0
+        self.invocations_by_kind = {}
+        self._last_invocation_at = None
+        self.conn_checks = 0
+        self.conn_reconnects = 0
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        """The container's event loop, created on first use (or if something closed it)."""
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+            self.loops_created += 1
+        asyncio.set_event_loop(self._loop)
+        return self._loop
+
+    def begin_invocation(self, kind: str) -> bool:
+        """Count an invocation and prepare the loop; returns True for the container's first."""
+        cold = self.invocations == 0
+        idle = None if cold else time.monotonic() - self._last_invocation_at
+        self.invocations += 1
+        self.invocations_by_kind[kind] = self.invocations_by_kind.get(kind, 0) + 1
+        if cold:
+            self.cold_invocations += 1
+        else:
+            self.warm_invocations += 1
+        self._last_invocation_at = time.monotonic()
+
+        loop = self.get_loop()
+        if DB_POOL_MODE == "warm" and idle is not None and idle >= WARM_CONN_CHECK_AFTER:
+            # The container may have been frozen long enough for the server or a NAT to drop
+            # the idle connection; check it once here rather than pinging on every checkout
+            loop.run_until_complete(self.check_connection())
+        return cold
+
+    async def check_connection(self) -> None:
+        """Liveness check of the warm connection; a dead one is discarded and reopened."""
+        self.conn_checks += 1
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(_ping_sql)
+        except Exception as e:
+            # A disconnect error invalidates the pooled connection; the next checkout reconnects
+            self.conn_reconnects += 1
+            logger.warning("Warm connection failed liveness check, reconnecting", extra={"error": str(e)})
+            async with engine.connect() as conn:
+                await conn.execute(_ping_sql)
+
+    def run(self, kind: str, coro):
+        """Run a coroutine for one invocation on the container's loop."""
+        self.begin_invocation(kind)
+        return self.get_loop().run_until_complete(coro)
+
+    def stats(self) -> dict:
+        return {
+            "uptime_seconds": round(time.time() - self.created_at, 1),
+            "invocations": self.invocations,
+            "cold_invocations": self.cold_invocations,
+            "warm_invocations": self.warm_invocations,
+            "by_kind": dict(self.invocations_by_kind),
+            "loops_created": self.loops_created,
+            "warm_connection": DB_POOL_MODE == "warm",
+            "connection_checks": self.conn_checks,
+            "connection_reconnects": self.conn_reconnects,
+        }
+
+
+warm_state = WarmState()
@@ -0,0 +1,67 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Set
+
+
+# Group commit: callers hand over one item each and await its outcome; items are flushed
+# together every `max_delay` seconds or as soon as `max_batch` are waiting, so a burst of
+# submissions costs one transaction per batch instead of one per request.
+
+FlushFn = Callable[[List[Any]], Awaitable[List[Any]]]
+
+
+class WriteBuffer:
+    def __init__(self, flush_fn: FlushFn, max_batch: int = 100, max_delay: float = 0.02):
+        """`flush_fn` receives the batch and returns one result per item, in order; an
+        Exception in that list is raised to that item's caller only."""
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        """Queue an item and wait until the batch containing it has been committed."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush_now)
+        return await future
+
+    def _flush_now(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _run(self, batch: List[tuple]) -> None:
+        try:
+            results = await self.flush_fn([item for item, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():  # caller went away (e.g. request cancelled)
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def drain(self) -> None:
+        """Flush everything still buffered and wait for in-flight batches (graceful shutdown)."""
+        self._flush_now()
+        while self._inflight:
+            tasks = list(self._inflight)
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._inflight.difference_update(tasks)
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "inflight_batches": len(self._inflight)}
@@ -1,66 +1,85 @@
-from sqlalchemy import text
+from datetime import datetime
 from typing import List, Dict, Optional
 from src.core.database import engine
+from src.core.query_registry import register_query
 
 
 # ---------------------------------------------------------
 # ✅ Sessions on a specific date
+# Callers pass the day as a half-open [start, end) range (see utils.day_bounds)
+# so the start_time index can be used
 # ---------------------------------------------------------
-async def get_sessions_by_date(date_str: str) -> List[Dict]:
-    sql = text("""
-        SELECT 
-            s.session_id, 
-            c.class_name, 
-            u.name AS faculty_name, 
-            s.start_time, 
-            s.end_time, 
-            s.status
-        FROM Attendance_Sessions s
-        JOIN Classes c ON s.class_id = c.class_id
-        JOIN Users u ON c.faculty_id = u.user_id
-        WHERE DATE(s.start_time) = :date
-        ORDER BY s.start_time ASC
-    """)
+_sessions_by_date_sql = register_query(
+    "queries.sessions_by_date",
+    """
+    SELECT
+        s.session_id,
+        c.class_name,
+        u.name AS faculty_name,
+        s.start_time,
+        s.end_time,
+        s.status
+    FROM Attendance_Sessions s
+    JOIN Classes c ON s.class_id = c.class_id
+    JOIN Users u ON c.faculty_id = u.user_id
+    WHERE s.start_time >= :start AND s.start_time < :end
+    ORDER BY s.start_time ASC
+    """
+)
+
+
+async def get_sessions_by_date(start: datetime, end: datetime) -> List[Dict]:
     async with engine.connect() as conn:
-        result = await conn.execute(sql, {"date": date_str})
+        result = await conn.execute(_sessions_by_date_sql, {"start": start, "end": end})
         return [dict(r._mapping) for r in result]
 
 
 # ---------------------------------------------------------
 # ✅ Full attendance for one session
 # ---------------------------------------------------------
+_attendance_for_session_sql = register_query(
+    "queries.attendance_for_session",
+    """
+    SELECT
+        u.name AS student_name,
+        ar.status,
+        ar.marked_at
+    FROM Attendance_Records ar
+    JOIN Users u ON ar.student_id = u.user_id
+    WHERE ar.session_id = :session_id
+    ORDER BY u.name
+    """
+)
+
+
 async def get_attendance_for_session(session_id: int) -> List[Dict]:
-    sql = text("""
-        SELECT 
-            u.name AS student_name, 
-            ar.status, 
-            ar.marked_at
-        FROM Attendance_Records ar
-        JOIN Users u ON ar.student_id = u.user_id
-        WHERE ar.session_id = :session_id
-        ORDER BY u.name
-    """)
     async with engine.connect() as conn:
-        result = await conn.execute(sql, {"session_id": session_id})
+        result = await conn.execute(_attendance_for_session_sql, {"session_id": session_id})
         return [dict(r._mapping) for r in result]
 
 
 # ---------------------------------------------------------
 # ✅ Attendance percentage for a student
 # ---------------------------------------------------------
+_student_percentage_sql = register_query(
+    "queries.student_percentage",
+    """
+    SELECT
+        u.name,
+        SUM(ac.present_count) * 100.0 / SUM(ac.total_count)
+        AS attendance_percentage
+    FROM Attendance_Counters ac
+    JOIN Users u ON ac.student_id = u.user_id
+    WHERE u.user_id = :student_id
+    GROUP BY u.name
+    HAVING SUM(ac.total_count) > 0
+    """
+)
+
+
 async def get_attendance_percentage_for_student(student_id: int) -> Optional[Dict]:
-    sql = text("""
-        SELECT 
-            u.name,
-            COUNT(CASE WHEN ar.status='PRESENT' THEN 1 END) * 100.0 / COUNT(*) 
-            AS attendance_percentage
-        FROM Attendance_Records ar
-        JOIN Users u ON ar.student_id = u.user_id
-        WHERE u.user_id = :student_id
-        GROUP BY u.name
-    """)
     async with engine.connect() as conn:
-        result = await conn.execute(sql, {"student_id": student_id})
+        result = await conn.execute(_student_percentage_sql, {"student_id": student_id})
         row = result.fetchone()
         return dict(row._mapping) if row else None
 
@@ -68,61 +87,51 @@ async def get_attendance_percentage_for_student(student_id: int) -> Optional[Dic
 # ---------------------------------------------------------
 # ✅ Students absent in a class on a date
 # ---------------------------------------------------------
-async def get_absent_students_in_class_on_date(class_id: int, date_str: str) -> List[Dict]:
-    sql = text("""
-        SELECT u.name, u.roll_number
-        FROM Attendance_Records ar
-        JOIN Users u ON ar.student_id = u.user_id
-        JOIN Attendance_Sessions s ON ar.session_id = s.session_id
-        WHERE s.class_id = :class_id
-          AND ar.status = 'ABSENT'
-          AND DATE(s.start_time) = :date
-    """)
-    async with engine.connect() as conn:
-        result = await conn.execute(sql, {"class_id": class_id, "date": date_str})
-        return [dict(r._mapping) for r in result]
+_absent_on_date_sql = register_query(
+    "queries.absent_on_date",
+    """
+    SELECT u.name, ce.roll_number
+    FROM Attendance_Records ar
+    JOIN Users u ON ar.student_id = u.user_id
+    JOIN Attendance_Sessions s ON ar.session_id = s.session_id
+    LEFT JOIN Class_Enrollments ce
+        ON ce.class_id = s.class_id AND ce.student_id = ar.student_id
+    WHERE s.class_id = :class_id
+      AND ar.status = 'ABSENT'
+      AND s.start_time >= :start AND s.start_time < :end
+    """
+)
 
 
-# ---------------------------------------------------------
-# ✅ Students below attendance threshold
-# ---------------------------------------------------------
-async def get_students_below_percentage(class_id: int, threshold: float = 75.0) -> List[Dict]:
-    sql = text("""
-        SELECT 
-            u.name, 
-            u.roll_number,
-            COUNT(CASE WHEN ar.status='PRESENT' THEN 1 END) * 100.0 / COUNT(*) 
-            AS attendance_percentage
-        FROM Attendance_Records ar
-        JOIN Attendance_Sessions s ON ar.session_id = s.session_id
-        JOIN Users u ON ar.student_id = u.user_id
-        WHERE s.class_id = :class_id
-        GROUP BY u.name, u.roll_number
-        HAVING COUNT(CASE WHEN ar.status='PRESENT' THEN 1 END) * 100.0 / COUNT(*) < :threshold
-    """)
+async def get_absent_students_in_class_on_date(class_id: int, start: datetime, end: datetime) -> List[Dict]:
     async with engine.connect() as conn:
-        result = await conn.execute(sql, {"class_id": class_id, "threshold": threshold})
+        result = await conn.execute(_absent_on_date_sql, {"class_id": class_id, "start": start, "end": end})
         return [dict(r._mapping) for r in result]
 
 
 # ---------------------------------------------------------
 # ✅ Most active class
 # ---------------------------------------------------------
+_most_active_class_sql = register_query(
+    "queries.most_active_class",
+    """
+    SELECT
+        c.class_name,
+        SUM(ac.present_count) * 100.0 / SUM(ac.total_count)
+        AS avg_attendance_percentage
+    FROM Attendance_Counters ac
+    JOIN Classes c ON ac.class_id = c.class_id
+    GROUP BY c.class_name
+    HAVING SUM(ac.total_count) > 0
+    ORDER BY avg_attendance_percentage DESC
+    LIMIT 1
+    """
+)
+
+
 async def get_most_active_class() -> Optional[Dict]:
-    sql = text("""
-        SELECT 
-            c.class_name,
-            COUNT(CASE WHEN ar.status='PRESENT' THEN 1 END) * 100.0 / COUNT(*) 
-            AS avg_attendance_percentage
-        FROM Attendance_Records ar
-        JOIN Attendance_Sessions s ON ar.session_id = s.session_id
-        JOIN Classes c ON s.class_id = c.class_id
-        GROUP BY c.class_name
-        ORDER BY avg_attendance_percentage DESC
-        LIMIT 1
-    """)
     async with engine.connect() as conn:
-        result = await conn.execute(sql)
+        result = await conn.execute(_most_active_class_sql)
         row = result.fetchone()
         return dict(row._mapping) if row else None
 
@@ -130,14 +139,77 @@ async def get_most_active_class() -> Optional[Dict]:
 # ---------------------------------------------------------
 # ✅ Faculty with classes
 # ---------------------------------------------------------
+_faculty_with_classes_sql = register_query(
+    "queries.faculty_with_classes",
+    """
+    SELECT u.name AS faculty_name, c.class_name
+    FROM Users u
+    JOIN Classes c ON u.user_id = c.faculty_id
+    WHERE u.role = 'FACULTY'
+    ORDER BY u.name, c.class_name
+    """
+)
+
+
 async def get_faculty_with_classes() -> List[Dict]:
-    sql = text("""
-        SELECT u.name AS faculty_name, c.class_name
-        FROM Users u
-        JOIN Classes c ON u.user_id = c.faculty_id
-        WHERE u.role = 'FACULTY'
-        ORDER BY u.name, c.class_name
-    """)
     async with engine.connect() as conn:
-        result = await conn.execute(sql)
+        result = await conn.execute(_faculty_with_classes_sql)
         return [dict(r._mapping) for r in result]
+
+
+# ---------------------------------------------------------
+# ✅ Rebuild attendance counters (backfill / repair)
+# ---------------------------------------------------------
+_lock_records_sql = register_query(
+    "queries.lock_records_share",
+    "LOCK TABLE Attendance_Records IN SHARE MODE",
+)
+
+
+_rebuild_insert_sql = """
+    INSERT INTO Attendance_Counters
+        (class_id, student_id, total_count, present_count, late_count, absent_count)
+    SELECT
+        s.class_id,
+        ar.student_id,
+        COUNT(*),
+        COUNT(*) FILTER (WHERE ar.status = 'PRESENT'),
+        COUNT(*) FILTER (WHERE ar.status = 'LATE'),
+        COUNT(*) FILTER (WHERE ar.status = 'ABSENT')
+    FROM Attendance_Records ar
+    JOIN Attendance_Sessions s ON s.session_id = ar.session_id
+    {scope}
+    GROUP BY s.class_id, ar.student_id
+"""
+
+_delete_all_counters_sql = register_query(
+    "queries.rebuild_counters_delete_all",
+    "DELETE FROM Attendance_Counters",
+)
+_delete_class_counters_sql = register_query(
+    "queries.rebuild_counters_delete_class",
+    "DELETE FROM Attendance_Counters WHERE class_id = :class_id",
+)
+_insert_all_counters_sql = register_query(
+    "queries.rebuild_counters_insert_all",
+    _rebuild_insert_sql.format(scope=""),
+)
+_insert_class_counters_sql = register_query(
+    "queries.rebuild_counters_insert_class",
+    _rebuild_insert_sql.format(scope="WHERE s.class_id = :class_id"),
+)
+
+
+async def rebuild_attendance_counters(class_id: Optional[int] = None) -> int:
+    """Recompute attendance_counters from attendance_records, for one class or all.
+    Writes to attendance_records are blocked for the duration so the result is exact."""
+    if class_id is None:
+        delete_sql, insert_sql, params = _delete_all_counters_sql, _insert_all_counters_sql, {}
+    else:
+        delete_sql, insert_sql = _delete_class_counters_sql, _insert_class_counters_sql
+        params = {"class_id": class_id}
+    async with engine.begin() as conn:
+        await conn.execute(_lock_records_sql)
+        await conn.execute(delete_sql, params)
+        result = await conn.execute(insert_sql, params)
+        return result.rowcount
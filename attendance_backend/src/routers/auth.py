@@ -1,13 +1,23 @@
 from datetime import datetime
 from fastapi import APIRouter, HTTPException, status, Depends
-from sqlalchemy import text
 from src.core.database import engine
-from src.core.security import verify_password, get_password_hash, create_access_token, create_reset_token, create_reset_token_expiry, verify_token
+from src.core.query_registry import register_query
+from src.core import session_cache, attendance_matrix
+from src.core.metadata_cache import metadata_cache
+from src.core.security import verify_password_async, get_password_hash_async, create_access_token, create_reset_token, create_reset_token_expiry, verify_token
 from src.core.email import send_password_reset_email
 from src.core.config import FACULTY_REGISTER_KEY
+from src.core.log import get_logger
 from src.models.schemas import LoginRequest, RegisterRequest, ForgotPasswordRequest, ResetPasswordRequest, DeleteAccountRequest
 
 router = APIRouter(tags=["auth"])
+logger = get_logger("auth")
+
+_login_user_sql = register_query(
+    "auth.login_user",
+    "SELECT user_id, name, email, password_hash, role FROM users WHERE email = :email",
+)
+
 
 @router.post("/login")
 async def login(request: LoginRequest):
@@ -19,55 +29,68 @@ async def login(request: LoginRequest):
             password = password[:72]
         
         async with engine.connect() as conn:
-            q = text(
-                "SELECT user_id, name, email, password_hash, role FROM users WHERE email = :email"
-            )
-            result = await conn.execute(q, {"email": request.email})
+            result = await conn.execute(_login_user_sql, {"email": request.email})
             row = result.fetchone()
-            
-            if not row:
-                raise HTTPException(status_code=401, detail="Invalid email or password")
-            
-            user = dict(row._mapping)
-            
-            # Verify password - support both plain text (old) and bcrypt (new)
-            password_valid = False
-            if user["password_hash"].startswith("$2b$"):
-                # Bcrypt hash
-                password_valid = verify_password(password, user["password_hash"])
-            else:
-                # Plain text (legacy - for backward compatibility)
-                password_valid = (password == user["password_hash"])
-            
-            if not password_valid:
-                raise HTTPException(status_code=401, detail="Invalid email or password")
-            
-            # Create JWT token
-            access_token = create_access_token(
-                data={"sub": user["user_id"], "role": user["role"], "email": user["email"]}
-            )
-            
-            return {
-                "message": "Login successful",
-                "access_token": access_token,
-                "token_type": "bearer",
-                "user_id": user["user_id"],
-                "name": user["name"],
-                "email": user["email"],
-                "role": user["role"],
-            }
+
+        # The connection is released before bcrypt runs
+        if not row:
+            raise HTTPException(status_code=401, detail="Invalid email or password")
+        
+        user = dict(row._mapping)
+        
+        # Verify password - support both plain text (old) and bcrypt (new)
+        password_valid = False
+        if user["password_hash"].startswith("$2b$"):
+            # Bcrypt hash
+            password_valid = await verify_password_async(password, user["password_hash"])
+        else:
+            # Plain text (legacy - for backward compatibility)
+            password_valid = (password == user["password_hash"])
+        
+        if not password_valid:
+            raise HTTPException(status_code=401, detail="Invalid email or password")
+        
+        # Create JWT token
+        access_token = create_access_token(
+            data={"sub": user["user_id"], "role": user["role"], "email": user["email"]}
+        )
+        
+        return {
+            "message": "Login successful",
+            "access_token": access_token,
+            "token_type": "bearer",
+            "user_id": user["user_id"],
+            "name": user["name"],
+            "email": user["email"],
+            "role": user["role"],
+        }
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[LOGIN] ERROR: {str(e)}")
+        logger.exception("Login failed")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+_email_exists_sql = register_query(
+    "auth.email_exists",
+    "SELECT user_id FROM users WHERE email = :email",
+)
+
+_insert_user_sql = register_query(
+    "auth.insert_user",
+    """
+    INSERT INTO users (name, email, password_hash, role)
+    VALUES (:name, :email, :password, :role)
+    RETURNING user_id, name, email, role
+    """
+)
+
+
 @router.post("/register")
 async def register(request: RegisterRequest):
     """Register a new user (student or faculty). Requires a valid registration key."""
     try:
-        print(f"[REGISTER] Attempting to register: {request.email}, role={request.role}")
+        logger.info("Registering user", extra={"email": request.email, "role": request.role})
         
         # Validate role
         if request.role not in ["STUDENT", "FACULTY"]:
@@ -76,7 +99,7 @@ async def register(request: RegisterRequest):
         # Validate registration key (faculty only — students register freely)
         if request.role == "FACULTY":
             if not request.register_key or request.register_key != FACULTY_REGISTER_KEY:
-                print(f"[REGISTER] Invalid registration key for FACULTY")
+                logger.warning("Invalid faculty registration key", extra={"email": request.email})
                 raise HTTPException(status_code=403, detail="Invalid registration key. Contact your administrator to get the correct key.")
         
         # Validate password length
@@ -88,27 +111,19 @@ async def register(request: RegisterRequest):
         if len(password.encode('utf-8')) > 72:
             password = password[:72]
         
+        # Hash the password before opening the transaction so it isn't held open during bcrypt
+        hashed_password = await get_password_hash_async(password)
+
         async with engine.begin() as conn:
             # Check if email already exists
-            check_sql = text("SELECT user_id FROM users WHERE email = :email")
-            existing = await conn.execute(check_sql, {"email": request.email})
+            existing = await conn.execute(_email_exists_sql, {"email": request.email})
             if existing.fetchone():
-                print(f"[REGISTER] Email already exists: {request.email}")
+                logger.info("Email already registered", extra={"email": request.email})
                 raise HTTPException(status_code=400, detail="Email already registered")
             
-            # Hash the password
-            hashed_password = get_password_hash(password)
-            
             # Insert new user
-            insert_sql = text(
-                """
-                INSERT INTO users (name, email, password_hash, role)
-                VALUES (:name, :email, :password, :role)
-                RETURNING user_id, name, email, role
-                """
-            )
             result = await conn.execute(
-                insert_sql,
+                _insert_user_sql,
                 {
                     "name": request.name,
                     "email": request.email,
@@ -118,7 +133,7 @@ async def register(request: RegisterRequest):
             )
             
             user = dict(result.fetchone()._mapping)
-            print(f"[REGISTER] Successfully registered user_id={user['user_id']}")
+            logger.info("User registered", extra={"user_id": user["user_id"], "role": user["role"]})
             
             return {
                 "message": "Registration successful",
@@ -131,18 +146,36 @@ async def register(request: RegisterRequest):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[REGISTER] ERROR: {str(e)}")
+        logger.exception("Registration failed")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+_reset_user_sql = register_query(
+    "auth.reset_user_by_email",
+    "SELECT user_id, name, email FROM users WHERE email = :email",
+)
+
+_delete_reset_tokens_sql = register_query(
+    "auth.delete_reset_tokens",
+    "DELETE FROM password_reset_tokens WHERE user_id = :user_id",
+)
+
+_insert_reset_token_sql = register_query(
+    "auth.insert_reset_token",
+    """
+    INSERT INTO password_reset_tokens (user_id, token, expires_at)
+    VALUES (:user_id, :token, :expires_at)
+    """
+)
+
+
 @router.post("/forgot-password")
 async def forgot_password(request: ForgotPasswordRequest):
     """Send password reset email"""
     try:
         async with engine.begin() as conn:
             # Check if user exists
-            user_sql = text("SELECT user_id, name, email FROM users WHERE email = :email")
-            result = await conn.execute(user_sql, {"email": request.email})
+            result = await conn.execute(_reset_user_sql, {"email": request.email})
             user_row = result.fetchone()
             
             if not user_row:
@@ -159,15 +192,10 @@ async def forgot_password(request: ForgotPasswordRequest):
             expires_at = create_reset_token_expiry()
             
             # Delete any existing tokens for this user
-            delete_sql = text("DELETE FROM password_reset_tokens WHERE user_id = :user_id")
-            await conn.execute(delete_sql, {"user_id": user["user_id"]})
+            await conn.execute(_delete_reset_tokens_sql, {"user_id": user["user_id"]})
             
             # Store new token
-            insert_sql = text("""
-                INSERT INTO password_reset_tokens (user_id, token, expires_at)
-                VALUES (:user_id, :token, :expires_at)
-            """)
-            await conn.execute(insert_sql, {
+            await conn.execute(_insert_reset_token_sql, {
                 "user_id": user["user_id"],
                 "token": token,
                 "expires_at": expires_at
@@ -182,7 +210,7 @@ async def forgot_password(request: ForgotPasswordRequest):
         )
         
         if not email_sent:
-            print(f"⚠️  Failed to send reset email to {user['email']}")
+            logger.error("Failed to queue reset email", extra={"email": user["email"]})
             raise HTTPException(
                 status_code=500,
                 detail="Failed to send reset email. Please check SMTP configuration on the server."
@@ -196,12 +224,40 @@ async def forgot_password(request: ForgotPasswordRequest):
     except HTTPException:
         raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
-        import traceback
-        print(f"[FORGOT_PASSWORD] ERROR: {str(e)}")
-        print(f"[FORGOT_PASSWORD] TRACEBACK: {traceback.format_exc()}")
+        logger.exception("Forgot-password request failed")
         raise HTTPException(status_code=500, detail=f"Failed to process request: {str(e)}")
 
 
+_reset_token_sql = register_query(
+    "auth.reset_token",
+    """
+    SELECT prt.user_id, prt.expires_at, prt.used, u.email, u.name
+    FROM password_reset_tokens prt
+    JOIN users u ON u.user_id = prt.user_id
+    WHERE prt.token = :token
+    """
+)
+
+_update_password_sql = register_query(
+    "auth.update_password",
+    """
+    UPDATE users
+    SET password_hash = :password_hash
+    WHERE user_id = :user_id
+    """
+)
+
+_mark_token_used_sql = register_query(
+    "auth.mark_token_used",
+    """
+    UPDATE password_reset_tokens
+    SET used = TRUE
+    WHERE token = :token AND NOT used
+    RETURNING user_id
+    """
+)
+
+
 @router.post("/reset-password")
 async def reset_password(request: ResetPasswordRequest):
     """Reset password using token"""
@@ -212,62 +268,52 @@ async def reset_password(request: ResetPasswordRequest):
                 detail="Password must be at least 6 characters long"
             )
         
-        async with engine.begin() as conn:
+        async with engine.connect() as conn:
             # Find valid token
-            token_sql = text("""
-                SELECT prt.user_id, prt.expires_at, prt.used, u.email, u.name
-                FROM password_reset_tokens prt
-                JOIN users u ON u.user_id = prt.user_id
-                WHERE prt.token = :token
-            """)
-            result = await conn.execute(token_sql, {"token": request.token})
+            result = await conn.execute(_reset_token_sql, {"token": request.token})
             token_row = result.fetchone()
-            
-            if not token_row:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Invalid or expired reset token"
-                )
-            
-            token_data = dict(token_row._mapping)
-            
-            # Check if token is used
-            if token_data["used"]:
+
+        if not token_row:
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid or expired reset token"
+            )
+        
+        token_data = dict(token_row._mapping)
+        
+        # Check if token is used
+        if token_data["used"]:
+            raise HTTPException(
+                status_code=400,
+                detail="This reset link has already been used"
+            )
+        
+        # Check if token is expired
+        if datetime.utcnow() > token_data["expires_at"]:
+            raise HTTPException(
+                status_code=400,
+                detail="This reset link has expired"
+            )
+        
+        # Hash new password with no connection held
+        new_password_hash = await get_password_hash_async(request.new_password)
+
+        async with engine.begin() as conn:
+            # Claim the token; a concurrent reset with the same link may have used it meanwhile
+            claimed = await conn.execute(_mark_token_used_sql, {"token": request.token})
+            if not claimed.fetchone():
                 raise HTTPException(
                     status_code=400,
                     detail="This reset link has already been used"
                 )
             
-            # Check if token is expired
-            if datetime.utcnow() > token_data["expires_at"]:
-                raise HTTPException(
-                    status_code=400,
-                    detail="This reset link has expired"
-                )
-            
-            # Hash new password
-            new_password_hash = get_password_hash(request.new_password)
-            
             # Update password
-            update_sql = text("""
-                UPDATE users 
-                SET password_hash = :password_hash
-                WHERE user_id = :user_id
-            """)
-            await conn.execute(update_sql, {
+            await conn.execute(_update_password_sql, {
                 "password_hash": new_password_hash,
                 "user_id": token_data["user_id"]
             })
             
-            # Mark token as used
-            mark_used_sql = text("""
-                UPDATE password_reset_tokens
-                SET used = TRUE
-                WHERE token = :token
-            """)
-            await conn.execute(mark_used_sql, {"token": request.token})
-            
-            print(f"✅ Password reset successful for user_id={token_data['user_id']}")
+        logger.info("Password reset", extra={"user_id": token_data["user_id"]})
         
         return {
             "message": "Password reset successful",
@@ -276,45 +322,101 @@ async def reset_password(request: ResetPasswordRequest):
         
     except HTTPException:
         raise
-    except Exception as e:
-        print(f"[RESET_PASSWORD] ERROR: {str(e)}")
+    except Exception:
+        logger.exception("Password reset failed")
         raise HTTPException(status_code=500, detail="Failed to reset password")
 
 
+_account_user_sql = register_query(
+    "auth.account_user",
+    "SELECT user_id, name, email, password_hash, role FROM users WHERE user_id = :user_id",
+)
+
+_faculty_class_ids_sql = register_query(
+    "auth.faculty_class_ids",
+    "SELECT class_id FROM classes WHERE faculty_id = :user_id",
+)
+
+_delete_class_records_sql = register_query(
+    "auth.delete_class_records",
+    """
+    DELETE FROM attendance_records
+    WHERE session_id IN (
+        SELECT session_id FROM attendance_sessions
+        WHERE class_id = ANY(:class_ids)
+    )
+    """
+)
+
+_delete_class_sessions_sql = register_query(
+    "auth.delete_class_sessions",
+    "DELETE FROM attendance_sessions WHERE class_id = ANY(:class_ids)",
+)
+
+_delete_class_enrollments_sql = register_query(
+    "auth.delete_class_enrollments",
+    "DELETE FROM class_enrollments WHERE class_id = ANY(:class_ids)",
+)
+
+_delete_faculty_classes_sql = register_query(
+    "auth.delete_faculty_classes",
+    "DELETE FROM classes WHERE faculty_id = :user_id",
+)
+
+_delete_student_records_sql = register_query(
+    "auth.delete_student_records",
+    "DELETE FROM attendance_records WHERE student_id = :user_id RETURNING session_id",
+)
+
+_refresh_session_counts_sql = register_query(
+    "auth.refresh_session_counts",
+    "SELECT refresh_session_summary_counts(CAST(:session_ids AS INTEGER[]))",
+)
+
+_delete_student_enrollments_sql = register_query(
+    "auth.delete_student_enrollments",
+    "DELETE FROM class_enrollments WHERE student_id = :user_id",
+)
+
+# Only deletes if the password hash is still the one that was verified
+_delete_user_sql = register_query(
+    "auth.delete_user",
+    "DELETE FROM users WHERE user_id = :user_id AND password_hash = :password_hash",
+)
+
+
 @router.delete("/delete-account")
 async def delete_account(request: DeleteAccountRequest):
     """Delete a user account and all associated data after password verification"""
     try:
-        async with engine.begin() as conn:
+        async with engine.connect() as conn:
             # 1. Fetch user to verify password
-            user_sql = text(
-                "SELECT user_id, name, email, password_hash, role FROM users WHERE user_id = :user_id"
-            )
-            result = await conn.execute(user_sql, {"user_id": request.user_id})
+            result = await conn.execute(_account_user_sql, {"user_id": request.user_id})
             row = result.fetchone()
 
-            if not row:
-                raise HTTPException(status_code=404, detail="User not found")
+        if not row:
+            raise HTTPException(status_code=404, detail="User not found")
 
-            user = dict(row._mapping)
+        user = dict(row._mapping)
 
-            # 2. Verify password
-            password_valid = False
-            if user["password_hash"].startswith("$2b$"):
-                password_valid = verify_password(request.password, user["password_hash"])
-            else:
-                password_valid = (request.password == user["password_hash"])
+        # 2. Verify password (the connection is released before bcrypt runs)
+        password_valid = False
+        if user["password_hash"].startswith("$2b$"):
+            password_valid = await verify_password_async(request.password, user["password_hash"])
+        else:
+            password_valid = (request.password == user["password_hash"])
 
-            if not password_valid:
-                raise HTTPException(status_code=401, detail="Incorrect password")
+        if not password_valid:
+            raise HTTPException(status_code=401, detail="Incorrect password")
 
+        async with engine.begin() as conn:
             # 3. Delete all related data (cascade)
             user_id = user["user_id"]
             role = user["role"]
 
             # Delete password reset tokens
             await conn.execute(
-                text("DELETE FROM password_reset_tokens WHERE user_id = :user_id"),
+                _delete_reset_tokens_sql,
                 {"user_id": user_id}
             )
 
@@ -322,7 +424,7 @@ async def delete_account(request: DeleteAccountRequest):
                 # For faculty: delete attendance records for their sessions, then sessions, then classes
                 # Get all class IDs owned by this faculty
                 class_ids_result = await conn.execute(
-                    text("SELECT class_id FROM classes WHERE faculty_id = :user_id"),
+                    _faculty_class_ids_sql,
                     {"user_id": user_id}
                 )
                 class_ids = [r[0] for r in class_ids_result.fetchall()]
@@ -330,61 +432,67 @@ async def delete_account(request: DeleteAccountRequest):
                 if class_ids:
                     # Delete attendance records for sessions in these classes
                     await conn.execute(
-                        text("""
-                            DELETE FROM attendance_records 
-                            WHERE session_id IN (
-                                SELECT session_id FROM attendance_sessions 
-                                WHERE class_id = ANY(:class_ids)
-                            )
-                        """),
+                        _delete_class_records_sql,
                         {"class_ids": class_ids}
                     )
 
                     # Delete attendance sessions for these classes
                     await conn.execute(
-                        text("DELETE FROM attendance_sessions WHERE class_id = ANY(:class_ids)"),
+                        _delete_class_sessions_sql,
                         {"class_ids": class_ids}
                     )
 
                     # Delete class enrollments for these classes
                     await conn.execute(
-                        text("DELETE FROM class_enrollments WHERE class_id = ANY(:class_ids)"),
+                        _delete_class_enrollments_sql,
                         {"class_ids": class_ids}
                     )
 
                     # Delete the classes themselves
                     await conn.execute(
-                        text("DELETE FROM classes WHERE faculty_id = :user_id"),
+                        _delete_faculty_classes_sql,
                         {"user_id": user_id}
                     )
 
             elif role == "STUDENT":
                 # For students: delete their attendance records and class enrollments
-                await conn.execute(
-                    text("DELETE FROM attendance_records WHERE student_id = :user_id"),
+                deleted = await conn.execute(
+                    _delete_student_records_sql,
                     {"user_id": user_id}
                 )
+                session_ids = sorted({r.session_id for r in deleted})
+                if session_ids:
+                    # Closed sessions' saved totals no longer count this student
+                    await conn.execute(_refresh_session_counts_sql, {"session_ids": session_ids})
                 await conn.execute(
-                    text("DELETE FROM class_enrollments WHERE student_id = :user_id"),
+                    _delete_student_enrollments_sql,
                     {"user_id": user_id}
                 )
 
-            # 4. Finally, delete the user
-            await conn.execute(
-                text("DELETE FROM users WHERE user_id = :user_id"),
-                {"user_id": user_id}
+            # 4. Finally, delete the user; if the password changed since it was verified,
+            # roll everything back
+            deleted = await conn.execute(
+                _delete_user_sql,
+                {"user_id": user_id, "password_hash": user["password_hash"]}
             )
+            if deleted.rowcount == 0:
+                raise HTTPException(status_code=401, detail="Incorrect password")
+            # Enrollments/classes changed; drop cached active-session working sets
+            session_cache.clear()
+            attendance_matrix.clear()
 
-            print(f"✅ Account deleted successfully for user_id={user_id} ({user['email']})")
+        # Rosters, class lists and faculty listings may all have changed
+        metadata_cache.clear()
+        logger.info("Account deleted", extra={"user_id": user_id, "email": user["email"]})
 
-            return {
-                "message": "Account deleted successfully",
-                "success": True
-            }
+        return {
+            "message": "Account deleted successfully",
+            "success": True
+        }
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[DELETE_ACCOUNT] ERROR: {str(e)}")
+        logger.exception("Account deletion failed")
         raise HTTPException(status_code=500, detail=f"Failed to delete account: {str(e)}")
 
@@ -1,72 +1,103 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy import text, bindparam
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from src.core.database import engine
-from src.core.utils import generate_code
+from src.core.query_registry import register_query
+from src.core import session_cache, attendance_matrix, class_versions, live_attendance
+from src.core.metadata_cache import metadata_cache
+from src.core.utils import generate_code, ist_now, parse_date, day_bounds, date_range_bounds, week_bounds
 from src.models.schemas import CreateClassRequest, StartSessionRequest, MarkAttendanceRequest, AdminResetPasswordRequest
 from src import queries
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List, Optional, Dict, Any
+import asyncio
+import csv
+import io
+import json
 import os
 import secrets
-from src.core.config import RESET_ADMIN_KEY
-from src.core.security import require_faculty
+from src.core.config import RESET_ADMIN_KEY, EXPORT_STREAM_BATCH, LIVE_HEARTBEAT_SECONDS
+from src.core.security import require_faculty, require_admin, get_password_hash_async
+from src.core.profiler import profiler
+from src.core.log import get_logger
 
 
 router = APIRouter(tags=["faculty"])
+logger = get_logger("faculty")
 
 # -------------------- FACULTY DASHBOARD --------------------
 
+_active_sessions_sql = register_query(
+    "faculty.active_sessions",
+    """
+    SELECT s.session_id, s.class_id, c.class_name, s.start_time, s.status
+    FROM attendance_sessions s
+    JOIN classes c ON s.class_id = c.class_id
+    WHERE c.faculty_id = :faculty_id AND s.status = 'ACTIVE'
+    ORDER BY s.start_time DESC
+    """
+)
+
+
 @router.get("/api/faculty/sessions/active")
 async def get_active_sessions(faculty_id: int, current_user: dict = Depends(require_faculty)):
     try:
-        sql = text(
-            """
-            SELECT s.session_id, s.class_id, c.class_name, s.start_time, s.status
-            FROM attendance_sessions s
-            JOIN classes c ON s.class_id = c.class_id
-            WHERE c.faculty_id = :faculty_id AND s.status = 'ACTIVE'
-            ORDER BY s.start_time DESC
-            """
-        )
         async with engine.connect() as conn:
-            result = await conn.execute(sql, {"faculty_id": faculty_id})
+            result = await conn.execute(_active_sessions_sql, {"faculty_id": faculty_id})
             return [dict(r._mapping) for r in result]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+_faculty_classes_sql = register_query(
+    "faculty.faculty_classes",
+    """
+    SELECT class_id, class_name, join_code
+    FROM classes
+    WHERE faculty_id = :faculty_id
+    ORDER BY class_name
+    """
+)
+
+
 @router.get("/api/faculty/{faculty_id}/classes")
 async def get_faculty_classes(faculty_id: int, current_user: dict = Depends(require_faculty)):
-    try:
-        sql = text(
-            """
-            SELECT class_id, class_name, join_code
-            FROM classes
-            WHERE faculty_id = :faculty_id
-            ORDER BY class_name
-            """
-        )
+    async def load():
         async with engine.connect() as conn:
-            result = await conn.execute(sql, {"faculty_id": faculty_id})
+            result = await conn.execute(_faculty_classes_sql, {"faculty_id": faculty_id})
             return [dict(r._mapping) for r in result]
+
+    try:
+        return await metadata_cache.get_or_load(("faculty_classes", faculty_id), load)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+_class_name_taken_sql = register_query(
+    "faculty.class_name_taken",
+    """
+    SELECT class_id FROM classes
+    WHERE class_name = :class_name AND faculty_id = :faculty_id
+    LIMIT 1
+    """
+)
+
+_insert_class_sql = register_query(
+    "faculty.insert_class",
+    """
+    INSERT INTO classes (class_name, faculty_id, join_code)
+    VALUES (:class_name, :faculty_id, :join_code)
+    RETURNING class_id, class_name, join_code
+    """
+)
+
+
 @router.post("/api/faculty/classes")
 async def create_faculty_class(class_data: CreateClassRequest, current_user: dict = Depends(require_faculty)):
     try:
         async with engine.begin() as conn:
             # Check if a class with the same name already exists for this faculty
-            check_sql = text(
-                """
-                SELECT class_id FROM classes 
-                WHERE class_name = :class_name AND faculty_id = :faculty_id
-                LIMIT 1
-                """
-            )
             existing = await conn.execute(
-                check_sql,
+                _class_name_taken_sql,
                 {
                     "class_name": class_data.class_name,
                     "faculty_id": class_data.faculty_id,
@@ -79,41 +110,69 @@ async def create_faculty_class(class_data: CreateClassRequest, current_user: dic
                 )
             
             join_code = class_data.join_code or generate_code()
-            sql = text(
-                """
-                INSERT INTO classes (class_name, faculty_id, join_code)
-                VALUES (:class_name, :faculty_id, :join_code)
-                RETURNING class_id, class_name, join_code
-                """
-            )
             res = await conn.execute(
-                sql,
+                _insert_class_sql,
                 {
                     "class_name": class_data.class_name,
                     "faculty_id": class_data.faculty_id,
                     "join_code": join_code,
                 },
             )
-            return dict(res.fetchone()._mapping)
+            created = dict(res.fetchone()._mapping)
+        metadata_cache.invalidate("faculty_classes", class_data.faculty_id)
+        metadata_cache.invalidate("faculty_with_classes")
+        return created
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+_delete_class_sql = register_query(
+    "faculty.delete_class",
+    "DELETE FROM classes WHERE class_id = :class_id RETURNING class_id, faculty_id",
+)
+
+
 @router.delete("/api/faculty/classes/{class_id}")
 async def delete_faculty_class(class_id: int, current_user: dict = Depends(require_faculty)):
     try:
-        sql = text("DELETE FROM classes WHERE class_id = :class_id RETURNING class_id")
         async with engine.begin() as conn:
-            res = await conn.execute(sql, {"class_id": class_id})
-            if res.rowcount == 0:
+            deleted = (await conn.execute(_delete_class_sql, {"class_id": class_id})).fetchone()
+            if deleted is None:
                 raise HTTPException(status_code=404, detail="Class not found")
-            return {"message": "Class deleted successfully"}
+            session_cache.invalidate_class(class_id)
+            attendance_matrix.invalidate_class(class_id)
+        metadata_cache.invalidate("faculty_classes", deleted.faculty_id)
+        metadata_cache.invalidate("class_details", class_id)
+        metadata_cache.invalidate("class_students", class_id)
+        metadata_cache.invalidate("enrolled_classes")  # every enrolled student's list changed
+        metadata_cache.invalidate("faculty_with_classes")
+        return {"message": "Class deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+_existing_active_session_sql = register_query(
+    "faculty.existing_active_session",
+    """
+    SELECT session_id, generated_code
+    FROM attendance_sessions
+    WHERE class_id = :class_id AND STATUS = 'ACTIVE'
+    LIMIT 1
+    """
+)
+
+_insert_session_sql = register_query(
+    "faculty.insert_session",
+    """
+    INSERT INTO attendance_sessions (class_id, start_time, status, generated_code, latitude, longitude, radius_meters)
+    VALUES (:class_id, :start_time, 'ACTIVE', :code, :lat, :lon, :rad)
+    RETURNING session_id, class_id, start_time, status, generated_code, latitude, longitude, radius_meters
+    """
+)
+
+
 @router.post("/api/faculty/classes/{class_id}/sessions")
 async def start_session(class_id: int, request: StartSessionRequest = None, current_user: dict = Depends(require_faculty)):
     """Start a new attendance session with generated code and optional location"""
@@ -123,15 +182,7 @@ async def start_session(class_id: int, request: StartSessionRequest = None, curr
         
         async with engine.begin() as conn:
             # Check for existing active session
-            check_sql = text(
-                """
-                SELECT session_id, generated_code 
-                FROM attendance_sessions 
-                WHERE class_id = :class_id AND STATUS = 'ACTIVE'
-                LIMIT 1
-                """
-            )
-            result = await conn.execute(check_sql, {"class_id": class_id})
+            result = await conn.execute(_existing_active_session_sql, {"class_id": class_id})
             existing = result.fetchone()
             
             if existing:
@@ -139,20 +190,11 @@ async def start_session(class_id: int, request: StartSessionRequest = None, curr
             
             code = generate_code()
             
-            # UTC+5:30
-            utc_now = datetime.utcnow()
-            ist_offset = timedelta(hours=5, minutes=30)
-            current_time_ist = utc_now + ist_offset
+            # Stored as naive IST (UTC+5:30)
+            current_time_ist = ist_now()
             
             # Insert with location columns (Requires DB migration)
-            sql = text(
-                """
-                INSERT INTO attendance_sessions (class_id, start_time, status, generated_code, latitude, longitude, radius_meters)
-                VALUES (:class_id, :start_time, 'ACTIVE', :code, :lat, :lon, :rad)
-                RETURNING session_id, class_id, start_time, status, generated_code, latitude, longitude, radius_meters
-                """
-            )
-            res = await conn.execute(sql, {
+            res = await conn.execute(_insert_session_sql, {
                 "class_id": class_id, 
                 "start_time": current_time_ist, 
                 "code": code,
@@ -162,127 +204,165 @@ async def start_session(class_id: int, request: StartSessionRequest = None, curr
             })
             
             session_data = dict(res.fetchone()._mapping)
-            session_id = session_data['session_id']
-            
-            # Get class name
-            class_sql = text("SELECT class_name FROM classes WHERE class_id = :cid")
-            class_row = await conn.execute(class_sql, {"cid": class_id})
-            class_row_data = class_row.fetchone()
-            class_name = class_row_data[0] if class_row_data else "Unknown Class"
             
-            return session_data
+            # Prefetch the session + enrollment working set so the submit burst hits memory
+            await session_cache.load(conn, code)
+
+        return session_data
     except Exception as e:
-        import traceback
-        with open("error_log.txt", "a") as f:
-            f.write(f"\n[START_SESSION] ERROR: {str(e)}\n")
-            f.write(traceback.format_exc())
-        print(f"[START_SESSION] ERROR: {str(e)}")
+        logger.exception("Failed to start session", extra={"class_id": class_id})
         # Check if error is due to missing columns
         if "column" in str(e).lower() and ("latitude" in str(e).lower() or "longitude" in str(e).lower()):
              raise HTTPException(status_code=500, detail="Database schema outdated. Please run migration to add location columns.")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+_mark_absent_sql = register_query(
+    "faculty.mark_absent",
+    """
+    INSERT INTO attendance_records (session_id, student_id, status, marked_at)
+    SELECT :session_id, ce.student_id, 'ABSENT', NOW()
+    FROM class_enrollments ce
+    WHERE ce.class_id = :class_id
+    ON CONFLICT (session_id, student_id) DO NOTHING
+    """
+)
+
+_close_session_sql = register_query(
+    "faculty.close_session",
+    """
+    UPDATE attendance_sessions s
+    SET end_time = :end_time,
+        status = 'CLOSED',
+        present_count = r.present_count,
+        late_count = r.late_count,
+        absent_count = r.absent_count,
+        enrolled_count = (
+            SELECT COUNT(*) FROM class_enrollments ce WHERE ce.class_id = s.class_id
+        )
+    FROM (
+        SELECT
+            COUNT(*) FILTER (WHERE status = 'PRESENT') AS present_count,
+            COUNT(*) FILTER (WHERE status = 'LATE') AS late_count,
+            COUNT(*) FILTER (WHERE status = 'ABSENT') AS absent_count
+        FROM attendance_records
+        WHERE session_id = :session_id
+    ) r
+    WHERE s.session_id = :session_id AND s.class_id = :class_id
+    RETURNING s.*
+    """
+)
+
+_session_marks_sql = register_query(
+    "faculty.session_marks",
+    "SELECT student_id, status FROM attendance_records WHERE session_id = :session_id",
+)
+
+
 @router.put("/api/faculty/classes/{class_id}/sessions/{session_id}/end")
 async def end_session(class_id: int, session_id: int, current_user: dict = Depends(require_faculty)):
     try:
         async with engine.begin() as conn:
             # Mark absent students
-            mark_absent_sql = text(
-                """
-                INSERT INTO attendance_records (session_id, student_id, status, marked_at)
-                SELECT :session_id, ce.student_id, 'ABSENT', NOW()
-                FROM class_enrollments ce
-                WHERE ce.class_id = :class_id
-                AND NOT EXISTS (
-                    SELECT 1 FROM attendance_records ar
-                    WHERE ar.session_id = :session_id
-                    AND ar.student_id = ce.student_id
-                )
-                """
-            )
-            await conn.execute(mark_absent_sql, {"session_id": session_id, "class_id": class_id})
+            await conn.execute(_mark_absent_sql, {"session_id": session_id, "class_id": class_id})
             
             # Update session status
-            utc_now = datetime.utcnow()
-            ist_offset = timedelta(hours=5, minutes=30)
-            current_time_ist = utc_now + ist_offset
+            current_time_ist = ist_now()
             
-            sql = text(
-                """
-                UPDATE attendance_sessions
-                SET end_time = :end_time, status = 'CLOSED'
-                WHERE session_id = :session_id AND class_id = :class_id
-                RETURNING *
-                """
-            )
-            result = await conn.execute(sql, {"session_id": session_id, "class_id": class_id, "end_time": current_time_ist})
+            # Close the session and materialize its totals in the same statement
+            result = await conn.execute(_close_session_sql, {"session_id": session_id, "class_id": class_id, "end_time": current_time_ist})
             row = result.fetchone()
             
             if not row:
                 raise HTTPException(status_code=404, detail="Session not found")
-            
-            # Stats
-            try:
-                class_sql = text("SELECT class_name FROM classes WHERE class_id = :cid")
-                class_res = await conn.execute(class_sql, {"cid": class_id})
-                c_row = class_res.fetchone()
-                class_name = c_row[0] if c_row else "Unknown Class"
-            except Exception as notify_ex:
-                print(f"[END_SESSION] Warning: failed stats lookup: {notify_ex}")
-                # Do not raise here, so the session is still closed successfully
+            session_cache.invalidate_session(session_id)
 
-            return dict(row._mapping)
+            marks = (await conn.execute(_session_marks_sql, {"session_id": session_id})).fetchall()
+
+        live_attendance.publish_closed(session_id, marks)
+        return dict(row._mapping)
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Failed to end session", extra={"class_id": class_id, "session_id": session_id})
         raise HTTPException(status_code=500, detail=str(e))
 
 # ... Additional endpoints ...
 
-@router.get("/api/faculty/classes/{class_id}/sessions/by-date")
-async def get_sessions_by_date_endpoint(class_id: int, date: str, current_user: dict = Depends(require_faculty)):
+# Half-open range on the raw column, so idx_attendance_sessions_class_start serves it
+_class_sessions_in_range_sql = register_query(
+    "faculty.class_sessions_in_range",
     """
-    Get all sessions for a specific class on a specific date.
-    Date format: YYYY-MM-DD
+    SELECT session_id, start_time, end_time, status, generated_code,
+           present_count, late_count, absent_count, enrolled_count
+    FROM attendance_sessions
+    WHERE class_id = :class_id
+      AND start_time >= :start AND start_time < :end
+    ORDER BY start_time ASC
     """
+)
+
+
+async def _class_sessions_in_range(class_id: int, start: datetime, end: datetime) -> List[Dict[str, Any]]:
     try:
-        sql = text(
-            """
-            SELECT session_id, start_time, end_time, status, generated_code
-            FROM attendance_sessions
-            WHERE class_id = :class_id 
-              AND TO_CHAR(start_time, 'YYYY-MM-DD') = :date
-            ORDER BY start_time ASC
-            """
-        )
-        
         async with engine.connect() as conn:
-            result = await conn.execute(sql, {"class_id": class_id, "date": date})
+            result = await conn.execute(_class_sessions_in_range_sql, {"class_id": class_id, "start": start, "end": end})
             return [dict(r._mapping) for r in result]
     except Exception as e:
-        print(f"Error in sessions_by_date: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Session range lookup failed", extra={"class_id": class_id})
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/api/faculty/classes/{class_id}/sessions/by-date")
+async def get_sessions_by_date_endpoint(class_id: int, date: str, current_user: dict = Depends(require_faculty)):
+    """
+    Get all sessions for a specific class on a specific date.
+    Date format: YYYY-MM-DD (IST calendar day)
+    """
+    return await _class_sessions_in_range(class_id, *day_bounds(parse_date(date)))
+
+
+@router.get("/api/faculty/classes/{class_id}/sessions/range")
+async def get_sessions_in_range(
+    class_id: int,
+    date_from: str = Query(..., alias="from"),
+    date_to: str = Query(..., alias="to"),
+    current_user: dict = Depends(require_faculty),
+):
+    """
+    Sessions of a class between two IST dates, both inclusive (e.g. a whole term).
+    Date format: YYYY-MM-DD
+    """
+    bounds = date_range_bounds(parse_date(date_from, "from"), parse_date(date_to, "to"))
+    return await _class_sessions_in_range(class_id, *bounds)
+
+
+@router.get("/api/faculty/classes/{class_id}/sessions/week")
+async def get_sessions_in_week(class_id: int, date: Optional[str] = None, current_user: dict = Depends(require_faculty)):
+    """
+    Sessions of a class in the Monday-to-Sunday week containing `date` (default: this week, IST).
+    Date format: YYYY-MM-DD
+    """
+    return await _class_sessions_in_range(class_id, *week_bounds(parse_date(date) if date else None))
+
+
+_class_sessions_stats_sql = register_query(
+    "faculty.class_sessions_stats",
+    """
+    SELECT
+        COUNT(*)::int AS sessions_count,
+        MAX(start_time) AS last_session
+    FROM attendance_sessions
+    WHERE class_id = :class_id
+    """
+)
+
+
 @router.get("/api/faculty/classes/{class_id}/sessions/stats")
 async def get_class_sessions_stats(class_id: int, current_user: dict = Depends(require_faculty)):
     """Return total sessions and latest session start time for a class."""
     try:
-        sql = text(
-            """
-            SELECT
-                COUNT(*)::int AS sessions_count,
-                MAX(start_time) AS last_session
-            FROM attendance_sessions
-            WHERE class_id = :class_id
-            """
-        )
 
         async with engine.connect() as conn:
-            result = await conn.execute(sql, {"class_id": class_id})
+            result = await conn.execute(_class_sessions_stats_sql, {"class_id": class_id})
             row = result.fetchone()
             if not row:
                 return {"sessions_count": 0, "last_session": None}
@@ -293,7 +373,7 @@ async def get_class_sessions_stats(class_id: int, current_user: dict = Depends(r
 
 @router.get("/sessions/{date}")
 async def sessions_by_date(date: str, current_user: dict = Depends(require_faculty)):
-    return await queries.get_sessions_by_date(date)
+    return await queries.get_sessions_by_date(*day_bounds(parse_date(date)))
 
 
 @router.get("/session/{session_id}/attendance")
@@ -303,12 +383,24 @@ async def attendance_for_session(session_id: int, current_user: dict = Depends(r
 
 @router.get("/class/{class_id}/absent/{date}")
 async def absent_students(class_id: int, date: str, current_user: dict = Depends(require_faculty)):
-    return await queries.get_absent_students_in_class_on_date(class_id, date)
+    return await queries.get_absent_students_in_class_on_date(class_id, *day_bounds(parse_date(date)))
 
 
 @router.get("/class/{class_id}/students/below_percentage")
 async def students_below_percentage(class_id: int, threshold: Optional[float] = 75.0, current_user: dict = Depends(require_faculty)):
-    return await queries.get_students_below_percentage(class_id, threshold)
+    async with engine.connect() as conn:
+        matrix = await attendance_matrix.get(conn, class_id)
+    pct, recorded = matrix.present_percentages()
+    below = ((recorded > 0) & (pct < threshold)).nonzero()[0].tolist()
+    pct = pct.tolist()
+    return [
+        {
+            "name": matrix.students[i]["student_name"],
+            "roll_number": matrix.students[i]["roll_number"],
+            "attendance_percentage": pct[i],
+        }
+        for i in below
+    ]
 
 
 @router.get("/most-active-class")
@@ -320,57 +412,72 @@ async def most_active_class(current_user: dict = Depends(require_faculty)):
 
 @router.get("/faculty-with-classes")
 async def faculty_with_classes(current_user: dict = Depends(require_faculty)):
-    return await queries.get_faculty_with_classes()
+    return await metadata_cache.get_or_load(("faculty_with_classes", "all"), queries.get_faculty_with_classes)
+
+_class_attendance_sql = register_query(
+    "faculty.class_attendance",
+    """
+    SELECT
+        s.session_id, s.start_time, s.end_time, s.status,
+        u.user_id as student_id,
+        u.name AS student_name,
+        ar.status AS attendance_status,
+        ar.marked_at
+    FROM attendance_sessions s
+    LEFT JOIN attendance_records ar ON s.session_id = ar.session_id
+    LEFT JOIN users u ON ar.student_id = u.user_id
+    WHERE s.class_id = :class_id
+    ORDER BY s.start_time DESC, u.name
+    """
+)
+
 
 @router.get("/api/faculty/classes/{class_id}/attendance")
-async def get_session_attendance(class_id: int, current_user: dict = Depends(require_faculty)):
+async def get_session_attendance(class_id: int, request: Request, response: Response, current_user: dict = Depends(require_faculty)):
     try:
-        sql = text(
-            """
-            SELECT
-                s.session_id, s.start_time, s.end_time, s.status,
-                u.user_id as student_id,
-                u.name AS student_name,
-                ar.status AS attendance_status,
-                ar.marked_at
-            FROM attendance_sessions s
-            LEFT JOIN attendance_records ar ON s.session_id = ar.session_id
-            LEFT JOIN users u ON ar.student_id = u.user_id
-            WHERE s.class_id = :class_id
-            ORDER BY s.start_time DESC, u.name
-            """
-        )
         async with engine.connect() as conn:
-            result = await conn.execute(sql, {"class_id": class_id})
+            version = await class_versions.class_version(conn, class_id)
+            cached = class_versions.not_modified(request, response, class_versions.make_etag(class_id, version))
+            if cached is not None:
+                return cached
+            result = await conn.execute(_class_attendance_sql, {"class_id": class_id})
             return [dict(r._mapping) for r in result]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+_active_session_sql = register_query(
+    "faculty.active_session",
+    """
+    SELECT session_id, class_id, start_time, status, generated_code
+    FROM attendance_sessions
+    WHERE class_id = :class_id AND status = 'ACTIVE'
+    ORDER BY start_time DESC
+    LIMIT 1
+    """
+)
+
+
 @router.get("/class/{class_id}/active-session")
 async def get_active_session(class_id: int, current_user: dict = Depends(require_faculty)):
     try:
-        sql = text(
-            """
-            SELECT session_id, class_id, start_time, status, generated_code
-            FROM attendance_sessions
-            WHERE class_id = :class_id AND status = 'ACTIVE'
-            ORDER BY start_time DESC
-            LIMIT 1
-            """
-        )
         async with engine.connect() as conn:
-            row = await conn.execute(sql, {"class_id": class_id})
+            row = await conn.execute(_active_session_sql, {"class_id": class_id})
             res = row.fetchone()
             return dict(res._mapping) if res else {}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+_session_by_id_sql = register_query(
+    "faculty.session_by_id",
+    "SELECT * FROM attendance_sessions WHERE session_id = :session_id",
+)
+
+
 @router.get("/api/faculty/sessions/{session_id}")
 async def get_session_by_id(session_id: int, current_user: dict = Depends(require_faculty)):
     try:
-        sql = text("SELECT * FROM attendance_sessions WHERE session_id = :session_id")
         async with engine.connect() as conn:
-            row = await conn.execute(sql, {"session_id": session_id})
+            row = await conn.execute(_session_by_id_sql, {"session_id": session_id})
             res = row.fetchone()
             if not res:
                 raise HTTPException(status_code=404, detail="Session not found")
@@ -378,46 +485,81 @@ async def get_session_by_id(session_id: int, current_user: dict = Depends(requir
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+_class_students_sql = register_query(
+    "faculty.class_students",
+    """
+    SELECT u.user_id, u.name, u.email, ce.roll_number, ce.section
+    FROM class_enrollments ce
+    JOIN users u ON ce.student_id = u.user_id
+    WHERE ce.class_id = :class_id
+    ORDER BY ce.roll_number, u.name
+    """
+)
+
+
 @router.get("/api/faculty/classes/{class_id}/students")
 async def get_class_students(class_id: int, current_user: dict = Depends(require_faculty)):
-    try:
-        sql = text(
-            """
-            SELECT u.user_id, u.name, u.email, ce.roll_number, ce.section
-            FROM class_enrollments ce
-            JOIN users u ON ce.student_id = u.user_id
-            WHERE ce.class_id = :class_id
-            ORDER BY ce.roll_number, u.name
-            """
-        )
+    async def load():
         async with engine.connect() as conn:
-            result = await conn.execute(sql, {"class_id": class_id})
+            result = await conn.execute(_class_students_sql, {"class_id": class_id})
             return [dict(r._mapping) for r in result]
+
+    try:
+        return await metadata_cache.get_or_load(("class_students", class_id), load)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+_class_details_sql = register_query(
+    "faculty.class_details",
+    """
+    SELECT c.class_id, c.class_name, c.join_code, u.name AS faculty_name
+    FROM classes c
+    JOIN users u ON c.faculty_id = u.user_id
+    WHERE c.class_id = :cid
+    """
+)
+
+
 @router.get("/api/faculty/classes/{class_id}/details")
 async def faculty_class_details(class_id: int, current_user: dict = Depends(require_faculty)):
-    try:
-        sql = text(
-            """
-            SELECT c.class_id, c.class_name, c.join_code, u.name AS faculty_name
-            FROM classes c
-            JOIN users u ON c.faculty_id = u.user_id
-            WHERE c.class_id = :cid
-            """
-        )
+    async def load():
         async with engine.connect() as conn:
-            result = await conn.execute(sql, {"cid": class_id})
-            row = result.fetchone()
-            if not row:
-                raise HTTPException(status_code=404, detail="Class not found")
-            return dict(row._mapping)
+            row = (await conn.execute(_class_details_sql, {"cid": class_id})).fetchone()
+            return dict(row._mapping) if row else None
+
+    try:
+        details = await metadata_cache.get_or_load(("class_details", class_id), load)
+        if details is None:
+            raise HTTPException(status_code=404, detail="Class not found")
+        return details
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+_session_class_sql = register_query(
+    "faculty.session_class",
+    "SELECT class_id, status FROM attendance_sessions WHERE session_id = :sid",
+)
+
+_refresh_session_counts_sql = register_query(
+    "faculty.refresh_session_counts",
+    "SELECT refresh_session_summary_counts(ARRAY[CAST(:sid AS INTEGER)])",
+)
+
+_manual_mark_sql = register_query(
+    "faculty.manual_mark",
+    """
+    INSERT INTO attendance_records (session_id, student_id, status, marked_at)
+    VALUES (:sid, :uid, :st, NOW())
+    ON CONFLICT (session_id, student_id)
+    DO UPDATE SET status = EXCLUDED.status, marked_at = EXCLUDED.marked_at
+    """
+)
+
+
 @router.post("/session/{session_id}/attendance")
 async def mark_attendance_manual(session_id: int, payload: MarkAttendanceRequest, current_user: dict = Depends(require_faculty)):
     try:
@@ -427,56 +569,159 @@ async def mark_attendance_manual(session_id: int, payload: MarkAttendanceRequest
 
         async with engine.begin() as conn:
             # Check session
-            s = (await conn.execute(text("SELECT 1 FROM attendance_sessions WHERE session_id = :sid"), {"sid": session_id})).fetchone()
+            s = (await conn.execute(_session_class_sql, {"sid": session_id})).fetchone()
             if not s:
                  raise HTTPException(status_code=404, detail="Session not found")
             
             # Upsert
-            upd = await conn.execute(
-                text("UPDATE attendance_records SET status = :st, marked_at = NOW() WHERE session_id = :sid AND student_id = :uid"),
-                {"st": status, "sid": session_id, "uid": payload.student_id}
+            await conn.execute(
+                _manual_mark_sql,
+                {"sid": session_id, "uid": payload.student_id, "st": status}
             )
-            if upd.rowcount == 0:
-                 await conn.execute(
-                    text("INSERT INTO attendance_records (session_id, student_id, status, marked_at) VALUES (:sid, :uid, :st, NOW())"),
-                    {"sid": session_id, "uid": payload.student_id, "st": status}
-                 )
-            
-            return {"message": "Attendance updated", "status": status}
+            if s.status == "CLOSED":
+                # Corrections after the close keep the session's saved totals in step
+                await conn.execute(_refresh_session_counts_sql, {"sid": session_id})
+            await class_versions.bump(conn, [s.class_id])
+
+        live_attendance.publish_mark(session_id, payload.student_id, status)
+        return {"message": "Attendance updated", "status": status}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+_session_attendance_flat_sql = register_query(
+    "faculty.session_attendance_flat",
+    """
+    SELECT
+        ce.student_id,
+        u.name as student_name,
+        ce.roll_number,
+        ce.section,
+        COALESCE(ar.status, 'ABSENT') as status,
+        ar.marked_at
+    FROM class_enrollments ce
+    JOIN attendance_sessions s ON s.class_id = ce.class_id
+    JOIN users u ON ce.student_id = u.user_id
+    LEFT JOIN attendance_records ar ON ar.session_id = s.session_id AND ar.student_id = ce.student_id
+    WHERE s.session_id = :session_id
+    ORDER BY ce.roll_number
+    """
+)
+
+
 @router.get("/api/faculty/sessions/{session_id}/attendance/flat")
-async def get_session_attendance_flat(session_id: int, current_user: dict = Depends(require_faculty)):
+async def get_session_attendance_flat(session_id: int, request: Request, response: Response, current_user: dict = Depends(require_faculty)):
     """
     Get attendance for a specific session in a flat format suitable for tables.
     Includes all enrolled students and their status (PRESENT/ABSENT/LATE) for this session.
+    Answers 304 when If-None-Match matches the class's current version.
     """
     try:
-        sql = text(
-            """
-            SELECT 
-                ce.student_id,
-                u.name as student_name,
-                ce.roll_number,
-                ce.section,
-                COALESCE(ar.status, 'ABSENT') as status,
-                ar.marked_at
-            FROM class_enrollments ce
-            JOIN attendance_sessions s ON s.class_id = ce.class_id
-            JOIN users u ON ce.student_id = u.user_id
-            LEFT JOIN attendance_records ar ON ar.session_id = s.session_id AND ar.student_id = ce.student_id
-            WHERE s.session_id = :session_id
-            ORDER BY ce.roll_number
-            """
-        )
         async with engine.connect() as conn:
-            result = await conn.execute(sql, {"session_id": session_id})
+            versioned = await class_versions.session_class_version(conn, session_id)
+            if versioned is not None:
+                cached = class_versions.not_modified(request, response, class_versions.make_etag(*versioned))
+                if cached is not None:
+                    return cached
+            result = await conn.execute(_session_attendance_flat_sql, {"session_id": session_id})
             return [dict(r._mapping) for r in result]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+_live_session_sql = register_query(
+    "faculty.live_session",
+    "SELECT session_id, class_id, status FROM attendance_sessions WHERE session_id = :session_id",
+)
+
+
+def _sse(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _live_snapshot(session_id: int) -> Optional[Dict[str, Any]]:
+    async with engine.connect() as conn:
+        session = (await conn.execute(_live_session_sql, {"session_id": session_id})).fetchone()
+        if not session:
+            return None
+        result = await conn.execute(_session_attendance_flat_sql, {"session_id": session_id})
+        return {
+            "session_id": session_id,
+            "class_id": session.class_id,
+            "status": session.status,
+            "students": [dict(r._mapping) for r in result],
+        }
+
+
+class _SubscriptionResponse(StreamingResponse):
+    """Streams an SSE body and closes its subscription however the response ends, including
+    a client that disconnects before the body generator is ever started."""
+
+    def __init__(self, content, subscription, **kwargs):
+        super().__init__(content, **kwargs)
+        self.subscription = subscription
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.subscription.close()
+
+
+@router.get("/api/faculty/sessions/{session_id}/attendance/live")
+async def stream_session_attendance(session_id: int, request: Request, current_user: dict = Depends(require_faculty)):
+    """
+    Server-sent events for a session's attendance: a `snapshot` event with the flat roster,
+    then one `mark` event per committed mark and a final `closed` event when the session ends.
+    A viewer that falls too far behind gets a fresh `snapshot` instead of the missed marks.
+    Served from this process's pub/sub, so it is meant for long-running deployments.
+    """
+    # Subscribe before reading the snapshot so no mark can fall in between
+    sub = live_attendance.broker.subscribe(session_id)
+    try:
+        snapshot = await _live_snapshot(session_id)
+    except Exception as e:
+        sub.close()
+        raise HTTPException(status_code=500, detail=str(e))
+    if snapshot is None:
+        sub.close()
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    async def events():
+        nonlocal snapshot
+        try:
+            yield _sse("snapshot", snapshot)
+            if snapshot["status"] != "ACTIVE":
+                return
+            while True:
+                try:
+                    event = await sub.get(timeout=LIVE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:  # lagged: resync from the database
+                    sub.lagged = False
+                    snapshot = await _live_snapshot(session_id)
+                    if snapshot is None:
+                        return
+                    yield _sse("snapshot", snapshot)
+                    continue
+                yield _sse(event["type"], event, event["seq"])
+                if event["type"] == "closed":
+                    return
+        finally:
+            sub.close()
+
+    return _SubscriptionResponse(
+        events(),
+        sub,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 
 @router.get("/api/faculty/classes/{class_id}/students/attendance-stats")
 async def get_students_attendance_stats(
@@ -490,71 +735,92 @@ async def get_students_attendance_stats(
     Optionally filter by min_pct and/or max_pct (0-100).
     """
     try:
-        sql = text(
-            """
-            SELECT
-                u.user_id AS student_id,
-                u.name AS student_name,
-                u.email,
-                ce.roll_number,
-                ce.section,
-                COUNT(s.session_id) AS total_sessions,
-                COUNT(CASE WHEN ar.status IN ('PRESENT', 'LATE') THEN 1 END) AS present_count,
-                CASE
-                    WHEN COUNT(s.session_id) = 0 THEN 0.0
-                    ELSE ROUND(
-                        COUNT(CASE WHEN ar.status IN ('PRESENT', 'LATE') THEN 1 END) * 100.0
-                        / COUNT(s.session_id),
-                        2
-                    )
-                END AS attendance_percentage
-            FROM class_enrollments ce
-            JOIN users u ON ce.student_id = u.user_id
-            CROSS JOIN (
-                SELECT session_id FROM attendance_sessions WHERE class_id = :class_id
-            ) s
-            LEFT JOIN attendance_records ar
-                ON ar.session_id = s.session_id AND ar.student_id = ce.student_id
-            WHERE ce.class_id = :class_id
-            GROUP BY u.user_id, u.name, u.email, ce.roll_number, ce.section
-            ORDER BY ce.section, ce.roll_number, u.name
-            """
-        )
         async with engine.connect() as conn:
-            result = await conn.execute(sql, {"class_id": class_id})
-            rows = [dict(r._mapping) for r in result]
+            matrix = await attendance_matrix.get(conn, class_id)
 
-        # Apply optional percentage filters in Python (avoids complex HAVING clause)
-        if min_pct is not None:
-            rows = [r for r in rows if r["attendance_percentage"] >= min_pct]
-        if max_pct is not None:
-            rows = [r for r in rows if r["attendance_percentage"] <= max_pct]
+        attended = matrix.attended().tolist()
+        pct = matrix.attendance_percentages()
+        keep = matrix.pct_mask(pct, min_pct, max_pct)
+        pct = pct.tolist()
+        return [
+            {
+                **student,
+                "total_sessions": matrix.n_sessions,
+                "present_count": attended[i],
+                "attendance_percentage": pct[i],
+            }
+            for i, student in enumerate(matrix.students)
+            if keep[i]
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return rows
+
+@router.get("/api/faculty/classes/{class_id}/analytics")
+async def get_class_analytics(class_id: int, current_user: dict = Depends(require_faculty)):
+    """
+    Per-session totals (oldest first) and per-student streaks: the current run of
+    consecutive absences and the longest run of attended sessions.
+    """
+    try:
+        async with engine.connect() as conn:
+            matrix = await attendance_matrix.get(conn, class_id)
+
+        current_absent, longest_attended = matrix.streaks()
+        current_absent = current_absent.tolist()
+        longest_attended = longest_attended.tolist()
+        return {
+            "total_sessions": matrix.n_sessions,
+            "sessions": matrix.session_totals(),
+            "students": [
+                {
+                    "student_id": student["student_id"],
+                    "student_name": student["student_name"],
+                    "roll_number": student["roll_number"],
+                    "current_absent_streak": current_absent[i],
+                    "longest_attended_streak": longest_attended[i],
+                }
+                for i, student in enumerate(matrix.students)
+            ],
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # -------------------- FACULTY ADMIN: RESET PASSWORD --------------------
 
+_all_users_sql = register_query(
+    "faculty.all_users",
+    """
+    SELECT user_id, name, email, role
+    FROM users
+    ORDER BY role, name
+    """
+)
+
+
 @router.get("/api/faculty/users")
 async def list_all_users(current_user: dict = Depends(require_faculty)):
     """List all users (students + faculty) for the password reset picker."""
     try:
-        sql = text(
-            """
-            SELECT user_id, name, email, role
-            FROM users
-            ORDER BY role, name
-            """
-        )
         async with engine.connect() as conn:
-            result = await conn.execute(sql)
+            result = await conn.execute(_all_users_sql)
             return [dict(r._mapping) for r in result]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+_reset_target_user_sql = register_query(
+    "faculty.reset_target_user",
+    "SELECT user_id, name, email FROM users WHERE user_id = :user_id",
+)
+
+_admin_update_password_sql = register_query(
+    "faculty.admin_update_password",
+    "UPDATE users SET password_hash = :password_hash WHERE user_id = :user_id",
+)
+
+
 @router.post("/api/faculty/admin/reset-password")
 async def admin_reset_password(request: AdminResetPasswordRequest, current_user: dict = Depends(require_faculty)):
     """Faculty-only: directly reset any user's password (no email token required)."""
@@ -562,7 +828,7 @@ async def admin_reset_password(request: AdminResetPasswordRequest, current_user:
         # Secure comparison of admin confirmation key
         server_admin_key = RESET_ADMIN_KEY
         if not server_admin_key:
-            print("[ADMIN_RESET] SECURITY ALERT: RESET_ADMIN_KEY is not configured in the application config!")
+            logger.error("Admin reset attempted but RESET_ADMIN_KEY is not configured")
             raise HTTPException(
                 status_code=500,
                 detail="Password reset is disabled: Admin reset key is not configured."
@@ -580,28 +846,24 @@ async def admin_reset_password(request: AdminResetPasswordRequest, current_user:
                 detail="Password must be at least 6 characters long"
             )
 
-        from src.core.security import get_password_hash
-        new_hash = get_password_hash(request.new_password)
+        new_hash = await get_password_hash_async(request.new_password)
 
         async with engine.begin() as conn:
             # Verify user exists
-            check_sql = text("SELECT user_id, name, email FROM users WHERE user_id = :user_id")
-            result = await conn.execute(check_sql, {"user_id": request.user_id})
+            result = await conn.execute(_reset_target_user_sql, {"user_id": request.user_id})
             user = result.fetchone()
             if not user:
                 raise HTTPException(status_code=404, detail="User not found")
 
             # Update password
-            update_sql = text(
-                "UPDATE users SET password_hash = :password_hash WHERE user_id = :user_id"
-            )
-            await conn.execute(update_sql, {
+            await conn.execute(_admin_update_password_sql, {
                 "password_hash": new_hash,
                 "user_id": request.user_id
             })
 
         user_data = dict(user._mapping)
-        print(f"[ADMIN_RESET] Password reset for user_id={request.user_id} ({user_data['email']})")
+        logger.info("Admin password reset", extra={"user_id": request.user_id, "email": user_data["email"],
+                                                  "by": current_user["user_id"]})
         return {
             "message": f"Password for {user_data['name']} has been reset successfully",
             "success": True
@@ -610,101 +872,231 @@ async def admin_reset_password(request: AdminResetPasswordRequest, current_user:
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[ADMIN_RESET] ERROR: {str(e)}")
+        logger.exception("Admin password reset failed")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _require_profiler():
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="Profiler is disabled (set PROFILER_ENABLED=true)")
+
+
+@router.get("/api/faculty/admin/profiles")
+async def list_profiles(current_user: dict = Depends(require_admin)):
+    """Admin: sampling profiler settings and the routes it has profiles for."""
+    _require_profiler()
+    return profiler.summary()
+
+
+@router.get("/api/faculty/admin/profiles/collapsed")
+async def download_profile(route: Optional[str] = None, method: Optional[str] = None,
+                           current_user: dict = Depends(require_admin)):
+    """Admin: rolling profile of one route (e.g. route=/attendance/submit-code), or of all routes,
+    as collapsed stacks for flamegraph.pl / speedscope."""
+    _require_profiler()
+    body = profiler.collapsed(method.upper() if method else None, route)
+    if route is not None and not body:
+        raise HTTPException(status_code=404, detail="No samples for this route yet")
+    name = "all" if route is None else route.strip("/").replace("/", "_").replace("{", "").replace("}", "")
+    return PlainTextResponse(body, headers={"Content-Disposition": f'attachment; filename="profile-{name}.txt"'})
+
+
+@router.delete("/api/faculty/admin/profiles")
+async def clear_profiles(current_user: dict = Depends(require_admin)):
+    """Admin: drop the collected profiles."""
+    _require_profiler()
+    profiler.clear()
+    return {"message": "Profiles cleared", "success": True}
+
+
+def _export_record(r) -> Dict[str, Any]:
+    # Format marked_at to ISO string if exists
+    return {
+        "student_id": r["student_id"],
+        "student_name": r["student_name"],
+        "roll_number": r["roll_number"],
+        "section": r["section"],
+        "status": r["status"],
+        "marked_at": r["marked_at"].isoformat() if r["marked_at"] else None
+    }
+
+
+def _export_session(s, recs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Totals are counted from the exported records (current roster) rather than taken from
+    # the counts saved at close, so the two always agree after enrollment changes
+    present_count = sum(1 for r in recs if r["status"] == "PRESENT")
+    late_count = sum(1 for r in recs if r["status"] == "LATE")
+    absent_count = sum(1 for r in recs if r["status"] == "ABSENT")
+
+    return {
+        "session_id": s["session_id"],
+        "start_time": s["start_time"].isoformat() if s["start_time"] else None,
+        "end_time": s["end_time"].isoformat() if s["end_time"] else None,
+        "status": s["status"],
+        "generated_code": s["generated_code"],
+        "records": recs,
+        "totals": {
+            "present": present_count,
+            "late": late_count,
+            "absent": absent_count
+        }
+    }
+
+
+_export_sessions_sql = register_query(
+    "faculty.export_sessions",
+    """
+    SELECT session_id, start_time, end_time, status, generated_code
+    FROM attendance_sessions
+    WHERE class_id = :class_id
+    ORDER BY start_time DESC
+    """
+)
+
+_export_records_sql = register_query(
+    "faculty.export_records",
+    """
+    SELECT
+        s.session_id,
+        ce.student_id,
+        u.name as student_name,
+        ce.roll_number,
+        ce.section,
+        COALESCE(ar.status, 'ABSENT') as status,
+        ar.marked_at
+    FROM attendance_sessions s
+    JOIN class_enrollments ce ON s.class_id = ce.class_id
+    JOIN users u ON ce.student_id = u.user_id
+    LEFT JOIN attendance_records ar ON ar.session_id = s.session_id AND ar.student_id = ce.student_id
+    WHERE s.class_id = :class_id
+    ORDER BY ce.roll_number
+    """
+)
+
+
 @router.get("/api/faculty/classes/{class_id}/sessions/all-with-attendance")
-async def get_all_sessions_with_attendance(class_id: int, current_user: dict = Depends(require_faculty)):
+async def get_all_sessions_with_attendance(class_id: int, format: Optional[str] = None, current_user: dict = Depends(require_faculty)):
     """
     Get all sessions with their attendance records flat, optimized for a single export file.
+    Pass format=ndjson or format=csv to stream it instead (see /sessions/export).
     """
+    if format is not None:
+        return await stream_class_export(class_id, format, current_user)
     try:
         # 1. Fetch all sessions to ensure we return sessions even if they don't have enrollments/records
-        sessions_sql = text(
-            """
-            SELECT session_id, start_time, end_time, status, generated_code
-            FROM attendance_sessions
-            WHERE class_id = :class_id
-            ORDER BY start_time DESC
-            """
-        )
         
         # 2. Fetch all attendance records flat for the class sessions
-        records_sql = text(
-            """
-            SELECT 
-                s.session_id,
-                ce.student_id,
-                u.name as student_name,
-                ce.roll_number,
-                ce.section,
-                COALESCE(ar.status, 'ABSENT') as status,
-                ar.marked_at
-            FROM attendance_sessions s
-            JOIN class_enrollments ce ON s.class_id = ce.class_id
-            JOIN users u ON ce.student_id = u.user_id
-            LEFT JOIN attendance_records ar ON ar.session_id = s.session_id AND ar.student_id = ce.student_id
-            WHERE s.class_id = :class_id
-            ORDER BY ce.roll_number
-            """
-        )
         
         async with engine.connect() as conn:
-            sessions_res = await conn.execute(sessions_sql, {"class_id": class_id})
+            sessions_res = await conn.execute(_export_sessions_sql, {"class_id": class_id})
             sessions_rows = [dict(r._mapping) for r in sessions_res]
             
-            records_res = await conn.execute(records_sql, {"class_id": class_id})
+            records_res = await conn.execute(_export_records_sql, {"class_id": class_id})
             records_rows = [dict(r._mapping) for r in records_res]
             
         # Group records by session_id
         records_by_session = {}
         for r in records_rows:
-            sid = r["session_id"]
-            if sid not in records_by_session:
-                records_by_session[sid] = []
-            
-            # Format marked_at to ISO string if exists
-            marked_at_str = r["marked_at"].isoformat() if r["marked_at"] else None
-            
-            records_by_session[sid].append({
-                "student_id": r["student_id"],
-                "student_name": r["student_name"],
-                "roll_number": r["roll_number"],
-                "section": r["section"],
-                "status": r["status"],
-                "marked_at": marked_at_str
-            })
+            records_by_session.setdefault(r["session_id"], []).append(_export_record(r))
             
         # Assemble sessions list
-        sessions_list = []
-        for s in sessions_rows:
-            sid = s["session_id"]
-            recs = records_by_session.get(sid, [])
-            
-            # Calculate totals (Late is also counted in totals if needed, but match present/late/absent)
-            present_count = sum(1 for r in recs if r["status"] == "PRESENT")
-            late_count = sum(1 for r in recs if r["status"] == "LATE")
-            absent_count = sum(1 for r in recs if r["status"] == "ABSENT")
-            
-            sessions_list.append({
-                "session_id": sid,
-                "start_time": s["start_time"].isoformat() if s["start_time"] else None,
-                "end_time": s["end_time"].isoformat() if s["end_time"] else None,
-                "status": s["status"],
-                "generated_code": s["generated_code"],
-                "records": recs,
-                "totals": {
-                    "present": present_count,
-                    "late": late_count,
-                    "absent": absent_count
-                }
-            })
+        sessions_list = [
+            _export_session(s, records_by_session.get(s["session_id"], []))
+            for s in sessions_rows
+        ]
             
         return {"sessions": sessions_list}
     except Exception as e:
-        import traceback
-        print(f"[EXPORT_ALL_SESSIONS] ERROR: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Session export failed", extra={"class_id": class_id})
         raise HTTPException(status_code=500, detail=str(e))
 
+
+
+_EXPORT_CSV_COLUMNS = [
+    "session_id", "start_time", "end_time", "session_status", "generated_code",
+    "student_id", "student_name", "roll_number", "section", "status", "marked_at",
+]
+
+
+_stream_export_sql = register_query(
+    "faculty.stream_export",
+    """
+    SELECT
+        s.session_id, s.start_time, s.end_time, s.status AS session_status, s.generated_code,
+        ce.student_id,
+        u.name AS student_name,
+        ce.roll_number,
+        ce.section,
+        COALESCE(ar.status, 'ABSENT') AS status,
+        ar.marked_at
+    FROM attendance_sessions s
+    LEFT JOIN class_enrollments ce ON ce.class_id = s.class_id
+    LEFT JOIN users u ON ce.student_id = u.user_id
+    LEFT JOIN attendance_records ar ON ar.session_id = s.session_id AND ar.student_id = ce.student_id
+    WHERE s.class_id = :class_id
+    ORDER BY s.start_time DESC, s.session_id, ce.roll_number
+    """
+)
+
+
+@router.get("/api/faculty/classes/{class_id}/sessions/export")
+async def stream_class_export(class_id: int, format: str = "ndjson", current_user: dict = Depends(require_faculty)):
+    """
+    Stream a class's full attendance history, newest session first.
+    format=ndjson emits one JSON object per session (same shape as all-with-attendance);
+    format=csv emits one row per (session, student). Rows come off a server-side cursor
+    and are written as they arrive, so memory stays flat however long the history is.
+    That holds for long-running deployments only: under Lambda, Mangum collects the whole
+    body before returning it, so the export is held in memory and is subject to Lambda's
+    6 MB response limit; very large classes should be exported from a long-running instance.
+    """
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+
+    async def session_groups():
+        """Yield (session_row, records) one session at a time from the streamed join."""
+        async with engine.connect() as conn:
+            result = await conn.stream(
+                _stream_export_sql.execution_options(yield_per=EXPORT_STREAM_BATCH), {"class_id": class_id}
+            )
+            current, recs = None, []
+            async for row in result.mappings():
+                if current is not None and row["session_id"] != current["session_id"]:
+                    yield current, recs
+                    recs = []
+                current = {**row, "status": row["session_status"]}
+                if row["student_id"] is not None:
+                    recs.append(_export_record(row))
+            if current is not None:
+                yield current, recs
+
+    async def ndjson_lines():
+        async for session_row, recs in session_groups():
+            yield json.dumps(_export_session(session_row, recs)) + "\n"
+
+    async def csv_lines():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(_EXPORT_CSV_COLUMNS)
+        async for session_row, recs in session_groups():
+            session = _export_session(session_row, recs)
+            for r in recs:
+                writer.writerow([
+                    session["session_id"], session["start_time"], session["end_time"],
+                    session["status"], session["generated_code"],
+                    r["student_id"], r["student_name"], r["roll_number"], r["section"],
+                    r["status"], r["marked_at"],
+                ])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    if format == "csv":
+        return StreamingResponse(
+            csv_lines(),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="class_{class_id}_attendance.csv"'},
+        )
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
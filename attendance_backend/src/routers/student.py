@@ -1,43 +1,77 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy import text
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from src.core.database import engine
+from src.core.query_registry import register_query
+from src.core import session_cache, attendance_matrix, class_versions, live_attendance
+from src.core.metadata_cache import metadata_cache
+from src.core.ratelimit import submit_cooldown
+from src.core.write_buffer import WriteBuffer
+from src.core.config import ATTENDANCE_WRITE_BEHIND, WRITE_BUFFER_MAX_BATCH, WRITE_BUFFER_FLUSH_MS
 from src.core.utils import calculate_distance
 from src.models.schemas import JoinClassRequest, SubmitAttendanceCode
 from src.core.security import require_student
+from src.core.log import get_logger
 from src import queries
-from typing import Optional
+from typing import List, Optional, Union
 from datetime import datetime, timedelta
+import time
 
 router = APIRouter(tags=["student"])
+logger = get_logger("student")
+
+_enrolled_classes_sql = register_query(
+    "student.enrolled_classes",
+    """
+         SELECT c.class_id,
+             c.class_name,
+             c.join_code,
+             u.name as faculty_name,
+             ce.roll_number,
+             ce.section
+    FROM class_enrollments ce
+    JOIN classes c ON ce.class_id = c.class_id
+    JOIN users u ON c.faculty_id = u.user_id
+    WHERE ce.student_id = :student_id
+    ORDER BY c.class_name
+    """
+)
+
 
 @router.get("/api/student/classes")
 async def get_enrolled_classes(student_id: int, current_user: dict = Depends(require_student)):
     # Ownership check: a student can only view their own classes
     if current_user["user_id"] != student_id:
         raise HTTPException(status_code=403, detail="Access denied")
-    try:
-        sql = text(
-            """
-                 SELECT c.class_id,
-                     c.class_name,
-                     c.join_code,
-                     u.name as faculty_name,
-                     ce.roll_number,
-                     ce.section
-            FROM class_enrollments ce
-            JOIN classes c ON ce.class_id = c.class_id
-            JOIN users u ON c.faculty_id = u.user_id
-            WHERE ce.student_id = :student_id
-            ORDER BY c.class_name
-            """
-        )
+
+    async def load():
         async with engine.connect() as conn:
-            result = await conn.execute(sql, {"student_id": student_id})
+            result = await conn.execute(_enrolled_classes_sql, {"student_id": student_id})
             return [dict(r._mapping) for r in result]
+
+    try:
+        return await metadata_cache.get_or_load(("enrolled_classes", student_id), load)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+_class_by_join_code_sql = register_query(
+    "student.class_by_join_code",
+    "SELECT class_id FROM classes WHERE join_code = :join_code",
+)
+
+_enrollment_exists_sql = register_query(
+    "student.enrollment_exists",
+    "SELECT 1 FROM class_enrollments WHERE student_id = :student_id AND class_id = :class_id",
+)
+
+_insert_enrollment_sql = register_query(
+    "student.insert_enrollment",
+    """
+    INSERT INTO class_enrollments (student_id, class_id, roll_number, section)
+    VALUES (:student_id, :class_id, :roll_number, :section)
+    """
+)
+
+
 @router.post("/api/student/classes/join")
 async def join_class(join_data: JoinClassRequest, current_user: dict = Depends(require_student)):
     # Ownership check: a student can only join classes for themselves
@@ -49,118 +83,400 @@ async def join_class(join_data: JoinClassRequest, current_user: dict = Depends(r
             section_value = section_value[:50]
         
         async with engine.begin() as conn:
-            find_sql = text("SELECT class_id FROM classes WHERE join_code = :join_code")
-            class_row = (await conn.execute(find_sql, {"join_code": join_data.join_code})).fetchone()
+            class_row = (await conn.execute(_class_by_join_code_sql, {"join_code": join_data.join_code})).fetchone()
             
             if not class_row:
                 raise HTTPException(status_code=404, detail="Invalid join code")
             class_id = class_row[0]
             
-            check_enroll = text("SELECT 1 FROM class_enrollments WHERE student_id = :student_id AND class_id = :class_id")
-            existing = (await conn.execute(check_enroll, {"student_id": join_data.student_id, "class_id": class_id})).fetchone()
+            existing = (await conn.execute(_enrollment_exists_sql, {"student_id": join_data.student_id, "class_id": class_id})).fetchone()
             
             if existing:
                 return {"message": "Already enrolled", "class_id": class_id}
             
-            enroll_sql = text(
-                """
-                INSERT INTO class_enrollments (student_id, class_id, roll_number, section)
-                VALUES (:student_id, :class_id, :roll_number, :section)
-                """
-            )
-            await conn.execute(enroll_sql, {
+            await conn.execute(_insert_enrollment_sql, {
                 "student_id": join_data.student_id,
                 "class_id": class_id,
                 "roll_number": join_data.roll_number,
                 "section": section_value
             })
-            
-            return {"message": "Successfully joined class", "class_id": class_id}
+            session_cache.invalidate_class(class_id)
+            attendance_matrix.invalidate_class(class_id)
+        metadata_cache.invalidate("enrolled_classes", join_data.student_id)
+        metadata_cache.invalidate("class_students", class_id)
+        return {"message": "Successfully joined class", "class_id": class_id}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def _submit_code_internal(payload: SubmitAttendanceCode):
-    """Internal helper for attendance submission. Used by both the HTTP route and the SQS Lambda handler.
-    Does NOT perform auth or cooldown checks — those are handled at the route level."""
-    sql_session = text(
-        """
-        SELECT session_id, class_id, latitude, longitude, radius_meters
-        FROM attendance_sessions
-        WHERE generated_code = :code AND status = 'ACTIVE'
+def _location_message(status: str, distance, effective_radius) -> str:
+    if distance is None:
+        return ""
+    if status == "ABSENT":
+        return f" - Outside zone (Distance: {distance:.0f}m, Allowed: {effective_radius:.0f}m)"
+    return f" - Within zone ({distance:.0f}m)"
+
+
+def _evaluate_location(session, payload: SubmitAttendanceCode):
+    """Decide PRESENT/ABSENT for a submission against the session's geofence.
+    Returns (status, distance, location_message); raises if location is required but missing.
+    Keep in sync with the geofence computed in SQL by _submit_code_sql."""
+    session_lat = session.latitude
+    session_lon = session.longitude
+    radius_meters = session.radius_meters or 100  # Tightened default from 500m to 100m
+
+    status = "PRESENT"
+    distance = None
+    effective_radius = None
+
+    if session_lat and session_lon:
+        if payload.latitude and payload.longitude:
+            distance = calculate_distance(
+                float(session_lat), float(session_lon),
+                payload.latitude, payload.longitude
+            )
+            student_accuracy = payload.accuracy or 0
+            # Tightened accuracy buffer: cap at 50m (was 100m)
+            accuracy_buffer = min(student_accuracy, 50)
+            effective_radius = radius_meters + accuracy_buffer
+
+            if distance > effective_radius:
+                status = "ABSENT"
+        else:
+            raise HTTPException(status_code=400, detail="Location is required for this session.")
+
+    return status, distance, _location_message(status, distance, effective_radius)
+
+
+def _submit_response(session_id: int, status: str, distance, location_message: str) -> dict:
+    return {
+        "message": f"Attendance marked as {status}{location_message}",
+        "session_id": session_id,
+        "status": status,
+        "distance": round(distance, 2) if distance else None,
+        "within_radius": status == "PRESENT"
+    }
+
+
+# Cache-miss path: validate the code and enrollment, apply the geofence (same rule as
+# _evaluate_location) and upsert, all in one round trip. Also returns the session's
+# metadata and enrolled IDs so the working-set cache can be refilled for free.
+_submit_code_sql = register_query(
+    "student.submit_code",
+    """
+    WITH params AS (
+        SELECT
+            CAST(:lat AS DOUBLE PRECISION) AS lat,
+            CAST(:lon AS DOUBLE PRECISION) AS lon,
+            LEAST(COALESCE(CAST(:accuracy AS DOUBLE PRECISION), 0), 50) AS accuracy_buffer
+    ),
+    active AS (
+        SELECT
+            s.session_id, s.class_id, s.generated_code, s.latitude, s.longitude, s.radius_meters,
+            ARRAY(
+                SELECT ce.student_id FROM class_enrollments ce WHERE ce.class_id = s.class_id
+            ) AS enrolled,
+            COALESCE(s.latitude, 0) <> 0 AND COALESCE(s.longitude, 0) <> 0 AS needs_location,
+            COALESCE(s.radius_meters, 100) + p.accuracy_buffer AS effective_radius,
+            2 * 6371000 * ASIN(SQRT(
+                POWER(SIN(RADIANS(p.lat - s.latitude) / 2), 2)
+                + COS(RADIANS(s.latitude)) * COS(RADIANS(p.lat))
+                * POWER(SIN(RADIANS(p.lon - s.longitude) / 2), 2)
+            )) AS distance
+        FROM attendance_sessions s
+        CROSS JOIN params p
+        WHERE s.generated_code = :code AND s.status = 'ACTIVE'
         LIMIT 1
-        """
+    ),
+    decision AS (
+        SELECT
+            active.*,
+            CAST(:sid AS INTEGER) = ANY(enrolled) AS is_enrolled,
+            CASE
+                WHEN needs_location AND distance > effective_radius THEN 'ABSENT'
+                ELSE 'PRESENT'
+            END AS attendance_status
+        FROM active
+    ),
+    written AS (
+        INSERT INTO attendance_records (session_id, student_id, status, marked_at)
+        SELECT session_id, :sid, attendance_status, NOW()
+        FROM decision
+        WHERE is_enrolled AND (NOT needs_location OR distance IS NOT NULL)
+        ON CONFLICT (session_id, student_id)
+        DO UPDATE SET status = EXCLUDED.status, marked_at = EXCLUDED.marked_at
+        RETURNING 1
+    ),
+    bumped AS (
+        SELECT bump_class_versions(ARRAY[class_id]) FROM decision
+        WHERE EXISTS (SELECT 1 FROM written)
+    )
+    SELECT decision.*, EXISTS (SELECT 1 FROM written) AS written, EXISTS (SELECT 1 FROM bumped) AS bumped
+    FROM decision
+    """
+)
+
+# Cache-hit path: status already decided in Python; the write re-checks that the session
+# is still ACTIVE and the student still enrolled so a stale entry can't write. The class
+# version is bumped in the same statement when a row was written.
+_guarded_upsert_sql = register_query(
+    "student.guarded_upsert",
+    """
+    WITH written AS (
+        INSERT INTO attendance_records (session_id, student_id, status, marked_at)
+        SELECT s.session_id, ce.student_id, :status, NOW()
+        FROM attendance_sessions s
+        JOIN class_enrollments ce ON ce.class_id = s.class_id AND ce.student_id = :sid
+        WHERE s.session_id = :ses AND s.status = 'ACTIVE'
+        ON CONFLICT (session_id, student_id)
+        DO UPDATE SET status = EXCLUDED.status, marked_at = EXCLUDED.marked_at
+        RETURNING session_id
     )
+    SELECT session_id, bump_class_versions(ARRAY[CAST(:cid AS INTEGER)]) AS bumped
+    FROM written
+    """
+)
+
+
+async def _submit_code_uncached(payload: SubmitAttendanceCode):
+    has_location = bool(payload.latitude and payload.longitude)
     async with engine.begin() as conn:
-        session = (await conn.execute(sql_session, {"code": payload.code})).fetchone()
-        if not session:
-            raise HTTPException(status_code=400, detail="Invalid or expired code")
-        
-        session_id = session.session_id
-        class_id = session.class_id
-        session_lat = session.latitude
-        session_lon = session.longitude
-        radius_meters = session.radius_meters or 100  # Tightened default from 500m to 100m
-        
-        # Check enrollment
-        sql_enroll = text("SELECT 1 FROM class_enrollments WHERE student_id = :sid AND class_id = :cid")
-        if not (await conn.execute(sql_enroll, {"sid": payload.student_id, "cid": class_id})).fetchone():
-            raise HTTPException(status_code=403, detail="Student not enrolled in this class")
-        
-        status = "PRESENT"
-        distance = None
-        location_message = ""
-        
-        if session_lat and session_lon:
-            if payload.latitude and payload.longitude:
-                distance = calculate_distance(
-                    float(session_lat), float(session_lon),
-                    payload.latitude, payload.longitude
-                )
-                student_accuracy = payload.accuracy or 0
-                # Tightened accuracy buffer: cap at 50m (was 100m)
-                accuracy_buffer = min(student_accuracy, 50)
-                effective_radius = radius_meters + accuracy_buffer
-                
-                if distance > effective_radius:
-                    status = "ABSENT"
-                    location_message = f" - Outside zone (Distance: {distance:.0f}m, Allowed: {effective_radius:.0f}m)"
-                else:
-                    location_message = f" - Within zone ({distance:.0f}m)"
+        row = (await conn.execute(_submit_code_sql, {
+            "code": payload.code,
+            "sid": payload.student_id,
+            "lat": payload.latitude if has_location else None,
+            "lon": payload.longitude if has_location else None,
+            "accuracy": payload.accuracy,
+        })).fetchone()
+
+    if not row:
+        session_cache.invalidate_code(payload.code)
+        raise HTTPException(status_code=400, detail="Invalid or expired code")
+    session_cache.put(session_cache.from_row(row))
+    if not row.is_enrolled:
+        raise HTTPException(status_code=403, detail="Student not enrolled in this class")
+    if not row.written:
+        raise HTTPException(status_code=400, detail="Location is required for this session.")
+
+    status = row.attendance_status
+    live_attendance.publish_mark(row.session_id, payload.student_id, status)
+    distance = row.distance if row.needs_location else None
+    location_message = _location_message(status, distance, row.effective_radius)
+    return _submit_response(row.session_id, status, distance, location_message)
+
+
+async def _resolve_active_session(code: str, student_id: int) -> session_cache.ActiveSession:
+    """Look up the active session for a code from the working-set cache, loading it on a miss."""
+    session = session_cache.get(code)
+    if session is None or student_id not in session.enrolled:
+        # Miss, or the student may have enrolled after the session was cached
+        async with engine.connect() as conn:
+            session = await session_cache.load(conn, code)
+    if not session:
+        raise HTTPException(status_code=400, detail="Invalid or expired code")
+    if student_id not in session.enrolled:
+        raise HTTPException(status_code=403, detail="Student not enrolled in this class")
+    return session
+
+
+async def _submit_code_buffered(payload: SubmitAttendanceCode):
+    """Write-behind submission: validate now, then wait for the group commit of the batch."""
+    session = await _resolve_active_session(payload.code, payload.student_id)
+    status, distance, location_message = _evaluate_location(session, payload)
+    try:
+        await attendance_write_buffer.submit((session.session_id, payload.student_id, status, session.class_id))
+    except HTTPException:
+        session_cache.invalidate_code(payload.code)
+        raise
+    live_attendance.publish_mark(session.session_id, payload.student_id, status)
+    return _submit_response(session.session_id, status, distance, location_message)
+
+
+async def _submit_code_internal(payload: SubmitAttendanceCode):
+    """Internal helper for attendance submission. Used by the HTTP route.
+    Does NOT perform auth or cooldown checks — those are handled at the route level.
+    Either way it costs a single round trip to the database (or a share of one batch
+    when ATTENDANCE_WRITE_BEHIND is on)."""
+    if ATTENDANCE_WRITE_BEHIND:
+        return await _submit_code_buffered(payload)
+
+    session = session_cache.get(payload.code)
+    if session is not None and payload.student_id in session.enrolled:
+        status, distance, location_message = _evaluate_location(session, payload)
+        async with engine.begin() as conn:
+            written = (await conn.execute(_guarded_upsert_sql, {
+                "status": status, "ses": session.session_id, "sid": payload.student_id,
+                "cid": session.class_id,
+            })).fetchone()
+        if written:
+            live_attendance.publish_mark(session.session_id, payload.student_id, status)
+            return _submit_response(session.session_id, status, distance, location_message)
+        # Session closed or enrollment removed elsewhere; re-resolve from the database
+        session_cache.invalidate_code(payload.code)
+
+    return await _submit_code_uncached(payload)
+
+
+_bulk_sessions_sql = register_query(
+    "student.bulk_sessions_by_code",
+    """
+    SELECT session_id, class_id, generated_code, latitude, longitude, radius_meters
+    FROM attendance_sessions
+    WHERE generated_code = ANY(:codes) AND status = 'ACTIVE'
+    """
+)
+
+_bulk_enrollments_sql = register_query(
+    "student.bulk_enrollments",
+    """
+    SELECT student_id, class_id FROM class_enrollments
+    WHERE student_id = ANY(:sids) AND class_id = ANY(:cids)
+    """
+)
+
+_bulk_upsert_sql = register_query(
+    "student.bulk_upsert",
+    """
+    INSERT INTO attendance_records (session_id, student_id, status, marked_at)
+    SELECT t.session_id, t.student_id, t.status, NOW()
+    FROM unnest(
+        CAST(:session_ids AS INTEGER[]),
+        CAST(:student_ids AS INTEGER[]),
+        CAST(:statuses AS TEXT[])
+    ) AS t(session_id, student_id, status)
+    ON CONFLICT (session_id, student_id)
+    DO UPDATE SET status = EXCLUDED.status, marked_at = EXCLUDED.marked_at
+    """
+)
+
+
+async def _submit_codes_bulk(payloads: List[SubmitAttendanceCode]) -> List[Union[dict, Exception]]:
+    """Set-based attendance submission for a batch (used by the SQS Lambda handler).
+
+    Resolves every distinct code in one query, checks every enrollment in one query and
+    writes all accepted records in one statement. Returns one entry per payload, in order:
+    the response dict on success, or the exception that rejected that payload."""
+    results: List[Union[dict, Exception]] = [None] * len(payloads)
+    if not payloads:
+        return results
+
+
+    async with engine.begin() as conn:
+        codes = list({p.code for p in payloads})
+        session_rows = (await conn.execute(_bulk_sessions_sql, {"codes": codes})).fetchall()
+        sessions_by_code = {row.generated_code: row for row in session_rows}
+
+        # Resolve sessions first so the enrollment lookup only covers live classes
+        resolved = {}
+        for idx, payload in enumerate(payloads):
+            session = sessions_by_code.get(payload.code)
+            if not session:
+                results[idx] = HTTPException(status_code=400, detail="Invalid or expired code")
             else:
-                raise HTTPException(status_code=400, detail="Location is required for this session.")
-        
-        # Upsert
-        update_sql = text(
-            """
-            UPDATE attendance_records
-            SET status = :status, marked_at = NOW()
-            WHERE session_id = :ses AND student_id = :sid
-            """
-        )
-        res = await conn.execute(update_sql, {"status": status, "ses": session_id, "sid": payload.student_id})
-        if res.rowcount == 0:
-            insert_sql = text(
-                """
-                INSERT INTO attendance_records (session_id, student_id, status, marked_at)
-                VALUES (:ses, :sid, :status, NOW())
-                """
-            )
-            await conn.execute(insert_sql, {"ses": session_id, "sid": payload.student_id, "status": status})
-        
-        class_sql = text("SELECT class_name, faculty_id FROM classes WHERE class_id = :cid")
-        c_row = (await conn.execute(class_sql, {"cid": class_id})).fetchone()
-        class_name = c_row.class_name
+                resolved[idx] = session
+
+        enrolled = set()
+        if resolved:
+            student_ids = list({payloads[idx].student_id for idx in resolved})
+            class_ids = list({s.class_id for s in resolved.values()})
+            enroll_rows = await conn.execute(_bulk_enrollments_sql, {"sids": student_ids, "cids": class_ids})
+            enrolled = {(r.student_id, r.class_id) for r in enroll_rows}
 
-        return {
-            "message": f"Attendance marked as {status}{location_message}",
-            "session_id": session_id,
-            "status": status,
-            "distance": round(distance, 2) if distance else None,
-            "within_radius": status == "PRESENT"
-        }
+        # Last submission wins when a student appears twice for the same session
+        # (ON CONFLICT cannot touch the same row twice in one statement)
+        to_write = {}
+        for idx, session in resolved.items():
+            payload = payloads[idx]
+            if (payload.student_id, session.class_id) not in enrolled:
+                results[idx] = HTTPException(status_code=403, detail="Student not enrolled in this class")
+                continue
+            try:
+                status, distance, location_message = _evaluate_location(session, payload)
+            except HTTPException as e:
+                results[idx] = e
+                continue
+            to_write[(session.session_id, payload.student_id)] = (session.class_id, status)
+            results[idx] = _submit_response(session.session_id, status, distance, location_message)
+
+        if to_write:
+            keys = list(to_write)
+            await conn.execute(_bulk_upsert_sql, {
+                "session_ids": [k[0] for k in keys],
+                "student_ids": [k[1] for k in keys],
+                "statuses": [to_write[k][1] for k in keys],
+            })
+            await class_versions.bump(conn, (class_id for class_id, _ in to_write.values()))
+
+    for (session_id, student_id), (_, status) in to_write.items():
+        live_attendance.publish_mark(session_id, student_id, status)
+    return results
+
+
+# Group-commit flush: the cache-hit guarded upsert, for a whole batch of rows at once
+_guarded_bulk_upsert_sql = register_query(
+    "student.guarded_bulk_upsert",
+    """
+    INSERT INTO attendance_records (session_id, student_id, status, marked_at)
+    SELECT t.session_id, t.student_id, t.status, NOW()
+    FROM unnest(
+        CAST(:session_ids AS INTEGER[]),
+        CAST(:student_ids AS INTEGER[]),
+        CAST(:statuses AS TEXT[])
+    ) AS t(session_id, student_id, status)
+    JOIN attendance_sessions s ON s.session_id = t.session_id AND s.status = 'ACTIVE'
+    JOIN class_enrollments ce ON ce.class_id = s.class_id AND ce.student_id = t.student_id
+    ON CONFLICT (session_id, student_id)
+    DO UPDATE SET status = EXCLUDED.status, marked_at = EXCLUDED.marked_at
+    RETURNING session_id, student_id
+    """
+)
+
+
+async def _flush_attendance_writes(rows: List[tuple]) -> List[Union[bool, Exception]]:
+    """Commit a batch of (session_id, student_id, status, class_id) rows from the write buffer
+    in one multi-row upsert, with one class version bump for the whole batch. Rows rejected
+    by the guard (session closed, not enrolled) fail alone."""
+    latest = {}
+    class_of = {}
+    for session_id, student_id, status, class_id in rows:
+        latest[(session_id, student_id)] = status  # last write wins within a batch
+        class_of[session_id] = class_id
+    keys = list(latest)
+    async with engine.begin() as conn:
+        result = await conn.execute(_guarded_bulk_upsert_sql, {
+            "session_ids": [k[0] for k in keys],
+            "student_ids": [k[1] for k in keys],
+            "statuses": [latest[k] for k in keys],
+        })
+        written = {(r.session_id, r.student_id) for r in result}
+        if written:
+            await class_versions.bump(conn, (class_of[session_id] for session_id, _ in written))
+    return [
+        True if (session_id, student_id) in written
+        else HTTPException(status_code=400, detail="Invalid or expired code")
+        for session_id, student_id, _, _ in rows
+    ]
+
+
+attendance_write_buffer = WriteBuffer(
+    _flush_attendance_writes,
+    max_batch=WRITE_BUFFER_MAX_BATCH,
+    max_delay=WRITE_BUFFER_FLUSH_MS / 1000,
+)
+
+
+_last_submission_sql = register_query(
+    "student.last_submission",
+    """
+    SELECT ar.session_id, ar.marked_at FROM attendance_records ar
+    JOIN attendance_sessions s ON s.session_id = ar.session_id
+    WHERE s.generated_code = :code AND s.status = 'ACTIVE'
+    AND ar.student_id = :sid
+    ORDER BY ar.marked_at DESC LIMIT 1
+    """
+)
 
 
 @router.post("/attendance/submit-code")
@@ -170,68 +486,78 @@ async def submit_code(payload: SubmitAttendanceCode, current_user: dict = Depend
         raise HTTPException(status_code=403, detail="Access denied")
     try:
         # ── Anti-spoofing: duplicate submission cooldown (60 seconds) ──
-        async with engine.connect() as conn:
-            cooldown_sql = text(
-                """
-                SELECT marked_at FROM attendance_records
-                WHERE session_id IN (
-                    SELECT session_id FROM attendance_sessions
-                    WHERE generated_code = :code AND status = 'ACTIVE'
-                )
-                AND student_id = :sid
-                ORDER BY marked_at DESC LIMIT 1
-                """
-            )
-            last_record = (await conn.execute(cooldown_sql, {"code": payload.code, "sid": payload.student_id})).fetchone()
+        remaining = None
+        session = session_cache.get(payload.code)
+        if session is not None:
+            remaining = await submit_cooldown.remaining(payload.student_id, session.session_id)
+
+        if remaining is None:
+            # Cold limiter or unknown session: fall back to the last record in the database
+            async with engine.connect() as conn:
+                last_record = (await conn.execute(_last_submission_sql, {"code": payload.code, "sid": payload.student_id})).fetchone()
+            remaining = 0
             if last_record and last_record.marked_at:
                 time_since = datetime.utcnow() - last_record.marked_at
-                if time_since < timedelta(seconds=60):
-                    raise HTTPException(
-                        status_code=429,
-                        detail=f"Please wait {60 - int(time_since.total_seconds())} seconds before resubmitting."
-                    )
+                # Warm the limiter so the next attempt is answered from memory
+                await submit_cooldown.record(
+                    payload.student_id, last_record.session_id, time.time() - time_since.total_seconds()
+                )
+                if time_since < timedelta(seconds=submit_cooldown.window):
+                    remaining = submit_cooldown.window - int(time_since.total_seconds())
+
+        if remaining:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Please wait {remaining} seconds before resubmitting."
+            )
 
-        return await _submit_code_internal(payload)
+        result = await _submit_code_internal(payload)
+        await submit_cooldown.record(payload.student_id, result["session_id"])
+        return result
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[SUBMIT_CODE_ERROR] {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Submit code failed", extra={"student_id": payload.student_id})
         raise HTTPException(status_code=500, detail=str(e))
 
+_student_class_details_sql = register_query(
+    "student.class_details",
+    """
+    SELECT
+        c.class_id,
+        c.class_name,
+        c.faculty_id,
+        u.name as faculty_name,
+        NULL::text as attendance_mode,
+        COALESCE(
+            (ac.present_count + ac.late_count)::FLOAT / NULLIF(
+                -- closed sessions, plus the active one once the student has marked it
+                (SELECT COUNT(*) FROM attendance_sessions s2
+                 WHERE s2.class_id = c.class_id AND s2.status != 'ACTIVE')
+                + (SELECT COUNT(*) FROM attendance_sessions s3
+                   JOIN attendance_records ar ON ar.session_id = s3.session_id AND ar.student_id = :student_id
+                   WHERE s3.class_id = c.class_id AND s3.status = 'ACTIVE'),
+                0
+            ) * 100,
+            0
+        ) as attendance_rate
+    FROM classes c
+    JOIN users u ON c.faculty_id = u.user_id
+    LEFT JOIN attendance_counters ac ON ac.class_id = c.class_id AND ac.student_id = :student_id
+    WHERE c.class_id = :class_id
+    """
+)
+
+
 @router.get("/api/student/classes/{class_id}")
 async def get_student_class_details(class_id: int, student_id: int, current_user: dict = Depends(require_student)):
     # Ownership check
     if current_user["user_id"] != student_id:
         raise HTTPException(status_code=403, detail="Access denied")
     try:
-        sql = text(
-            """
-            SELECT
-                c.class_id,
-                c.class_name,
-                c.faculty_id,
-                u.name as faculty_name,
-                NULL::text as attendance_mode,
-                COALESCE(
-                    (
-                        SELECT COUNT(CASE WHEN ar.status IN ('PRESENT', 'LATE') THEN 1 END)::FLOAT / NULLIF(COUNT(*), 0) * 100
-                        FROM attendance_sessions s2
-                        LEFT JOIN attendance_records ar ON ar.session_id = s2.session_id AND ar.student_id = :student_id
-                        WHERE s2.class_id = c.class_id
-                        AND (s2.status != 'ACTIVE' OR ar.status IS NOT NULL)
-                    ),
-                    0
-                ) as attendance_rate
-            FROM classes c
-            JOIN users u ON c.faculty_id = u.user_id
-            WHERE c.class_id = :class_id
-            """
-        )
         async with engine.connect() as conn:
-            row = (await conn.execute(sql, {"class_id": class_id, "student_id": student_id})).fetchone()
+            row = (await conn.execute(_student_class_details_sql, {"class_id": class_id, "student_id": student_id})).fetchone()
             if not row:
                 raise HTTPException(status_code=404, detail="Class not found")
             return dict(row._mapping)
@@ -248,28 +574,35 @@ async def attendance_percentage_student(student_id: int, current_user: dict = De
         raise HTTPException(status_code=404, detail="Student or records not found")
     return result
 
+_attendance_history_sql = register_query(
+    "student.attendance_history",
+    """
+    SELECT
+        s.session_id,
+        s.start_time,
+        ar.status,
+        ar.marked_at
+    FROM attendance_sessions s
+    LEFT JOIN attendance_records ar ON s.session_id = ar.session_id AND ar.student_id = :student_id
+    WHERE s.class_id = :class_id
+    AND (s.status != 'ACTIVE' OR ar.status IS NOT NULL)
+    ORDER BY s.start_time DESC
+    """
+)
+
+
 @router.get("/api/student/classes/{class_id}/attendance")
-async def get_student_attendance_history(class_id: int, student_id: int, current_user: dict = Depends(require_student)):
+async def get_student_attendance_history(class_id: int, student_id: int, request: Request, response: Response, current_user: dict = Depends(require_student)):
     # Ownership check
     if current_user["user_id"] != student_id:
         raise HTTPException(status_code=403, detail="Access denied")
     try:
-        sql = text(
-            """
-            SELECT 
-                s.session_id, 
-                s.start_time, 
-                ar.status, 
-                ar.marked_at
-            FROM attendance_sessions s
-            LEFT JOIN attendance_records ar ON s.session_id = ar.session_id AND ar.student_id = :student_id
-            WHERE s.class_id = :class_id
-            AND (s.status != 'ACTIVE' OR ar.status IS NOT NULL)
-            ORDER BY s.start_time DESC
-            """
-        )
         async with engine.connect() as conn:
-            result = await conn.execute(sql, {"class_id": class_id, "student_id": student_id})
+            version = await class_versions.class_version(conn, class_id)
+            cached = class_versions.not_modified(request, response, class_versions.make_etag(class_id, version))
+            if cached is not None:
+                return cached
+            result = await conn.execute(_attendance_history_sql, {"class_id": class_id, "student_id": student_id})
             return [dict(r._mapping) for r in result]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file